@@ -9,21 +9,36 @@ import json
 import asyncio
 import logging
 import datetime
-from typing import Dict, List, Any
+import functools
+import gc
+import shutil
+import signal
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 from contextlib import asynccontextmanager
-import hashlib
 import time
-import requests
-import tarfile
 
 from dotenv import load_dotenv
 from llama_index.core import StorageContext, load_index_from_storage
 from llama_index.core.vector_stores import MetadataFilter, MetadataFilters
-from llama_index.core.schema import NodeWithScore, TextNode
+from llama_index.core.schema import QueryBundle
 from llama_index.embeddings.google_genai import GoogleGenAIEmbedding
 from llama_index.llms.google_genai import GoogleGenAI
 from fastmcp import FastMCP
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+
+from context_writer import ContextWriter
+from index_download import DownloadProgress, download_index, swap_into_place
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from metrics import MetricsRegistry
+from rate_limit import FAST_FAIL_ERROR_TYPES, ModelGuard, ModelUnavailableError, is_overload_error
+from caches import EmbeddingCache, ResultCache, SingleFlight, compute_index_version
+from embedding_batcher import EmbeddingBatcher
+from vector_store import (
+    MetadataIndex, MmapVectorStore, STORE_DIRNAME, convert_index, is_store_current, normalize_vector,
+    score_top_k, split_metadata_filters
+)
 
 # ─────────────────────────── Configuration ──────────────────────────────
 load_dotenv()
@@ -32,6 +47,93 @@ BASE_DIR = Path(__file__).parent.resolve()
 INDEX_DIR = BASE_DIR / "gemini_index_metadata"
 TICKERS_PATH = BASE_DIR / "tickers.json"
 
+# "mmap" serves searches from the binary store in INDEX_DIR/mmap_store (converted on
+# first start if missing); "llama_index" keeps the JSON SimpleVectorStore path
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "mmap").lower()
+# float16 halves and int8 quarters the embedding matrix; VECTOR_STORE_RESCORE keeps a
+# float32 copy on disk to exactly rescore VECTOR_RESCORE_OVERSAMPLE x top_k candidates
+VECTOR_STORE_DTYPE = os.getenv("VECTOR_STORE_DTYPE", "float32")
+VECTOR_STORE_RESCORE = os.getenv("VECTOR_STORE_RESCORE", "true").lower() == "true"
+VECTOR_RESCORE_OVERSAMPLE = int(os.getenv("VECTOR_RESCORE_OVERSAMPLE", "4"))
+
+# "exact" scores every filtered candidate; "ivf" enables the approximate
+# inverted-file engine for large corpora (mmap backend only)
+VECTOR_SEARCH_ENGINE = os.getenv("VECTOR_SEARCH_ENGINE", "exact").lower()
+IVF_NLISTS = int(os.getenv("IVF_NLISTS", "0")) or None
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+IVF_EXACT_THRESHOLD = int(os.getenv("IVF_EXACT_THRESHOLD", "20000"))
+
+# "dense" is vector-only, "hybrid" fuses BM25 and vector rankings (reciprocal rank
+# fusion) under the same metadata filters and "sparse" is BM25-only (no embedding call).
+# Callers can pick a mode per search. In hybrid mode a query whose embedding takes longer
+# than HYBRID_EMBED_TIMEOUT_SECONDS is answered from BM25 alone (0 = always wait)
+SEARCH_MODE = os.getenv("SEARCH_MODE", "dense").lower()
+SEARCH_MODES = ("hybrid", "dense", "sparse")
+LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX", "true").lower() == "true"
+HYBRID_CANDIDATE_DEPTH = int(os.getenv("HYBRID_CANDIDATE_DEPTH", "50"))
+# BM25 hits below this fraction of the best hit only match near-ubiquitous terms and don't vote in the fusion
+HYBRID_BM25_MIN_RELATIVE_SCORE = float(os.getenv("HYBRID_BM25_MIN_RELATIVE_SCORE", "0.1"))
+HYBRID_EMBED_TIMEOUT_SECONDS = float(os.getenv("HYBRID_EMBED_TIMEOUT_SECONDS", "3"))
+# When the filters pin one statement (STATEMENT_PIN_FILTERS plus is_statement=yes) and
+# select at most top_k chunks, return them all in document order without embedding the
+# query (similarity could only reorder them)
+EXACT_MATCH_PATH = os.getenv("EXACT_MATCH_PATH", "true").lower() == "true"
+STATEMENT_PIN_FILTERS = ("ticker", "filing_period", "statement_type", "financial_statement_scope")
+# psx_search_with_fallback accepts an attempt once a node scores above this (the client ladder's bar)
+RELEVANCE_SCORE_THRESHOLD = float(os.getenv("RELEVANCE_SCORE_THRESHOLD", "0.5"))
+
+EMBED_MODEL_NAME = "text-embedding-004"
+EMBEDDING_CACHE_PATH = Path(os.getenv("EMBEDDING_CACHE_PATH", str(BASE_DIR / "cache" / "query_embeddings.sqlite")))
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "10000"))
+# Cache-missed query strings from concurrent searches are held for up to
+# EMBED_BATCH_WINDOW_MS and sent as one embedding request of at most
+# EMBED_BATCH_MAX_SIZE texts (0 ms = embed each search's queries immediately, still
+# in requests of at most EMBED_BATCH_MAX_SIZE texts)
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "100"))
+# Embedding requests are paced to EMBED_RATE_LIMIT_PER_MINUTE (0 = unlimited); a request
+# that would wait longer than RATE_LIMIT_MAX_WAIT_SECONDS fails fast with "rate_limited".
+# CIRCUIT_FAILURE_THRESHOLD consecutive overload errors (429/5xx/timeouts) open the circuit
+# and calls fail with "circuit_open" for CIRCUIT_RESET_SECONDS before a trial call
+EMBED_RATE_LIMIT_PER_MINUTE = float(os.getenv("EMBED_RATE_LIMIT_PER_MINUTE", "1500"))
+EMBED_RATE_LIMIT_BURST = float(os.getenv("EMBED_RATE_LIMIT_BURST", "50"))
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "2"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+CONTEXT_DIR = BASE_DIR / "enhanced_contexts"
+CONTEXT_SAMPLE_RATE = float(os.getenv("CONTEXT_SAMPLE_RATE", "1.0"))
+CONTEXT_SEGMENT_MAX_MB = int(os.getenv("CONTEXT_SEGMENT_MAX_MB", "8"))
+CONTEXT_DISK_BUDGET_MB = int(os.getenv("CONTEXT_DISK_BUDGET_MB", "256"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "900"))
+# response_mode="lean" returns ids, scores and only these metadata keys; texts are
+# fetched once per distinct chunk with psx_get_chunks
+RESPONSE_MODES = ("full", "lean")
+LEAN_METADATA_KEYS = (
+    "ticker", "filing_period", "filing_type", "statement_type", "financial_statement_scope",
+    "is_statement", "is_note", "source_file", "chunk_number",
+)
+
+# Index release download: partial downloads resume from INDEX_DOWNLOAD_DIR; the
+# tarball is verified against INDEX_RELEASE_SHA256 (or the sha256sum file at
+# INDEX_RELEASE_SHA256_URL) when either is set
+INDEX_RELEASE_URL = os.getenv("INDEX_RELEASE_URL")
+INDEX_RELEASE_SHA256 = os.getenv("INDEX_RELEASE_SHA256")
+INDEX_RELEASE_SHA256_URL = os.getenv("INDEX_RELEASE_SHA256_URL")
+INDEX_DOWNLOAD_DIR = BASE_DIR / ".index_download"
+# Hot reloads stage the next index release here before swapping it into INDEX_DIR
+INDEX_NEXT_DIR = BASE_DIR / "gemini_index_metadata.next"
+INDEX_DRAIN_TIMEOUT_SECONDS = float(os.getenv("INDEX_DRAIN_TIMEOUT_SECONDS", "300"))
+# Searches arriving before the index is ready wait up to this long, then get a
+# retryable "server_starting" error (0 = reject immediately)
+STARTUP_QUEUE_TIMEOUT_SECONDS = float(os.getenv("STARTUP_QUEUE_TIMEOUT_SECONDS", "20"))
+READINESS_STATES = ("starting", "loading_index", "warming", "ready", "degraded")
+
+# MCP_WORKERS > 1 runs that many server processes behind a session-sticky front proxy
+# (see multiworker.py); PSX_WORKER_ID is set by the proxy for each worker
+MCP_WORKERS = int(os.getenv("MCP_WORKERS", "1"))
+WORKER_ID = os.getenv("PSX_WORKER_ID")
+
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise RuntimeError("GEMINI_API_KEY environment variable not set")
@@ -40,26 +142,215 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 log = logging.getLogger("psx-server-enhanced")
 
 # ─────────────────────────── Enhanced Resource Manager ──────────────────
+class IndexVersion:
+    """One loaded index (mmap store or llama-index) plus the searches currently using it"""
+
+    def __init__(self, version: str, directory: Path, index=None, vector_store: Optional[MmapVectorStore] = None):
+        self.version = version
+        self.directory = directory
+        self.index = index
+        self.vector_store = vector_store
+        self.lexical_index: Optional[BM25Index] = None
+        # llama-index backend only: row-aligned nodes for row-based filtering and the lexical index
+        self._nodes: Optional[List[Any]] = None
+        self._metadata_index: Optional[MetadataIndex] = None
+        self._row_by_id: Optional[Dict[str, int]] = None
+        self.loaded_at = datetime.datetime.now().isoformat()
+        self.in_flight = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+
+    @property
+    def doc_count(self):
+        try:
+            return self.vector_store.count if self.vector_store else len(self.index.docstore.docs)
+        except AttributeError:
+            try:
+                return len(self.index.docstore.get_all_documents())
+            except:
+                return "Unknown"
+
+    def relocate(self, directory: Path):
+        """Point this version at the directory its files were renamed to (open mmaps follow the inode)"""
+        self.directory = directory
+        if self.vector_store is not None:
+            self.vector_store.store_dir = directory / STORE_DIRNAME
+
+    def build_lexical_index(self):
+        """Load (mmap stores) or build the BM25 index over this version's nodes (blocking)"""
+        if self.vector_store is not None:
+            self.lexical_index = load_or_build_lexical_index(self.vector_store)
+        else:
+            self.lexical_index = BM25Index.build(node.get_content() for node in self._nodes)
+
+    def build_node_rows(self):
+        """llama-index backend: number the docstore nodes and index their metadata (blocking)"""
+        if self.vector_store is None and self.index is not None:
+            self._nodes = list(self.index.docstore.docs.values())
+            self._metadata_index = MetadataIndex([node.metadata for node in self._nodes])
+
+    def filter_rows(self, metadata_filters: Dict[str, Any]):
+        """Lexical-index rows matching the search filters (None = no filtering)"""
+        standard_filters, filing_periods = split_metadata_filters(metadata_filters)
+        if self.vector_store is not None:
+            return self.vector_store.filter_rows(standard_filters, filing_periods)
+        return self._metadata_index.resolve(standard_filters, filing_periods)
+
+    def row_of(self, node_id: str) -> Optional[int]:
+        if self.vector_store is not None:
+            return self.vector_store.row_by_id.get(node_id)
+        if self._row_by_id is None:
+            self._row_by_id = {node.node_id: row for row, node in enumerate(self._nodes)}
+        return self._row_by_id.get(node_id)
+
+    def get_node(self, row: int, score: Optional[float] = None) -> Dict[str, Any]:
+        if self.vector_store is not None:
+            return self.vector_store.get_node(row, score)
+        node = self._nodes[row]
+        return {"node_id": node.node_id, "text": node.text, "metadata": node.metadata, "score": score}
+
+    def similarity(self, query_embedding: List[float], rows: List[int]) -> List[float]:
+        """Cosine similarity of the query to specific rows"""
+        if self.vector_store is not None:
+            return self.vector_store.score_rows(query_embedding, rows).tolist()
+        query = normalize_vector(query_embedding)
+        embeddings = self.index.vector_store.data.embedding_dict
+        node_ids = [self._nodes[row].node_id for row in rows]
+        return [float(normalize_vector(embeddings[n]) @ query) if n in embeddings else 0.0 for n in node_ids]
+
+    def acquire(self):
+        self.in_flight += 1
+        self._drained.clear()
+
+    def release(self):
+        self.in_flight -= 1
+        if self.in_flight <= 0:
+            self._drained.set()
+
+    async def wait_drained(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def close(self):
+        """Drop references so the old version's memory (and mmaps) can be released"""
+        if self.vector_store is not None:
+            self.vector_store.close()
+        self.vector_store = None
+        self.index = None
+        self.lexical_index = None
+        self._nodes = None
+        self._metadata_index = None
+        self._row_by_id = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "directory": str(self.directory),
+            "backend": "mmap" if self.vector_store else "llama_index",
+            "loaded_at": self.loaded_at,
+            "in_flight": self.in_flight,
+            "lexical_index": self.lexical_index.stats() if self.lexical_index else None,
+        }
+
+
 class EnhancedResourceManager:
     def __init__(self):
         self.embed_model = None
         self.llm = None
-        self.index = None
+        self.active_index: Optional[IndexVersion] = None
+        self.retiring_indexes: List[IndexVersion] = []
+        self.embedding_cache = None
+        self.result_cache = ResultCache(max_entries=RESULT_CACHE_MAX_ENTRIES, ttl_seconds=RESULT_CACHE_TTL_SECONDS)
+        self.search_flights = SingleFlight()
+        self.embed_guard = ModelGuard(
+            EMBED_MODEL_NAME, EMBED_RATE_LIMIT_PER_MINUTE, burst=EMBED_RATE_LIMIT_BURST,
+            max_wait_seconds=RATE_LIMIT_MAX_WAIT_SECONDS, failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+            reset_seconds=CIRCUIT_RESET_SECONDS
+        )
+        self.embed_batcher = EmbeddingBatcher(
+            lambda texts: _embed_uncached_queries(texts), window_seconds=EMBED_BATCH_WINDOW_MS / 1000,
+            max_batch_size=EMBED_BATCH_MAX_SIZE, on_batch=lambda texts, callers: record_embedding_batch(texts, callers)
+        ) if EMBED_BATCH_WINDOW_MS > 0 else None
+        self.reload_status: Dict[str, Any] = {"state": "idle"}
+        self._reload_lock = asyncio.Lock()
+        self._background_tasks = set()
+        self._init_task: Optional[asyncio.Task] = None
         self._initialized = False
+        self.readiness = "starting"
+        self.readiness_since = datetime.datetime.now().isoformat()
+        self.readiness_error: Optional[str] = None
+        self._settled = asyncio.Event()
+
+    # Searches read the live version through these; a reload swaps active_index in one assignment
+    @property
+    def index(self):
+        return self.active_index.index if self.active_index else None
+
+    @property
+    def vector_store(self) -> Optional[MmapVectorStore]:
+        return self.active_index.vector_store if self.active_index else None
+
+    @property
+    def index_version(self) -> Optional[str]:
+        return self.active_index.version if self.active_index else None
+
+    def set_readiness(self, state: str, error: Optional[str] = None):
+        """Move to a readiness state; "ready" and "degraded" release queued searches"""
+        self.readiness = state
+        self.readiness_since = datetime.datetime.now().isoformat()
+        self.readiness_error = error
+        log.info(f"🚦 Readiness: {state}" + (f" ({error})" if error else ""))
+        if state in ("ready", "degraded"):
+            self._settled.set()
+        else:
+            self._settled.clear()
+
+    async def wait_until_settled(self, timeout: float) -> bool:
+        """Wait (up to timeout) for initialization to finish as ready or degraded"""
+        try:
+            await asyncio.wait_for(self._settled.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
 
     async def initialize(self):
-        """Initialize all resources with enhanced logging and error handling"""
+        """Initialize all resources with enhanced logging and error handling.
+
+        Runs as a background task: blocking model construction and index parsing
+        go to worker threads so the SSE endpoint keeps accepting connections.
+        """
         try:
             log.info("🚀 Starting PSX Financial Server initialization...")
+            self.set_readiness("starting")
             
-            log.info("📊 Loading Google embedding model (text-embedding-004)...")
-            self.embed_model = GoogleGenAIEmbedding("text-embedding-004", api_key=GEMINI_API_KEY)
+            log.info(f"📊 Loading Google embedding model ({EMBED_MODEL_NAME})...")
+            # One attempt per call (tenacity stop_after_attempt(1)): embed_guard is the only
+            # retry/fast-fail layer, so a 429 fails fast instead of sleeping in the library
+            self.embed_model = await asyncio.to_thread(
+                GoogleGenAIEmbedding, EMBED_MODEL_NAME, api_key=GEMINI_API_KEY, retries=1
+            )
             log.info("✅ Embedding model loaded successfully")
             
+            # Query embedding cache is optional - searches still work without it
+            try:
+                self.embedding_cache = EmbeddingCache(
+                    EMBEDDING_CACHE_PATH, EMBED_MODEL_NAME, max_memory_entries=EMBEDDING_CACHE_MEMORY_ENTRIES
+                )
+                log.info(f"✅ Embedding cache ready ({self.embedding_cache.stats()['disk_entries']} cached queries on disk)")
+            except Exception as cache_error:
+                self.embedding_cache = None
+                log.warning(f"⚠️ Embedding cache unavailable, embedding every query: {cache_error}")
+            
             log.info("🤖 Loading Google Gemini LLM (2.5 Flash)...")
-            self.llm = GoogleGenAI(model="models/gemini-2.5-flash", api_key=GEMINI_API_KEY, temperature=0.3)
+            self.llm = await asyncio.to_thread(
+                GoogleGenAI, model="models/gemini-2.5-flash", api_key=GEMINI_API_KEY, temperature=0.3
+            )
             log.info("✅ LLM loaded successfully")
             
+            self.set_readiness("loading_index")
             log.info("🗂️ Loading vector index from storage...")
             log.info(f"   Index directory: {INDEX_DIR}")
             
@@ -69,36 +360,244 @@ class EnhancedResourceManager:
             if not INDEX_DIR.exists():
                 raise FileNotFoundError(f"Index directory not found: {INDEX_DIR}")
             
-            storage_context = StorageContext.from_defaults(persist_dir=str(INDEX_DIR))
-            self.index = load_index_from_storage(storage_context, embed_model=self.embed_model)
+            index_version = await asyncio.to_thread(self.load_index_version, INDEX_DIR)
+            log.info(f"   Index version: {index_version.version}")
+            log.info(f"✅ Vector index loaded successfully - {index_version.doc_count} documents available")
             
-            # Get document count with error handling
-            try:
-                doc_count = len(self.index.docstore.docs)
-            except AttributeError:
-                try:
-                    doc_count = len(self.index.docstore.get_all_documents())
-                except:
-                    doc_count = "Unknown"
+            self.set_readiness("warming")
+            await asyncio.to_thread(warm_index_version, index_version)
             
-            log.info(f"✅ Vector index loaded successfully - {doc_count} documents available")
+            # A hot reload that finished first wins
+            if self.active_index is None:
+                self.active_index = index_version
             
             self._initialized = True
+            self.set_readiness("ready")
             log.info("🎉 PSX Financial Server initialization complete!")
             
         except Exception as e:
             log.error(f"❌ Failed to initialize server resources: {e}")
             self._initialized = False
+            self.set_readiness("degraded", str(e))
             # Don't raise - let the server start but return errors for requests
             log.error("Server will start but requests will fail until resources are properly initialized")
 
+    def load_index_version(self, index_dir: Path) -> IndexVersion:
+        """Load the index in index_dir (blocking - call from a worker thread when serving)"""
+        vector_store = None
+        if VECTOR_STORE_BACKEND == "mmap":
+            vector_store = load_mmap_vector_store(index_dir)
+        
+        index = None
+        if vector_store is None:
+            storage_context = StorageContext.from_defaults(persist_dir=str(index_dir))
+            index = load_index_from_storage(storage_context, embed_model=self.embed_model)
+        
+        # Result cache entries are scoped to this fingerprint of the index files
+        version = IndexVersion(compute_index_version(index_dir), index_dir, index=index, vector_store=vector_store)
+        version.build_node_rows()
+        if LEXICAL_INDEX_ENABLED:
+            try:
+                version.build_lexical_index()
+            except Exception as e:
+                log.warning(f"⚠️ BM25 index unavailable, serving dense-only searches: {e}")
+        return version
+
+    async def reload_index(self, source_url: Optional[str] = None) -> Dict[str, Any]:
+        """Load a new index version in the background and swap it in without dropping searches.
+
+        With ``source_url`` the release is downloaded into INDEX_NEXT_DIR first and moved
+        into INDEX_DIR once it has loaded; otherwise INDEX_DIR is re-read as it is on disk.
+        Searches already running finish on the old version, which is closed once drained.
+        """
+        if self._reload_lock.locked():
+            return {"status": "busy", "error": "An index reload is already running", "error_type": "reload_in_progress"}
+        
+        async with self._reload_lock:
+            started = time.time()
+            old_version = self.active_index
+            try:
+                load_dir = INDEX_DIR
+                if source_url:
+                    self.reload_status = {"state": "downloading", "source_url": source_url}
+                    if INDEX_NEXT_DIR.exists():
+                        await asyncio.to_thread(shutil.rmtree, INDEX_NEXT_DIR)
+                    await download_index(
+                        source_url, INDEX_NEXT_DIR, INDEX_DOWNLOAD_DIR,
+                        expected_sha256=INDEX_RELEASE_SHA256,
+                        checksum_url=INDEX_RELEASE_SHA256_URL,
+                        progress=download_progress
+                    )
+                    load_dir = INDEX_NEXT_DIR
+                
+                self.reload_status = {"state": "loading"}
+                log.info(f"🔄 Loading new index version from {load_dir}...")
+                new_version = await asyncio.to_thread(self.load_index_version, load_dir)
+                
+                if old_version is not None and new_version.version == old_version.version:
+                    new_version.close()
+                    if source_url:
+                        await asyncio.to_thread(shutil.rmtree, INDEX_NEXT_DIR, True)
+                    self.reload_status = {"state": "idle", "last_result": "unchanged"}
+                    log.info(f"✅ Index version {old_version.version} is already live - nothing to swap")
+                    return {"status": "unchanged", "index_version": old_version.version}
+                
+                self.reload_status = {"state": "warming"}
+                await asyncio.to_thread(warm_index_version, new_version)
+                
+                if source_url:
+                    # Loaded files stay valid across the rename (mmaps and open handles follow the inode)
+                    await asyncio.to_thread(swap_into_place, INDEX_NEXT_DIR, INDEX_DIR)
+                    new_version.relocate(INDEX_DIR)
+                
+                # Double-buffer swap: new searches pick up new_version from here on
+                self.active_index = new_version
+                if not self._initialized and all([self.embed_model, self.llm]):
+                    self._initialized = True
+                    self.set_readiness("ready")
+                log.info(f"✅ Index version {old_version.version if old_version else None} → {new_version.version} "
+                         f"({new_version.doc_count} documents) in {time.time() - started:.1f}s")
+                
+                if old_version is not None:
+                    self.retiring_indexes.append(old_version)
+                    self.run_in_background(self._retire_index_version(old_version))
+                
+                self.reload_status = {"state": "idle", "last_result": "swapped", "last_reload_at": new_version.loaded_at}
+                return {
+                    "status": "swapped",
+                    "previous_version": old_version.version if old_version else None,
+                    "index_version": new_version.version,
+                    "documents": new_version.doc_count,
+                    "reload_seconds": round(time.time() - started, 2),
+                }
+                
+            except Exception as e:
+                log.error(f"❌ Index reload failed, still serving {old_version.version if old_version else 'nothing'}: {e}")
+                self.reload_status = {"state": "idle", "last_result": "failed", "error": str(e)}
+                return {"status": "failed", "error": f"Index reload failed: {str(e)}", "error_type": "reload_error",
+                        "index_version": self.index_version}
+
+    async def _retire_index_version(self, version: IndexVersion):
+        """Close an old version once its in-flight searches are done"""
+        drained = await version.wait_drained(INDEX_DRAIN_TIMEOUT_SECONDS)
+        if not drained:
+            log.warning(f"⚠️ {version.in_flight} searches still on index {version.version} after "
+                        f"{INDEX_DRAIN_TIMEOUT_SECONDS:.0f}s - releasing it anyway")
+        version.close()
+        self.retiring_indexes.remove(version)
+        gc.collect()
+        log.info(f"🧹 Released index version {version.version}")
+
+    def run_in_background(self, coro):
+        """Start a task and keep a reference until it finishes"""
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
     @property
     def is_healthy(self) -> bool:
-        return self._initialized and all([self.embed_model, self.llm, self.index])
+        has_index = self.index is not None or self.vector_store is not None
+        return self._initialized and all([self.embed_model, self.llm]) and has_index
 
 # Global resource manager
 resource_manager = EnhancedResourceManager()
 
+# Debug contexts go to rotated, compressed JSONL segments written by a background task
+context_writer = ContextWriter(
+    CONTEXT_DIR,
+    prefix=f"context_w{WORKER_ID}" if WORKER_ID is not None else "context",
+    sample_rate=CONTEXT_SAMPLE_RATE,
+    segment_max_bytes=CONTEXT_SEGMENT_MAX_MB * 1024 * 1024,
+    max_total_bytes=CONTEXT_DISK_BUDGET_MB * 1024 * 1024
+)
+
+# Index download status, reported by the health check
+download_progress = DownloadProgress()
+
+# ─────────────────────────── Metrics ────────────────────────────────────
+metrics = MetricsRegistry(namespace="psx")
+search_stage_seconds = metrics.histogram("search_stage_seconds", "Time spent in each search_financial_data stage")
+search_seconds = metrics.histogram("search_seconds", "End-to-end search_financial_data latency")
+searches_total = metrics.counter("searches_total", "search_financial_data calls by outcome (ok, cache_hit, coalesced or error_type)")
+search_modes_total = metrics.counter(
+    "search_modes_total", "Searches by retrieval mode (hybrid, dense, sparse, sparse_fallback, exact_match)"
+)
+embedding_request_seconds = metrics.histogram("embedding_request_seconds", "Latency of embedding model requests (cache misses only)")
+embedded_queries = metrics.counter("embedded_queries_total", "Query strings sent to the embedding model")
+embedding_batches = metrics.counter("embedding_batches_total", "Micro-batched embedding requests sent to the model")
+embedding_batch_callers = metrics.counter(
+    "embedding_batch_callers_total", "embed_queries calls served by micro-batched requests (callers per batch summed)"
+)
+tool_seconds = metrics.histogram("tool_seconds", "MCP tool call latency")
+tool_calls_total = metrics.counter("tool_calls_total", "MCP tool calls by tool and outcome (ok or error_type)")
+in_flight_requests = metrics.gauge("in_flight_requests", "MCP tool calls currently running")
+
+def _cache_ratios():
+    ratios = [({"cache": "result"}, resource_manager.result_cache.stats()["hit_ratio"])]
+    if resource_manager.embedding_cache:
+        ratios.append(({"cache": "embedding"}, resource_manager.embedding_cache.stats()["hit_ratio"]))
+    return ratios
+
+metrics.callback_gauge("cache_hit_ratio", "Hit ratio of the result and query-embedding caches", _cache_ratios)
+metrics.callback_gauge(
+    "index_in_flight_searches", "Searches pinned to the active index version",
+    lambda: resource_manager.active_index.in_flight if resource_manager.active_index else 0
+)
+metrics.callback_gauge(
+    "readiness", "1 for the current readiness state",
+    lambda: [({"state": state}, 1.0 if resource_manager.readiness == state else 0.0) for state in READINESS_STATES]
+)
+metrics.callback_gauge(
+    "embedding_batch_size", "Mean and largest distinct query count per micro-batched embedding request",
+    lambda: [({"stat": stat}, resource_manager.embed_batcher.stats()[key])
+             for stat, key in (("mean", "mean_batch_size"), ("max", "largest_batch"))]
+    if resource_manager.embed_batcher else None
+)
+metrics.callback_counter(
+    "model_throttled_seconds_total", "Cumulative seconds embedding requests waited for a rate-limit token",
+    lambda: [({"model": EMBED_MODEL_NAME}, resource_manager.embed_guard.stats()["throttled_seconds"])]
+)
+metrics.callback_counter(
+    "model_circuit_open_seconds_total", "Cumulative seconds the embedding model's circuit has been open",
+    lambda: [({"model": EMBED_MODEL_NAME}, resource_manager.embed_guard.stats()["open_seconds"])]
+)
+metrics.callback_counter(
+    "model_fast_failures_total", "Embedding calls refused locally, by reason (rate_limited, circuit_open)",
+    lambda: [({"model": EMBED_MODEL_NAME, "reason": reason}, count)
+             for reason, count in resource_manager.embed_guard.stats()["rejections"].items()]
+)
+metrics.callback_gauge("coalesced_searches_in_flight", "Distinct searches currently being computed for one or more callers",
+                       lambda: resource_manager.search_flights.stats()["in_flight"])
+metrics.callback_gauge("context_queue_depth", "Debug context records waiting to be written",
+                       lambda: context_writer.stats()["queued"])
+
+def record_embedding_batch(texts: int, callers: int):
+    embedding_batches.inc()
+    embedding_batch_callers.inc(callers)
+
+def record_search(outcome: str, started: float):
+    search_seconds.observe(time.perf_counter() - started)
+    searches_total.inc(outcome=outcome)
+
+def instrument_tool(fn):
+    """Count, time and track in-flight calls of an MCP tool (outcome = returned error_type or ok)"""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        tool = fn.__name__
+        in_flight_requests.inc(tool=tool)
+        started = time.perf_counter()
+        outcome = "exception"
+        try:
+            result = await fn(*args, **kwargs)
+            outcome = (result.get("error_type") or "ok") if isinstance(result, dict) else "ok"
+            return result
+        finally:
+            in_flight_requests.dec(tool=tool)
+            tool_seconds.observe(time.perf_counter() - started, tool=tool)
+            tool_calls_total.inc(tool=tool, outcome=outcome)
+    return wrapper
+
 # Load static data with error handling
 try:
     with open(TICKERS_PATH, encoding="utf-8") as f:
@@ -109,25 +608,27 @@ except Exception as e:
     TICKERS = []
 
 # ─────────────────────────── Index Download Function ────────────────────
-async def download_index_if_needed():
+async def download_index_if_needed(url: Optional[str] = None, target_dir: Path = INDEX_DIR,
+                                   work_dir: Path = INDEX_DOWNLOAD_DIR) -> bool:
     """Download index from GitHub Releases if not present"""
-    if INDEX_DIR.exists() and (INDEX_DIR / "default__vector_store.json").exists():
+    index_files = [target_dir / "default__vector_store.json", target_dir / STORE_DIRNAME / "manifest.json"]
+    if target_dir.exists() and any(path.exists() for path in index_files):
         log.info("✅ Index already available locally")
         return True
     
+    url = url or INDEX_RELEASE_URL
+    if not url:
+        log.error("❌ INDEX_RELEASE_URL not set")
+        return False
+    
     try:
-        url = os.getenv("INDEX_RELEASE_URL")
-        if not url:
-            log.error("❌ INDEX_RELEASE_URL not set")
-            return False
-            
         log.info("📥 Downloading index from GitHub Releases...")
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        
-        with tarfile.open(fileobj=response.raw, mode='r|gz') as tar:
-            tar.extractall(BASE_DIR)
-        
+        await download_index(
+            url, target_dir, work_dir,
+            expected_sha256=INDEX_RELEASE_SHA256,
+            checksum_url=INDEX_RELEASE_SHA256_URL,
+            progress=download_progress
+        )
         log.info("✅ Index download complete")
         return True
         
@@ -135,167 +636,776 @@ async def download_index_if_needed():
         log.error(f"❌ Index download failed: {e}")
         return False
 
+def load_mmap_vector_store(index_dir: Path = INDEX_DIR):
+    """Open the mmap vector store, converting the JSON index first if needed.
+
+    Returns None (so the JSON index is loaded instead) when conversion fails.
+    """
+    store_dir = index_dir / STORE_DIRNAME
+    try:
+        if not is_store_current(index_dir, store_dir, dtype=VECTOR_STORE_DTYPE, rescore=VECTOR_STORE_RESCORE):
+            log.info("🔧 Mmap vector store missing or stale - converting JSON index (one-time)...")
+            convert_index(index_dir, store_dir, dtype=VECTOR_STORE_DTYPE, rescore=VECTOR_STORE_RESCORE)
+        store = MmapVectorStore.load(store_dir, rescore=VECTOR_STORE_RESCORE, rescore_oversample=VECTOR_RESCORE_OVERSAMPLE)
+    except Exception as e:
+        log.warning(f"⚠️ Mmap vector store unavailable, falling back to JSON index: {e}")
+        return None
+    
+    if VECTOR_SEARCH_ENGINE == "ivf":
+        try:
+            store.enable_ivf(n_lists=IVF_NLISTS, nprobe=IVF_NPROBE, exact_threshold=IVF_EXACT_THRESHOLD)
+            log.info(f"✅ Approximate search enabled: {store.engine_stats()}")
+        except Exception as e:
+            log.warning(f"⚠️ IVF engine unavailable, using exact search: {e}")
+    return store
+
+def load_or_build_lexical_index(store: MmapVectorStore) -> BM25Index:
+    """The BM25 index saved next to an mmap store, building and saving it if missing or stale"""
+    created_at = store.manifest.get("created_at", "")
+    lexical_index = BM25Index.load(store.store_dir, created_at)
+    if lexical_index is None:
+        log.info("🔧 Building BM25 index for hybrid search...")
+        lexical_index = BM25Index.build(store.get_text(row) for row in range(store.count))
+        try:
+            lexical_index.save(store.store_dir, created_at)
+        except OSError as e:
+            log.warning(f"⚠️ Could not save BM25 index (it will be rebuilt next start): {e}")
+    return lexical_index
+
+def warm_index_version(version: IndexVersion):
+    """Touch a freshly loaded index so the first real searches don't pay for page faults"""
+    if version.vector_store is not None:
+        # A full exact pass pages in the whole embedding matrix, even when IVF serves searches
+        store = version.vector_store
+        rows, _ = score_top_k(store.embeddings, normalize_vector([1.0] * store.dim), 1)
+        for row in rows:
+            store.get_node(int(row))
+    elif version.index is not None:
+        embeddings = version.index.vector_store.data.embedding_dict
+        probe = next(iter(embeddings.values()), None)
+        if probe is not None:
+            version.index.as_retriever(similarity_top_k=1).retrieve(QueryBundle(query_str="", embedding=probe))
+    if version.lexical_index is not None:
+        # Page in the BM25 postings as well
+        version.lexical_index.rows.sum()
+        version.lexical_index.weights.sum()
+
 # ─────────────────────────── Enhanced Core Functions ────────────────────
-def save_context(query: str, nodes: List[NodeWithScore], metadata: Dict) -> str:
-    """Save retrieval context for debugging with enhanced error handling and unique filenames"""
+def save_context(query: str, nodes: List[Dict[str, Any]], metadata: Dict) -> str:
+    """Queue retrieval context for debugging; written off the request path by context_writer"""
     try:
-        # Create unique timestamp with milliseconds
-        now = datetime.datetime.now()
-        timestamp = now.strftime("%Y%m%d_%H%M%S")
-        milliseconds = now.microsecond // 1000
-        
-        # Create a short hash of the query to ensure uniqueness
-        query_hash = hashlib.md5(query.encode()).hexdigest()[:8]
-        
-        context_dir = BASE_DIR / "enhanced_contexts"
-        context_dir.mkdir(exist_ok=True)
-        filename = context_dir / f"context_{timestamp}_{milliseconds:03d}_{query_hash}.json"
-        
-        # Ensure filename is unique (fallback if somehow still conflicts)
-        counter = 1
-        while filename.exists():
-            filename = context_dir / f"context_{timestamp}_{milliseconds:03d}_{query_hash}_{counter}.json"
-            counter += 1
-            if counter > 100:  # Prevent infinite loop
-                break
-        
-        serialized_nodes = [
-            {
-                "node_id": n.node.node_id,
-                "text": n.node.text,
-                "metadata": n.node.metadata,
-                "score": n.score,
-            }
-            for n in nodes
-        ]
-        
-        context = {
-            "timestamp": timestamp,
+        record_id = context_writer.submit({
+            "save_time": datetime.datetime.now().isoformat(),
             "query": query,
-            "query_hash": query_hash,
             "metadata": metadata,
-            "nodes": serialized_nodes,
+            "nodes": nodes,
             "node_count": len(nodes),
-            "server_version": "enhanced",
-            "save_time": now.isoformat()
-        }
-        
-        filename.write_text(json.dumps(context, indent=2))
-        log.info(f"📁 Context saved: {filename.name}")
-        return str(filename)
+            "server_version": "enhanced"
+        })
+        if record_id:
+            log.debug(f"📁 Context queued: {record_id}")
+        return record_id
         
     except Exception as e:
         log.warning(f"⚠️ Failed to save context: {e}")
         return ""
 
-async def search_financial_data(search_query: str, metadata_filters: Dict[str, Any], top_k: int = 15) -> Dict[str, Any]:
-    """Enhanced semantic search with comprehensive error handling"""
+async def retrieve_from_llama_index(index, search_query: str, metadata_filters: Dict[str, Any], top_k: int,
+                                    query_embedding: List[float]) -> List[Dict[str, Any]]:
+    """Retrieve through the llama-index JSON vector store (fallback when no mmap store is loaded)"""
+    # Build metadata filters with proven logic (unchanged from working version)
+    standard_filters = []
+    filing_period_filters = []
+    
+    for key, value in metadata_filters.items():
+        if value is not None:
+            if key == "filing_period" and isinstance(value, list):
+                # Handle filing_period with OR logic - each period should be a separate filter
+                for period in value:
+                    if period and str(period).strip():
+                        filing_period_filters.append(MetadataFilter(key=key, value=str(period).strip()))
+                        log.debug(f"Added filing_period filter: {key} = {period}")
+            else:
+                # Handle all other filters with AND logic
+                standard_filters.append(MetadataFilter(key=key, value=str(value)))
+                log.debug(f"Added standard filter: {key} = {value}")
+    
+    # Execute search with proper filter combination (proven working approach)
+    retriever_kwargs = {"similarity_top_k": top_k}
+    
+    if standard_filters or filing_period_filters:
+        if filing_period_filters and standard_filters:
+            # Combine both types: standard filters with AND, filing_period with OR
+            retriever_kwargs["filters"] = MetadataFilters(
+                filters=standard_filters,
+                condition="and",
+                filters_with_or=[filing_period_filters]
+            )
+            log.debug("Using combined AND/OR filter logic")
+        elif filing_period_filters:
+            # Only filing period filters with OR logic
+            retriever_kwargs["filters"] = MetadataFilters(
+                filters=filing_period_filters,
+                condition="or"
+            )
+            log.debug("Using OR logic for filing_period only")
+        else:
+            # Only standard filters with AND logic
+            retriever_kwargs["filters"] = MetadataFilters(
+                filters=standard_filters,
+                condition="and"
+            )
+            log.debug("Using AND logic for standard filters only")
+    
+    retriever = index.as_retriever(**retriever_kwargs)
+    nodes = await retriever.aretrieve(QueryBundle(query_str=search_query, embedding=query_embedding))
+    
+    # Serialize results
+    serialized_nodes = [
+        {
+            "node_id": node.node.node_id,
+            "text": node.node.text,
+            "metadata": node.node.metadata,
+            "score": node.score,
+        }
+        for node in nodes
+    ]
+    return serialized_nodes
+
+def fuse_rankings(index_version: IndexVersion, dense_hits: List[tuple], sparse_hits: List[tuple], top_k: int,
+                  query_embedding: List[float]) -> List[Dict[str, Any]]:
+    """Serialize the top_k rows of the reciprocal rank fusion of the dense and BM25 rankings.
+
+    ``score`` stays the cosine similarity (computed for rows only BM25 found) so the
+    client's relevance threshold keeps its meaning; the fused and BM25 scores ride along.
+    """
+    fused = reciprocal_rank_fusion([[row for row, _ in dense_hits], [row for row, _ in sparse_hits]])[:top_k]
+    dense_scores = dict(dense_hits)
+    bm25_scores = dict(sparse_hits)
+    missing = [row for row, _ in fused if row not in dense_scores]
+    if missing:
+        dense_scores.update(zip(missing, index_version.similarity(query_embedding, missing)))
+    
+    nodes = []
+    for row, fusion_score in fused:
+        node = index_version.get_node(row, dense_scores[row])
+        node["fusion_score"] = round(fusion_score, 6)
+        if row in bm25_scores:
+            node["bm25_score"] = bm25_scores[row]
+        nodes.append(node)
+    return nodes
+
+def pins_chunk_set(metadata_filters: Dict[str, Any], candidate_rows, top_k: int) -> bool:
+    """True when the filters pin a statement and select at most top_k chunks, so no similarity search is needed.
+
+    Other filter sets (notes, ticker-only) keep the similarity ranking even when few chunks match.
+    """
+    pins_statement = (str(metadata_filters.get("is_statement", "")).lower() == "yes"
+                      and all(metadata_filters.get(key) for key in STATEMENT_PIN_FILTERS))
+    return EXACT_MATCH_PATH and pins_statement and candidate_rows is not None and len(candidate_rows) <= top_k
+
+def document_order(node: Dict[str, Any]):
+    metadata = node["metadata"]
+    chunk_number = str(metadata.get("chunk_number", ""))
+    return str(metadata.get("source_file", "")), int(chunk_number) if chunk_number.isdigit() else float("inf")
+
+def serialize_exact_matches(index_version: IndexVersion, candidate_rows) -> List[Dict[str, Any]]:
+    """Serialize every filtered row in document/chunk order.
+
+    Nothing was scored, so ``score`` is None and ``exact_match`` marks the rows as
+    the complete chunk set of the pinned statement.
+    """
+    nodes = [{**index_version.get_node(int(row), None), "exact_match": True} for row in candidate_rows]
+    return sorted(nodes, key=document_order)
+
+def merge_rank(node: Dict[str, Any]):
+    """Sort key across specs: cosine hits by score, then exact matches, then BM25-only hits (no score)"""
+    if node.get("score") is not None:
+        return 0, -node["score"]
+    return (1 if node.get("exact_match") else 2), 0
+
+def is_relevant(node: Dict[str, Any], min_score: float) -> bool:
+    """Above the relevance bar, or part of the exact chunk set the filters pinned"""
+    return bool(node.get("exact_match")) or (node.get("score") or 0) > min_score
+
+def serialize_sparse_hits(index_version: IndexVersion, sparse_hits: List[tuple]) -> List[Dict[str, Any]]:
+    """Serialize BM25-only hits in BM25 order.
+
+    There is no cosine similarity, so ``score`` is None: BM25 is not on the cosine
+    scale and relative BM25 (the top hit is always 1.0) would clear any relevance
+    threshold. The raw and relative BM25 scores ride along instead.
+    """
+    best = sparse_hits[0][1] if sparse_hits else 1.0
+    return [
+        {**index_version.get_node(row, None), "bm25_score": score, "bm25_relative_score": round(score / best, 6)}
+        for row, score in sparse_hits
+    ]
+
+async def run_search(index_version: IndexVersion, search_query: str, metadata_filters: Dict[str, Any], top_k: int,
+                     search_mode: str, cache_key: str, query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+    """Embed (if needed), filter, score and serialize one search on a pinned index version"""
+    index_version.acquire()
     try:
-        # Check resource health first
-        if not resource_manager.is_healthy:
-            return {
-                "nodes": [], 
-                "error": "Server resources not properly initialized",
-                "error_type": "initialization_error"
-            }
-        
-        log.info(f"🔍 Processing search: '{search_query[:50]}...' with {len(metadata_filters)} filters")
+        embedding_timed_out = False
+        with search_stage_seconds.time(stage="filter"):
+            candidate_rows = index_version.filter_rows(metadata_filters)
         
-        # Build metadata filters with proven logic (unchanged from working version)
-        standard_filters = []
-        filing_period_filters = []
-        
-        for key, value in metadata_filters.items():
-            if value is not None:
-                if key == "filing_period" and isinstance(value, list):
-                    # Handle filing_period with OR logic - each period should be a separate filter
-                    for period in value:
-                        if period and str(period).strip():
-                            filing_period_filters.append(MetadataFilter(key=key, value=str(period).strip()))
-                            log.debug(f"Added filing_period filter: {key} = {period}")
+        if pins_chunk_set(metadata_filters, candidate_rows, top_k):
+            log.info(f"🎯 Filters pin {len(candidate_rows)} chunks (top_k {top_k}) - skipping embedding and similarity")
+            search_mode = "exact_match"
+        elif query_embedding is None and search_mode != "sparse":
+            with search_stage_seconds.time(stage="embedding"):
+                if search_mode == "hybrid" and HYBRID_EMBED_TIMEOUT_SECONDS > 0:
+                    embeddings = await embed_queries_with_deadline([search_query], HYBRID_EMBED_TIMEOUT_SECONDS)
+                    query_embedding = embeddings[0] if embeddings else None
                 else:
-                    # Handle all other filters with AND logic
-                    standard_filters.append(MetadataFilter(key=key, value=str(value)))
-                    log.debug(f"Added standard filter: {key} = {value}")
-        
-        # Execute search with proper filter combination (proven working approach)
-        retriever_kwargs = {"similarity_top_k": top_k}
-        
-        if standard_filters or filing_period_filters:
-            if filing_period_filters and standard_filters:
-                # Combine both types: standard filters with AND, filing_period with OR
-                retriever_kwargs["filters"] = MetadataFilters(
-                    filters=standard_filters,
-                    condition="and",
-                    filters_with_or=[filing_period_filters]
-                )
-                log.debug("Using combined AND/OR filter logic")
-            elif filing_period_filters:
-                # Only filing period filters with OR logic
-                retriever_kwargs["filters"] = MetadataFilters(
-                    filters=filing_period_filters,
-                    condition="or"
+                    query_embedding = (await embed_queries([search_query]))[0]
+            if query_embedding is None:
+                # Sparse fast path: BM25 needs no embedding, so a slow embedding API doesn't stall the search
+                log.warning(f"⏱️ Query embedding unavailable within {HYBRID_EMBED_TIMEOUT_SECONDS}s - answering from BM25 only")
+                search_mode, embedding_timed_out = "sparse", True
+        
+        if search_mode == "exact_match":
+            with search_stage_seconds.time(stage="serialization"):
+                serialized_nodes = serialize_exact_matches(index_version, candidate_rows)
+        elif search_mode != "dense":
+            # BM25 and dense rankings over the same filtered rows, fused by rank
+            depth = max(top_k, HYBRID_CANDIDATE_DEPTH) if search_mode == "hybrid" else top_k
+            with search_stage_seconds.time(stage="lexical"):
+                rows, scores = index_version.lexical_index.search(
+                    search_query, depth, candidate_rows,
+                    min_relative_score=HYBRID_BM25_MIN_RELATIVE_SCORE if search_mode == "hybrid" else 0.0
                 )
-                log.debug("Using OR logic for filing_period only")
+                sparse_hits = list(zip(rows.tolist(), scores.tolist()))
+            if search_mode == "sparse":
+                with search_stage_seconds.time(stage="serialization"):
+                    serialized_nodes = serialize_sparse_hits(index_version, sparse_hits)
             else:
-                # Only standard filters with AND logic
-                retriever_kwargs["filters"] = MetadataFilters(
-                    filters=standard_filters,
-                    condition="and"
+                if index_version.vector_store is not None:
+                    with search_stage_seconds.time(stage="scoring"):
+                        dense_hits = index_version.vector_store.search(query_embedding, depth, candidate_rows)
+                else:
+                    with search_stage_seconds.time(stage="retrieval"):
+                        dense_nodes = await retrieve_from_llama_index(
+                            index_version.index, search_query, metadata_filters, depth, query_embedding
+                        )
+                    dense_hits = [(index_version.row_of(n["node_id"]), n["score"]) for n in dense_nodes]
+                    dense_hits = [(row, score) for row, score in dense_hits if row is not None]
+                with search_stage_seconds.time(stage="fusion"):
+                    serialized_nodes = fuse_rankings(index_version, dense_hits, sparse_hits, top_k, query_embedding)
+        elif index_version.vector_store is not None:
+            # Memory-mapped store: scores only the filtered candidate rows
+            store = index_version.vector_store
+            with search_stage_seconds.time(stage="scoring"):
+                hits = store.search(query_embedding, top_k, candidate_rows)
+            with search_stage_seconds.time(stage="serialization"):
+                serialized_nodes = [store.get_node(row, score) for row, score in hits]
+        else:
+            # llama-index filters, scores and serializes in one call
+            with search_stage_seconds.time(stage="retrieval"):
+                serialized_nodes = await retrieve_from_llama_index(
+                    index_version.index, search_query, metadata_filters, top_k, query_embedding
                 )
-                log.debug("Using AND logic for standard filters only")
-        
-        retriever = resource_manager.index.as_retriever(**retriever_kwargs)
-        nodes = await retriever.aretrieve(search_query)
-        
-        # Serialize results
-        serialized_nodes = [
-            {
-                "node_id": node.node.node_id,
-                "text": node.node.text,
-                "metadata": node.node.metadata,
-                "score": node.score,
-            }
-            for node in nodes
-        ]
         
         # Save context for debugging
-        context_file = save_context(search_query, nodes, metadata_filters)
+        with search_stage_seconds.time(stage="context_save"):
+            context_file = save_context(search_query, serialized_nodes, metadata_filters)
         
         result = {
             "nodes": serialized_nodes,
             "total_found": len(serialized_nodes),
             "search_query": search_query,
             "filters_applied": metadata_filters,
+            "search_mode": "sparse_fallback" if embedding_timed_out else search_mode,
             "context_file": context_file if context_file else None
         }
+        search_modes_total.inc(mode=result["search_mode"])
+        # A BM25-only answer given for a slow embedding shouldn't stand in for the hybrid result
+        if not embedding_timed_out:
+            resource_manager.result_cache.put(cache_key, index_version.version, result)
+        return result
+    finally:
+        index_version.release()
+
+async def search_financial_data(search_query: str, metadata_filters: Dict[str, Any], top_k: int = 15,
+                                query_embedding: Optional[List[float]] = None,
+                                search_mode: Optional[str] = None) -> Dict[str, Any]:
+    """Enhanced semantic search with comprehensive error handling.
+
+    A precomputed ``query_embedding`` (from a batched embedding call) skips the
+    per-query embedding request. ``search_mode`` is hybrid, dense or sparse
+    (default SEARCH_MODE). Each stage is timed into search_stage_seconds.
+    Identical concurrent searches share one computation (``coalesced`` is set
+    on the copies handed to the callers that joined it).
+    """
+    started = time.perf_counter()
+    try:
+        # Check readiness first (queues briefly while the index is still loading)
+        not_ready = await await_readiness()
+        if not_ready:
+            record_search(not_ready["error_type"], started)
+            return {"nodes": [], **not_ready}
+        
+        search_mode = (search_mode or SEARCH_MODE).lower()
+        if search_mode not in SEARCH_MODES:
+            record_search("invalid_search_mode", started)
+            return {
+                "nodes": [],
+                "error": f"Unknown search_mode '{search_mode}' (expected one of {', '.join(SEARCH_MODES)})",
+                "error_type": "invalid_search_mode",
+                "search_query": search_query,
+                "filters_applied": metadata_filters
+            }
+        
+        log.info(f"🔍 Processing {search_mode} search: '{search_query[:50]}...' with {len(metadata_filters)} filters")
+        
+        # Pin the live index version so a concurrent hot reload can't swap it mid-search
+        index_version = resource_manager.active_index
+        index_version.acquire()
+        try:
+            if index_version.lexical_index is None:
+                search_mode = "dense"
+            
+            # Serve repeated searches from the result cache (no embedding, no scoring)
+            with search_stage_seconds.time(stage="cache_lookup"):
+                cache_key = ResultCache.make_key(search_query, metadata_filters, top_k, search_mode=search_mode)
+                cached_result = resource_manager.result_cache.get(cache_key, index_version.version)
+            if cached_result is not None:
+                log.info(f"⚡ Result cache hit: {cached_result['total_found']} nodes")
+                record_search("cache_hit", started)
+                return {**cached_result, "filters_applied": metadata_filters, "cache_hit": True}
+            
+            # Identical searches already running are joined rather than recomputed
+            result, coalesced = await resource_manager.search_flights.do(
+                f"{index_version.version}|{cache_key}",
+                lambda: run_search(index_version, search_query, metadata_filters, top_k, search_mode, cache_key,
+                                   query_embedding)
+            )
+        finally:
+            index_version.release()
         
-        log.info(f"✅ Search completed: {len(serialized_nodes)} nodes found")
+        if coalesced:
+            log.info(f"🔗 Joined an identical in-flight search: {result['total_found']} nodes")
+            record_search("coalesced", started)
+            return {**result, "filters_applied": metadata_filters, "coalesced": True}
+        
+        log.info(f"✅ Search completed: {result['total_found']} nodes found")
+        record_search("ok", started)
         return result
         
+    except ModelUnavailableError as e:
+        log.warning(f"🚫 Search failed fast: {e}")
+        record_search(e.error_type, started)
+        return {"nodes": [], **e.to_dict(), "search_query": search_query, "filters_applied": metadata_filters}
     except Exception as e:
         log.error(f"❌ Search error: {e}")
+        # Throttling/overload from the model API is fast-fail too, so clients don't pile on retries
+        error_type = "model_overloaded" if is_overload_error(e) else "search_error"
+        record_search(error_type, started)
         # Always return dictionary instead of raising exception
         return {
             "nodes": [], 
             "error": f"Search failed: {str(e)}", 
-            "error_type": "search_error",
+            "error_type": error_type,
             "search_query": search_query,
             "filters_applied": metadata_filters
         }
 
+async def embed_queries(queries: List[str]) -> List[List[float]]:
+    """Embed query strings, serving repeats from the embedding cache and batching the rest"""
+    unique_queries = list(dict.fromkeys(queries))
+    cache = resource_manager.embedding_cache
+    vectors: Dict[str, List[float]] = {}
+    
+    if cache:
+        for query in unique_queries:
+            cached = cache.get_from_memory(query)
+            if cached is not None:
+                vectors[query] = cached
+        pending = [q for q in unique_queries if q not in vectors]
+        if pending:
+            disk_vectors = await asyncio.to_thread(lambda: {q: cache.get_from_disk(q) for q in pending})
+            vectors.update({q: v for q, v in disk_vectors.items() if v is not None})
+    
+    missing = [q for q in unique_queries if q not in vectors]
+    if missing:
+        # Concurrent searches' misses share one embedding request through the micro-batcher
+        embed = resource_manager.embed_batcher.embed if resource_manager.embed_batcher else _embed_uncached_queries
+        computed = dict(zip(missing, await embed(missing)))
+        vectors.update(computed)
+        if cache:
+            try:
+                await asyncio.to_thread(cache.put_many, computed)
+            except Exception as e:
+                log.warning(f"⚠️ Failed to store query embeddings in cache: {e}")
+    
+    log.debug(f"Embedded {len(unique_queries)} queries ({len(missing)} via embedding API)")
+    return [vectors[q] for q in queries]
+
+async def embed_queries_with_deadline(queries: List[str], timeout: float) -> Optional[List[List[float]]]:
+    """embed_queries, or None after timeout, a rate-limit/circuit refusal or an overloaded model.
+
+    After a timeout the request keeps running and fills the embedding cache.
+    """
+    task = resource_manager.run_in_background(embed_queries(queries))
+    # Late failures are expected once nobody is waiting - mark them retrieved
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    done, _ = await asyncio.wait({task}, timeout=timeout)
+    if task not in done:
+        return None
+    error = task.exception()
+    if isinstance(error, ModelUnavailableError) or (error is not None and is_overload_error(error)):
+        log.warning(f"🚫 Query embedding unavailable: {error}")
+        return None
+    return task.result()
+
+async def _embed_uncached_queries(queries: List[str]) -> List[List[float]]:
+    """Embed several query strings with batched embedding requests of at most EMBED_BATCH_MAX_SIZE texts"""
+    max_size = max(1, EMBED_BATCH_MAX_SIZE)
+    if len(queries) > max_size:
+        # Only without the micro-batcher (which already caps its batches): split as EmbeddingBatcher._flush does
+        chunks = [queries[i:i + max_size] for i in range(0, len(queries), max_size)]
+        return [vector for vectors in await asyncio.gather(*(_embed_uncached_queries(c) for c in chunks))
+                for vector in vectors]
+    embed_model = resource_manager.embed_model
+
+    async def request():
+        embedded_queries.inc(len(queries))
+        with embedding_request_seconds.time():
+            if hasattr(embed_model, "_aembed_texts"):
+                # GoogleGenAIEmbedding only exposes batching for document embeddings,
+                # so call the underlying batch method with the query task type.
+                return await embed_model._aembed_texts(queries, task_type="RETRIEVAL_QUERY")
+            return list(await asyncio.gather(*(embed_model.aget_query_embedding(q) for q in queries)))
+
+    # Paced and circuit-broken; refusals raise ModelUnavailableError without calling Gemini
+    return await resource_manager.embed_guard.call(request)
+
+async def batch_search_financial_data(query_specs: List[Dict[str, Any]], default_top_k: int = 10) -> Dict[str, Any]:
+    """Run a whole list of search specs with one embedding call and concurrent retrieval"""
+    try:
+        not_ready = await await_readiness()
+        if not_ready:
+            return {"results": [], "nodes": [], **not_ready}
+
+        if not query_specs:
+            return {"results": [], "nodes": [], "total_found": 0, "queries_executed": 0}
+
+        # Normalize specs once so embedding and retrieval see the same query strings
+        active_index = resource_manager.active_index
+        has_lexical_index = active_index.lexical_index is not None
+        normalized_specs = []
+        for spec in query_specs:
+            search_mode = str(spec.get("search_mode") or SEARCH_MODE).lower()
+            normalized_specs.append({
+                "search_query": str(spec.get("search_query") or "").strip(),
+                "metadata_filters": spec.get("metadata_filters") or {},
+                "top_k": int(spec.get("top_k") or default_top_k),
+                "search_mode": search_mode if has_lexical_index or search_mode not in SEARCH_MODES else "dense",
+            })
+
+        # Embed each distinct query string exactly once, skipping sparse specs, specs whose filters
+        # pin the chunk set and specs the result cache will answer
+        result_cache = resource_manager.result_cache
+        embedded_specs = [
+            s for s in normalized_specs
+            if s["search_query"] and s["search_mode"] in ("hybrid", "dense")
+            and not pins_chunk_set(s["metadata_filters"], active_index.filter_rows(s["metadata_filters"]), s["top_k"])
+            and not result_cache.peek(
+                ResultCache.make_key(s["search_query"], s["metadata_filters"], s["top_k"], search_mode=s["search_mode"]),
+                resource_manager.index_version
+            )
+        ]
+        unique_queries = list(dict.fromkeys(s["search_query"] for s in embedded_specs))
+        log.info(f"📦 Batch search: {len(normalized_specs)} specs, {len(unique_queries)} distinct query strings")
+        
+        embeddings, embedding_timed_out = {}, False
+        if unique_queries:
+            if HYBRID_EMBED_TIMEOUT_SECONDS > 0 and all(s["search_mode"] == "hybrid" for s in embedded_specs):
+                vectors = await embed_queries_with_deadline(unique_queries, HYBRID_EMBED_TIMEOUT_SECONDS)
+                if vectors is None:
+                    log.warning(f"⏱️ Batch embedding unavailable within {HYBRID_EMBED_TIMEOUT_SECONDS}s - answering from BM25 only")
+                    embedding_timed_out = True
+                else:
+                    embeddings = dict(zip(unique_queries, vectors))
+            else:
+                embeddings = dict(zip(unique_queries, await embed_queries(unique_queries)))
+
+        results = await asyncio.gather(*(
+            search_financial_data(
+                spec["search_query"],
+                spec["metadata_filters"],
+                spec["top_k"],
+                query_embedding=embeddings.get(spec["search_query"]),
+                search_mode="sparse" if embedding_timed_out and spec["search_mode"] == "hybrid" else spec["search_mode"]
+            )
+            for spec in normalized_specs
+        ))
+
+        # Merge nodes across specs, keeping the best-ranked copy of each chunk
+        merged: Dict[str, Dict[str, Any]] = {}
+        for result in results:
+            for node in result.get("nodes", []):
+                existing = merged.get(node["node_id"])
+                if existing is None or merge_rank(node) < merge_rank(existing):
+                    merged[node["node_id"]] = node
+
+        merged_nodes = sorted(merged.values(), key=merge_rank)
+        failed = sum(1 for r in results if "error" in r)
+        log.info(f"✅ Batch search completed: {len(merged_nodes)} unique nodes, {failed}/{len(results)} specs failed")
+
+        return {
+            "results": list(results),
+            "nodes": merged_nodes,
+            "total_found": len(merged_nodes),
+            "queries_executed": len(results),
+            "failed_queries": failed,
+            "embedding_timeout": embedding_timed_out
+        }
+
+    except ModelUnavailableError as e:
+        log.warning(f"🚫 Batch search failed fast: {e}")
+        return {"results": [], "nodes": [], **e.to_dict()}
+    except Exception as e:
+        log.error(f"❌ Batch search error: {e}")
+        return {
+            "results": [],
+            "nodes": [],
+            "error": f"Batch search failed: {str(e)}",
+            "error_type": "batch_search_error"
+        }
+
+def refinement_ladder(search_query: str, metadata_filters: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """The client's three attempts: as asked, "TICKER statement type", then "TICKER financial statement"
+    without the statement_type filter (steps that don't apply repeat the previous attempt)"""
+    ticker = metadata_filters.get("ticker")
+    statement_type = metadata_filters.get("statement_type")
+    ladder = [(search_query, metadata_filters)]
+    if isinstance(ticker, str) and ticker and isinstance(statement_type, str) and statement_type:
+        ladder.append((f"{ticker} {statement_type.replace('_', ' ')}", metadata_filters))
+    else:
+        ladder.append(ladder[-1])
+    if isinstance(ticker, str) and ticker:
+        ladder.append((f"{ticker} financial statement",
+                       {k: v for k, v in metadata_filters.items() if k != "statement_type"}))
+    else:
+        ladder.append(ladder[-1])
+    return ladder
+
+def judge_ladder(search_query: str, metadata_filters: Dict[str, Any], ladder: List[Tuple[str, Dict[str, Any]]],
+                 results: List[Dict[str, Any]], min_score: float, variants_searched: int,
+                 embedding_timeout: bool) -> Dict[str, Any]:
+    """Judge a spec's ladder attempts (with their search results) in order; the fallback result for the spec"""
+    query_attempts, accepted = [], None
+    for attempt, ((query, filters), result) in enumerate(zip(ladder, results), start=1):
+        entry = {"attempt": attempt, "search_query": query, "filters": filters}
+        if "error" in result:
+            query_attempts.append({**entry, "result": "error", "error": result["error"],
+                                   "error_type": result.get("error_type", "unknown")})
+            if result.get("error_type") in FAST_FAIL_ERROR_TYPES:
+                break
+            continue
+        nodes = result.get("nodes", [])
+        if not nodes:
+            query_attempts.append({**entry, "result": "no_results"})
+            continue
+        relevant_nodes = [n for n in nodes if is_relevant(n, min_score)]
+        counts = {"nodes_count": len(nodes), "relevant_nodes": len(relevant_nodes)}
+        if relevant_nodes or attempt == len(ladder):
+            query_attempts.append({**entry, "result": "success", **counts})
+            accepted = (attempt, result)
+            break
+        query_attempts.append({**entry, "result": "low_relevance", **counts})
+
+    summary = {"query_attempts": query_attempts, "variants_searched": variants_searched,
+               "embedding_timeout": embedding_timeout}
+    if accepted is None:
+        log.info(f"🪜 Fallback ladder found nothing acceptable in {len(query_attempts)} attempts")
+        failed = {"nodes": [], "total_found": 0, "successful": False, "accepted_attempt": None,
+                  "search_query": search_query, "filters_applied": metadata_filters, **summary}
+        last = query_attempts[-1] if query_attempts else {}
+        if last.get("result") == "error":
+            failed.update(error=last["error"], error_type=last["error_type"])
+        return failed
+
+    attempt, result = accepted
+    log.info(f"🪜 Fallback ladder accepted attempt {attempt}: {result['total_found']} nodes")
+    return {**result, "successful": True, "accepted_attempt": attempt, **summary}
+
+async def batch_search_with_fallback(query_specs: List[Dict[str, Any]], default_top_k: int = 10,
+                                     min_score: float = RELEVANCE_SCORE_THRESHOLD) -> Dict[str, Any]:
+    """Run the refinement ladder of every spec with one batch search.
+
+    The distinct variants of all ladders are searched together (one embedding
+    request, concurrent retrieval), then each spec's attempts are judged in
+    ladder order as in search_with_fallback. Returns per-spec results in request order.
+    """
+    ladders, variant_keys = [], []
+    for spec in query_specs:
+        metadata_filters = spec.get("metadata_filters") or {}
+        top_k = int(spec.get("top_k") or default_top_k)
+        ladder = refinement_ladder(str(spec.get("search_query") or "").strip(), metadata_filters)
+        ladders.append(ladder)
+        variant_keys.append([
+            (query, json.dumps(filters, sort_keys=True, default=str), top_k, spec.get("search_mode"))
+            for query, filters in ladder
+        ])
+    variants = list(dict.fromkeys(key for keys in variant_keys for key in keys))
+    batch = await batch_search_financial_data([
+        {"search_query": query, "metadata_filters": json.loads(filters), "top_k": top_k, "search_mode": search_mode}
+        for query, filters, top_k, search_mode in variants
+    ], default_top_k)
+    if "error" in batch:
+        return {**batch, "results": []}
+    results = dict(zip(variants, batch["results"]))
+
+    spec_results = []
+    for spec, ladder, keys in zip(query_specs, ladders, variant_keys):
+        spec_results.append(judge_ladder(
+            str(spec.get("search_query") or "").strip(), spec.get("metadata_filters") or {}, ladder,
+            [results[key] for key in keys], min_score, len(set(keys)), batch.get("embedding_timeout", False)
+        ))
+    return {
+        "results": spec_results,
+        "queries_executed": len(spec_results),
+        "successful_queries": sum(1 for r in spec_results if r["successful"]),
+        "variants_searched": len(variants),
+        "embedding_timeout": batch.get("embedding_timeout", False)
+    }
+
+async def search_with_fallback(search_query: str, metadata_filters: Dict[str, Any], top_k: int = 10,
+                               min_score: float = RELEVANCE_SCORE_THRESHOLD,
+                               search_mode: Optional[str] = None) -> Dict[str, Any]:
+    """Run the refinement ladder in one call and return the first acceptable attempt.
+
+    Every distinct variant is searched concurrently through the batch path (one
+    embedding request for all of them); the attempts are then judged in ladder
+    order, accepting the first with a node scoring above min_score, or the last
+    attempt's nodes whatever their scores. ``query_attempts`` mirrors the
+    client's attempt log.
+    """
+    batch = await batch_search_with_fallback([{
+        "search_query": search_query, "metadata_filters": metadata_filters, "top_k": top_k, "search_mode": search_mode
+    }], top_k, min_score)
+    if "error" in batch:
+        return {**{k: v for k, v in batch.items() if k != "results"}, "query_attempts": []}
+    return batch["results"][0]
+
+def lean_node(node: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop the text and project the metadata down to LEAN_METADATA_KEYS"""
+    metadata = node.get("metadata") or {}
+    lean = {key: value for key, value in node.items() if key not in ("text", "metadata")}
+    lean["metadata"] = {key: metadata[key] for key in LEAN_METADATA_KEYS if key in metadata}
+    return lean
+
+def apply_response_mode(result: Dict[str, Any], response_mode: Optional[str]) -> Dict[str, Any]:
+    """Shape a search or batch result for the requested response_mode (full = unchanged)"""
+    if not response_mode or response_mode == "full" or "error" in result:
+        return result
+    lean = {**result, "nodes": [lean_node(n) for n in result.get("nodes", [])], "response_mode": "lean"}
+    if "results" in result:
+        lean["results"] = [apply_response_mode(r, response_mode) for r in result["results"]]
+    return lean
+
+def invalid_response_mode(response_mode: str) -> Dict[str, Any]:
+    return {
+        "nodes": [],
+        "error": f"Unknown response_mode '{response_mode}' (expected one of {', '.join(RESPONSE_MODES)})",
+        "error_type": "invalid_response_mode"
+    }
+
+async def get_chunks(node_ids: List[str]) -> Dict[str, Any]:
+    """Full text and metadata for a list of node ids (deduplicated, request order kept)"""
+    try:
+        not_ready = await await_readiness()
+        if not_ready:
+            return {"chunks": [], **not_ready}
+        
+        unique_ids = list(dict.fromkeys(str(node_id) for node_id in node_ids if node_id))
+        index_version = resource_manager.active_index
+        index_version.acquire()
+        try:
+            chunks, missing = [], []
+            for node_id in unique_ids:
+                row = index_version.row_of(node_id)
+                if row is None:
+                    missing.append(node_id)
+                    continue
+                node = index_version.get_node(row)
+                node.pop("score", None)
+                chunks.append(node)
+        finally:
+            index_version.release()
+        
+        if missing:
+            log.warning(f"⚠️ {len(missing)} requested chunks not in index version {index_version.version}")
+        return {
+            "chunks": chunks,
+            "total_found": len(chunks),
+            "missing": missing,
+            "index_version": index_version.version
+        }
+    
+    except Exception as e:
+        log.error(f"❌ Chunk fetch error: {e}")
+        return {
+            "chunks": [],
+            "error": f"Chunk fetch failed: {str(e)}",
+            "error_type": "chunk_fetch_error"
+        }
+
 # ─────────────────────────── MCP Server Setup ───────────────────────────
 
 # Initialize resources at module level for persistence
 async def initialize_resources_once():
-    """Initialize resources once at startup, not per connection"""
-    if not resource_manager._initialized:
+    """Start initialization once, in the background, so connections are accepted while the index loads"""
+    if resource_manager._init_task is None and not resource_manager._initialized:
         log.info("🚀 Starting PSX Financial MCP Server...")
-        try:
-            await resource_manager.initialize()
-            log.info("✅ Server initialization completed successfully")
-        except Exception as e:
-            log.error(f"❌ Server initialization failed: {e}")
+        install_reload_signal_handler()
+        resource_manager._init_task = resource_manager.run_in_background(resource_manager.initialize())
+
+async def await_readiness() -> Optional[Dict[str, Any]]:
+    """None when searches can run; otherwise the error to return.
+
+    Searches that arrive while the server is still starting wait up to
+    STARTUP_QUEUE_TIMEOUT_SECONDS before being rejected as retryable.
+    """
+    if resource_manager.is_healthy:
+        return None
+    if resource_manager.readiness not in ("ready", "degraded"):
+        await initialize_resources_once()
+        if STARTUP_QUEUE_TIMEOUT_SECONDS > 0:
+            await resource_manager.wait_until_settled(STARTUP_QUEUE_TIMEOUT_SECONDS)
+        if resource_manager.is_healthy:
+            return None
+    
+    if resource_manager.readiness in ("ready", "degraded"):
+        return {
+            "error": f"Server resources not properly initialized: {resource_manager.readiness_error or 'unknown error'}",
+            "error_type": "initialization_error",
+            "readiness": resource_manager.readiness,
+            "retryable": False
+        }
+    return {
+        "error": f"Server is starting ({resource_manager.readiness}) - retry shortly",
+        "error_type": "server_starting",
+        "readiness": resource_manager.readiness,
+        "retryable": True,
+        "retry_after_seconds": 5
+    }
+
+def install_reload_signal_handler():
+    """SIGHUP triggers a hot reload of INDEX_DIR (POSIX only)"""
+    loop = asyncio.get_running_loop()
+    
+    def trigger_reload():
+        log.info("📶 SIGHUP received - reloading index")
+        resource_manager.run_in_background(resource_manager.reload_index())
+    
+    try:
+        loop.add_signal_handler(signal.SIGHUP, trigger_reload)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        log.debug("SIGHUP reload not available on this platform")
 
 # Simple lifespan manager that doesn't reinitialize resources
 @asynccontextmanager
@@ -316,17 +1426,33 @@ mcp = FastMCP(name="psx-financial-server-enhanced", lifespan=app_lifespan)
 
 # ─────────────────────────── Essential MCP Tools ────────────────────────
 @mcp.tool()
-async def psx_search_financial_data(search_query: str, metadata_filters: Dict[str, Any], top_k: int = 10) -> Dict[str, Any]:
+@instrument_tool
+async def psx_search_financial_data(search_query: str, metadata_filters: Dict[str, Any], top_k: int = 10,
+                                    search_mode: Optional[str] = None,
+                                    response_mode: Optional[str] = None) -> Dict[str, Any]:
     """
     Enhanced financial data search with semantic matching and metadata filtering.
+    search_mode: "dense" (default - semantic only), "hybrid" (BM25 keyword
+    ranking fused with semantic ranking, best for exact line items, note numbers
+    and periods) or "sparse" (keyword only, no embedding call; nodes carry
+    bm25_score and a null score). When the
+    filters pin a statement (ticker, filing_period, statement_type,
+    financial_statement_scope, is_statement "yes") and match at most top_k
+    chunks, all of them are returned in document order without a similarity
+    search (search_mode "exact_match"; nodes carry exact_match and a null score).
+    response_mode "lean" returns node ids, scores and compact metadata only;
+    fetch texts with psx_get_chunks.
     Returns structured data with comprehensive error handling.
     """
     try:
         log.info(f"=== SEARCH REQUEST ===")
         log.info(f"Query: '{search_query[:100]}...' | Filters: {len(metadata_filters)} | Top-K: {top_k}")
         
+        if response_mode and response_mode not in RESPONSE_MODES:
+            return invalid_response_mode(response_mode)
+        
         # Use the enhanced search function
-        result = await search_financial_data(search_query, metadata_filters, top_k)
+        result = await search_financial_data(search_query, metadata_filters, top_k, search_mode=search_mode)
         
         # Check for errors in the result
         if "error" in result:
@@ -334,7 +1460,7 @@ async def psx_search_financial_data(search_query: str, metadata_filters: Dict[st
             return result  # Return the error result as-is
         
         log.info(f"✅ Search successful: {result['total_found']} nodes returned")
-        return result
+        return apply_response_mode(result, response_mode)
         
     except Exception as e:
         log.error(f"❌ Tool call error: {e}")
@@ -348,6 +1474,163 @@ async def psx_search_financial_data(search_query: str, metadata_filters: Dict[st
         }
 
 @mcp.tool()
+@instrument_tool
+async def psx_batch_search(queries: List[Dict[str, Any]], top_k: int = 10,
+                           response_mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run a whole query plan in one call. Each entry is a
+    {search_query, metadata_filters, top_k, search_mode?} spec; all query strings
+    are embedded in a single batched request and retrievals run concurrently.
+    Returns per-spec results (same shape as psx_search_financial_data) in
+    request order, plus merged nodes deduplicated by node_id.
+    response_mode "lean" works as in psx_search_financial_data.
+    """
+    try:
+        log.info(f"=== BATCH SEARCH REQUEST ===")
+        log.info(f"Specs: {len(queries)} | Default Top-K: {top_k}")
+
+        if response_mode and response_mode not in RESPONSE_MODES:
+            return {"results": [], **invalid_response_mode(response_mode)}
+
+        result = await batch_search_financial_data(queries, top_k)
+
+        if "error" in result:
+            log.warning(f"Batch search returned error: {result['error']}")
+            return result
+
+        log.info(f"✅ Batch search successful: {result['total_found']} unique nodes returned")
+        return apply_response_mode(result, response_mode)
+
+    except Exception as e:
+        log.error(f"❌ Batch tool call error: {e}")
+        return {
+            "results": [],
+            "nodes": [],
+            "error": f"Tool execution failed: {str(e)}",
+            "error_type": "tool_error"
+        }
+
+@mcp.tool()
+@instrument_tool
+async def psx_search_with_fallback(search_query: str, metadata_filters: Dict[str, Any], top_k: int = 10,
+                                   min_score: float = RELEVANCE_SCORE_THRESHOLD,
+                                   search_mode: Optional[str] = None,
+                                   response_mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    psx_search_financial_data with the query refinement ladder run server-side:
+    the query as given, then "TICKER statement type", then "TICKER financial
+    statement" without the statement_type filter. All variants are searched
+    concurrently; the first attempt with a node scoring above min_score is
+    returned (or the last attempt's nodes), with "accepted_attempt" and a
+    "query_attempts" log of every attempt judged.
+    search_mode and response_mode work as in psx_search_financial_data.
+    """
+    try:
+        log.info(f"=== FALLBACK SEARCH REQUEST ===")
+        log.info(f"Query: '{search_query[:100]}...' | Filters: {len(metadata_filters)} | Top-K: {top_k}")
+        
+        if response_mode and response_mode not in RESPONSE_MODES:
+            return invalid_response_mode(response_mode)
+        
+        result = await search_with_fallback(search_query, metadata_filters, top_k, min_score, search_mode)
+        
+        if "error" in result:
+            log.warning(f"Fallback search returned error: {result['error']}")
+            return result
+        
+        return apply_response_mode(result, response_mode)
+        
+    except Exception as e:
+        log.error(f"❌ Fallback tool call error: {e}")
+        return {
+            "nodes": [],
+            "error": f"Tool execution failed: {str(e)}",
+            "error_type": "tool_error",
+            "search_query": search_query,
+            "filters_applied": metadata_filters,
+            "query_attempts": []
+        }
+
+@mcp.tool()
+@instrument_tool
+async def psx_batch_search_with_fallback(queries: List[Dict[str, Any]], top_k: int = 10,
+                                         min_score: float = RELEVANCE_SCORE_THRESHOLD,
+                                         response_mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    psx_search_with_fallback for a whole query plan in one call. Each entry is a
+    {search_query, metadata_filters, top_k, search_mode?} spec; the refinement
+    variants of all specs are searched together (one embedding request) and each
+    spec's attempts are judged in order. Returns per-spec results (same shape as
+    psx_search_with_fallback) in request order.
+    response_mode "lean" works as in psx_search_financial_data.
+    """
+    try:
+        log.info(f"=== BATCH FALLBACK SEARCH REQUEST ===")
+        log.info(f"Specs: {len(queries)} | Default Top-K: {top_k}")
+
+        if response_mode and response_mode not in RESPONSE_MODES:
+            return {"results": [], **invalid_response_mode(response_mode)}
+
+        result = await batch_search_with_fallback(queries, top_k, min_score)
+
+        if "error" in result:
+            log.warning(f"Batch fallback search returned error: {result['error']}")
+            return result
+
+        log.info(f"✅ Batch fallback search: {result['successful_queries']}/{result['queries_executed']} specs "
+                 f"accepted from {result['variants_searched']} variants")
+        return apply_response_mode(result, response_mode)
+
+    except Exception as e:
+        log.error(f"❌ Batch fallback tool call error: {e}")
+        return {
+            "results": [],
+            "error": f"Tool execution failed: {str(e)}",
+            "error_type": "tool_error"
+        }
+
+@mcp.tool()
+@instrument_tool
+async def psx_get_chunks(node_ids: List[str]) -> Dict[str, Any]:
+    """
+    Fetch full text and metadata for chunks returned by a lean search, in one
+    call. Duplicate ids are fetched once; ids not in the live index are listed
+    under "missing".
+    """
+    try:
+        log.info(f"=== CHUNK FETCH REQUEST === {len(node_ids)} ids")
+        return await get_chunks(node_ids)
+        
+    except Exception as e:
+        log.error(f"❌ Chunk fetch tool error: {e}")
+        return {
+            "chunks": [],
+            "error": f"Tool execution failed: {str(e)}",
+            "error_type": "tool_error"
+        }
+
+@mcp.tool()
+@instrument_tool
+async def psx_reload_index(source_url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Admin: load a new index version and swap it in without restarting the server.
+    With source_url the release tarball is downloaded first; otherwise the index
+    directory is re-read from disk. Searches in flight finish on the old version.
+    """
+    try:
+        log.info(f"=== INDEX RELOAD REQUEST === source: {source_url or INDEX_DIR}")
+        return await resource_manager.reload_index(source_url)
+        
+    except Exception as e:
+        log.error(f"❌ Reload tool error: {e}")
+        return {
+            "status": "failed",
+            "error": f"Tool execution failed: {str(e)}",
+            "error_type": "tool_error"
+        }
+
+@mcp.tool()
+@instrument_tool
 async def psx_health_check() -> Dict[str, Any]:
     """
     Enhanced server health check with comprehensive diagnostics.
@@ -361,7 +1644,9 @@ async def psx_health_check() -> Dict[str, Any]:
         
         # Get index statistics with error handling
         try:
-            if resource_manager.index:
+            if resource_manager.vector_store:
+                doc_count = resource_manager.vector_store.count
+            elif resource_manager.index:
                 doc_count = len(resource_manager.index.docstore.docs)
             else:
                 doc_count = 0
@@ -372,22 +1657,60 @@ async def psx_health_check() -> Dict[str, Any]:
         models_available = {
             "embeddings": resource_manager.embed_model is not None,
             "llm": resource_manager.llm is not None,
-            "index": resource_manager.index is not None
+            "index": resource_manager.index is not None or resource_manager.vector_store is not None
         }
         
         # Enhanced health status
         health_status = {
-            "status": "healthy" if is_healthy else "degraded",
+            "status": "healthy" if is_healthy else ("degraded" if resource_manager.readiness in ("ready", "degraded") else "starting"),
             "server_name": "PSX Financial Server (Enhanced)",
             "version": "2.1.0",
             "timestamp": datetime.datetime.now().isoformat(),
             "resource_manager_healthy": is_healthy,
+            "readiness": {
+                "state": resource_manager.readiness,
+                "since": resource_manager.readiness_since,
+                "error": resource_manager.readiness_error,
+            },
             "index_documents": doc_count,
             "companies_available": len(TICKERS),
             "models_available": models_available,
+            "embedding_cache": resource_manager.embedding_cache.stats() if resource_manager.embedding_cache else None,
+            "result_cache": resource_manager.result_cache.stats(),
+            "search_coalescing": resource_manager.search_flights.stats(),
+            "embedding_batcher": resource_manager.embed_batcher.stats() if resource_manager.embed_batcher else None,
+            "embedding_guard": resource_manager.embed_guard.stats(),
+            "context_writer": context_writer.stats(),
+            "index_download": download_progress.snapshot(),
+            "index_versions": {
+                "active": resource_manager.active_index.summary() if resource_manager.active_index else None,
+                "retiring": [version.summary() for version in resource_manager.retiring_indexes],
+                "reload": resource_manager.reload_status,
+            },
+            "vector_store": {
+                "backend": "mmap" if resource_manager.vector_store else "llama_index",
+                "dtype": resource_manager.vector_store.dtype if resource_manager.vector_store else "float64",
+                "memory": resource_manager.vector_store.memory_stats() if resource_manager.vector_store else None,
+                "metadata_index": resource_manager.vector_store.metadata_index.stats() if resource_manager.vector_store else None,
+                "search_engine": resource_manager.vector_store.engine_stats() if resource_manager.vector_store else None,
+            },
             "capabilities": [
                 "semantic_search",
+                "hybrid_bm25_search",
+                "batch_search",
+                "server_side_fallback",
+                "batch_server_side_fallback",
+                "lean_responses",
+                "chunk_fetch",
+                "query_embedding_cache",
+                "embedding_micro_batching",
+                "model_rate_limiting",
+                "search_result_cache",
+                "request_coalescing",
                 "metadata_filtering",
+                "metadata_prefiltering",
+                "hot_index_reload",
+                "prometheus_metrics",
                 "enhanced_error_handling",
                 "context_preservation"
             ],
@@ -401,6 +1724,8 @@ async def psx_health_check() -> Dict[str, Any]:
         
         if is_healthy:
             log.info("✅ Health check passed - All systems operational")
+        elif health_status["status"] == "starting":
+            log.info(f"⏳ Health check: server still starting ({resource_manager.readiness})")
         else:
             log.warning("⚠️ Health check shows degraded status - Some resources unavailable")
             
@@ -416,13 +1741,78 @@ async def psx_health_check() -> Dict[str, Any]:
             "version": "2.1.0"
         }
 
+@mcp.tool()
+async def psx_metrics() -> Dict[str, Any]:
+    """
+    Server performance metrics: per-stage search latency (cache lookup, embedding,
+    filter, lexical, scoring, fusion, serialization, context save), embedding request latency,
+    tool calls by outcome, cache hit ratios and in-flight requests.
+    Latency quantiles are bucket upper bounds in milliseconds.
+    """
+    try:
+        return {"timestamp": datetime.datetime.now().isoformat(), **metrics.snapshot()}
+    except Exception as e:
+        log.error(f"❌ Metrics snapshot failed: {e}")
+        return {"error": f"Metrics unavailable: {str(e)}", "error_type": "metrics_error"}
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request: Request) -> PlainTextResponse:
+    """Prometheus scrape endpoint served next to the SSE transport"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@mcp.custom_route("/health", methods=["GET"])
+async def http_health(request: Request) -> JSONResponse:
+    """Plain HTTP probe for Render: 200 while starting or ready, 503 once degraded"""
+    await initialize_resources_once()
+    return JSONResponse(
+        {"readiness": resource_manager.readiness, "since": resource_manager.readiness_since,
+         "error": resource_manager.readiness_error},
+        status_code=503 if resource_manager.readiness == "degraded" else 200
+    )
+
+def prepare_shared_index():
+    """Download the index and build its derived files once, before worker processes map them.
+
+    Converting the mmap store, building the IVF lists (ivf engine) and the BM25
+    postings here means workers only load the saved files - they share the pages
+    instead of each building a private copy and racing to write the same files.
+    """
+    asyncio.run(download_index_if_needed())
+    if VECTOR_STORE_BACKEND == "mmap" and INDEX_DIR.exists():
+        # Converts the store if needed and, for the ivf engine, builds and saves the IVF lists
+        store = load_mmap_vector_store(INDEX_DIR)
+        if store is not None:
+            if LEXICAL_INDEX_ENABLED:
+                try:
+                    load_or_build_lexical_index(store)
+                except Exception as e:
+                    log.warning(f"⚠️ Could not prepare the BM25 index (workers will build their own): {e}")
+            store.close()
+
+@asynccontextmanager
+async def http_lifespan(app):
+    """Start background initialization with the HTTP server rather than on the first MCP session"""
+    await initialize_resources_once()
+    yield
+
 # ─────────────────────────── Entry Point ────────────────────────────────
 if __name__ == "__main__":
     log.info("🚀 Starting Enhanced PSX Financial MCP Server...")
     
     # Get port from Render environment
     port = int(os.getenv("PORT", 8000))
+    host = os.getenv("HOST", "0.0.0.0")
     
-    # Use SSE transport for browser/HTTP compatibility
-    # Bind to all interfaces for Render
-    mcp.run(transport="sse", host="0.0.0.0", port=port) 
\ No newline at end of file
+    if MCP_WORKERS > 1:
+        import multiworker
+        prepare_shared_index()
+        multiworker.serve(Path(__file__).resolve(), MCP_WORKERS, host, port)
+    else:
+        # Use SSE transport for browser/HTTP compatibility; the app's lifespan kicks off
+        # index loading in the background so the port opens immediately
+        import uvicorn
+        app = mcp.http_app(transport="sse")
+        app.router.lifespan_context = http_lifespan
+        
+        # Bind to all interfaces for Render
+        uvicorn.run(app, host=host, port=port, timeout_graceful_shutdown=0)
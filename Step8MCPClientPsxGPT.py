@@ -7,11 +7,13 @@ Flow: User Query → Claude Parsing → Query Execution → Response Synthesis
 """
 
 import asyncio
+import contextlib
 import json
 import logging
 import os
+import re
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 
 import anthropic
@@ -26,6 +28,49 @@ BASE_DIR = Path(__file__).parent.resolve()
 TICKERS_PATH = BASE_DIR / "tickers.json"
 CONTEXT_DIR = BASE_DIR / "enhanced_client_contexts"
 CONTEXT_DIR.mkdir(exist_ok=True)
+CONTEXT_SAMPLE_RATE = float(os.getenv("CONTEXT_SAMPLE_RATE", "1.0"))
+CONTEXT_DISK_BUDGET_MB = int(os.getenv("CONTEXT_DISK_BUDGET_MB", "256"))
+
+# Maximum concurrent MCP search calls per chat session (override per session via
+# the "max_concurrent_queries" user_session key)
+MAX_CONCURRENT_QUERIES = int(os.getenv("MAX_CONCURRENT_QUERIES", "4"))
+# How many times a tool call is retried while the server reports it is still loading its index
+SERVER_STARTING_RETRIES = int(os.getenv("SERVER_STARTING_RETRIES", "3"))
+# Ask for lean search results (ids, scores, compact metadata) and fetch each distinct
+# chunk's text once per request with psx_get_chunks
+LEAN_SEARCH_RESPONSES = os.getenv("LEAN_SEARCH_RESPONSES", "true").lower() == "true"
+SEARCH_RESPONSE_MODE = {"response_mode": "lean"} if LEAN_SEARCH_RESPONSES else {}
+# Run the refinement ladders on the server (psx_batch_search_with_fallback, one round
+# trip per plan) instead of up to three client round trips per spec; servers without
+# the tools fall back to the client-side ladder
+SERVER_SIDE_FALLBACK = os.getenv("SERVER_SIDE_FALLBACK", "true").lower() == "true"
+# Client-side ladder only: start the refined attempts HEDGE_DELAY_SECONDS apart while the
+# earlier attempt is still running instead of after it fails (more server load, much
+# lower latency for queries that need all three attempts)
+HEDGED_REFINEMENT = os.getenv("HEDGED_REFINEMENT", "false").lower() == "true"
+HEDGE_DELAY_SECONDS = float(os.getenv("HEDGE_DELAY_SECONDS", "0.25"))
+# A refinement attempt is accepted once a node scores above this (any nodes on the last attempt)
+RELEVANCE_SCORE_THRESHOLD = float(os.getenv("RELEVANCE_SCORE_THRESHOLD", "0.5"))
+MAX_REFINEMENT_ATTEMPTS = 3
+# Merge query specs that differ only by filing_period into one list-filtered search
+# (the server ORs filing_period lists) and drop duplicate specs before searching
+PLAN_OPTIMIZER = os.getenv("PLAN_OPTIMIZER", "true").lower() == "true"
+PLAN_MERGED_TOP_K_MAX = int(os.getenv("PLAN_MERGED_TOP_K_MAX", "50"))
+# Plan simple requests ("HBL 2024 balance sheet", "MEBL last 4 quarters P&L") with the
+# rule-based parser and skip the Claude round trip when its confidence reaches
+# FAST_PARSER_MIN_CONFIDENCE; everything else is still parsed by Claude. Off until
+# `python evaluate_fast_parser.py --claude` has confirmed its plans agree with Claude's
+FAST_PARSER_ENABLED = os.getenv("FAST_PARSER_ENABLED", "false").lower() == "true"
+FAST_PARSER_MIN_CONFIDENCE = float(os.getenv("FAST_PARSER_MIN_CONFIDENCE", "0.85"))
+# Gemini generation calls are paced to GENERATION_RATE_LIMIT_PER_MINUTE across all chat
+# sessions and stop for CIRCUIT_RESET_SECONDS after CIRCUIT_FAILURE_THRESHOLD consecutive
+# overload errors, instead of retrying into the throttle
+GENERATION_MODEL = "models/gemini-2.5-pro"
+GENERATION_RATE_LIMIT_PER_MINUTE = float(os.getenv("GENERATION_RATE_LIMIT_PER_MINUTE", "150"))
+GENERATION_RATE_LIMIT_BURST = float(os.getenv("GENERATION_RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "2"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
 
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -62,7 +107,7 @@ anthropic_client = anthropic.AsyncAnthropic(api_key=ANTHROPIC_API_KEY, timeout=6
 # Google GenAI for streaming responses (uses maximum token limits by default)
 from llama_index.llms.google_genai import GoogleGenAI
 streaming_llm = GoogleGenAI(
-    model="models/gemini-2.5-pro", 
+    model=GENERATION_MODEL, 
     api_key=GEMINI_API_KEY, 
     temperature=0.4,
     timeout=120.0
@@ -70,8 +115,29 @@ streaming_llm = GoogleGenAI(
 
 # Google GenAI streaming LLM initialized
 
+# Rate limiting and circuit breaking shared by every session's streaming_llm calls
+from rate_limit import FAST_FAIL_ERROR_TYPES, ModelGuard, ModelUnavailableError, is_overload_error
+streaming_llm_guard = ModelGuard(
+    GENERATION_MODEL,
+    GENERATION_RATE_LIMIT_PER_MINUTE,
+    burst=GENERATION_RATE_LIMIT_BURST,
+    max_wait_seconds=RATE_LIMIT_MAX_WAIT_SECONDS,
+    failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+    reset_seconds=CIRCUIT_RESET_SECONDS
+)
+
 # Import prompts library
 from prompts import prompts
+from fast_parser import parse_query_rules
+
+# Debug contexts are appended to rotated, compressed JSONL segments by a background task
+from context_writer import ContextWriter
+context_writer = ContextWriter(
+    CONTEXT_DIR,
+    prefix="client_context",
+    sample_rate=CONTEXT_SAMPLE_RATE,
+    max_total_bytes=CONTEXT_DISK_BUDGET_MB * 1024 * 1024
+)
 
 # ─────────────────────────── Conversation Context Management ─────────────────
 class ConversationContext(BaseModel):
@@ -226,10 +292,9 @@ def extract_used_chunks_from_response(response_text: str) -> List[str]:
         return []
 
 async def save_client_context(query: str, query_plan: QueryPlan, result: Dict) -> str:
-    """Enhanced client-side context saving with detailed metadata"""
+    """Enhanced client-side context saving with detailed metadata (queued, written in the background)"""
     try:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = CONTEXT_DIR / f"client_context_{timestamp}.json"
         
         # Enhanced context with more detailed information
         context = {
@@ -255,9 +320,10 @@ async def save_client_context(query: str, query_plan: QueryPlan, result: Dict) -
             "client_version": "enhanced"
         }
         
-        filename.write_text(json.dumps(context, indent=2, default=str))
-        log.info(f"📁 Client context saved: {filename.name}")
-        return str(filename)
+        record_id = context_writer.submit(context)
+        if record_id:
+            log.info(f"📁 Client context queued: {record_id}")
+        return record_id
     except Exception as e:
         log.warning(f"⚠️ Failed to save client context: {e}")
         return ""
@@ -283,6 +349,182 @@ def find_best_ticker_match(query_ticker: str) -> str:
     # Return original if no match found
     return query_ticker
 
+def finalize_query_plan(query_plan: QueryPlan, user_query: str) -> QueryPlan:
+    """Validate a parsed plan and add the annual (Q4) and note queries it implies, whichever parser produced it"""
+    is_quarterly_request = any(q_term in user_query.lower() for q_term in ["quarterly", "quarter", "q1", "q2", "q3", "q4"])
+    
+    # Enhanced quarterly processing: automatically add annual queries for Q4 calculation
+    if is_quarterly_request:
+        log.info("🔢 Quarterly request detected - adding annual queries for Q4 calculation")
+        
+        # Extract unique companies and statement types from quarterly queries
+        companies_for_annual = set()
+        statement_types_for_annual = set()
+        
+        for query_spec in query_plan.queries:
+            filters = query_spec.get("metadata_filters", {})
+            if "ticker" in filters:
+                companies_for_annual.add(filters["ticker"])
+            if "statement_type" in filters:
+                statement_types_for_annual.add(filters["statement_type"])
+        
+        # Add annual queries for Q4 calculation - keep search flexible for year matching
+        annual_queries = []
+        for company in companies_for_annual:
+            for stmt_type in statement_types_for_annual:
+                annual_query = {
+                    "search_query": f"{company} {stmt_type.replace('_', ' ')} annual",
+                    "metadata_filters": {
+                        "ticker": company,
+                        "statement_type": stmt_type,
+                        "is_statement": "yes",
+                        "filing_type": "annual"
+                    }
+                }
+                annual_queries.append(annual_query)
+        
+        # Add annual queries to the plan
+        query_plan.queries.extend(annual_queries)
+        log.info(f"🎯 Enhanced quarterly plan: {len(query_plan.queries)} total queries (including annual for Q4)")
+    
+    # Validate and fix empty search queries - keep metadata filters minimal 
+    valid_queries = []
+    for query_spec in query_plan.queries:
+        search_query = query_spec.get("search_query", "").strip()
+        metadata_filters = query_spec.get("metadata_filters", {})
+        
+        # Ensure quarterly requests have proper filing_type
+        if is_quarterly_request and "filing_type" not in metadata_filters:
+            # Check if this is a quarterly-specific query (not annual)
+            if "annual" not in search_query.lower():
+                metadata_filters["filing_type"] = "quarterly"
+                log.info("🔧 Added filing_type=quarterly for quarterly request")
+        
+        # Validate and correct ticker symbols using tickers.json
+        if "ticker" in metadata_filters:
+            original_ticker = metadata_filters["ticker"]
+            
+            # Find best match from actual tickers.json data
+            corrected_ticker = find_best_ticker_match(original_ticker)
+            if corrected_ticker != original_ticker:
+                metadata_filters["ticker"] = corrected_ticker
+                log.info(f"Corrected ticker using tickers.json: {original_ticker} → {corrected_ticker}")
+        
+        # Ensure critical metadata filters are present based on intent
+        if query_plan.intent == "statement" or "statement" in user_query.lower():
+            metadata_filters["is_statement"] = "yes"
+            # Don't set is_note for statement requests
+            log.info("Added is_statement=yes for statement request")
+        
+        # Enhanced statement detection for common phrases
+        statement_keywords = ["balance sheet", "profit and loss", "cash flow", "income statement", "p&l", "p & l"]
+        if any(keyword in user_query.lower() for keyword in statement_keywords):
+            metadata_filters["is_statement"] = "yes"
+            # Don't set is_note for statement keywords
+            log.info(f"Added is_statement=yes filter for statement keywords in query")
+        
+        # Handle explicit note requests - but don't override statement requests
+        if "note" in user_query.lower():
+            # If this is ONLY a note request (no statement keywords), make it a note query
+            if not any(keyword in user_query.lower() for keyword in statement_keywords):
+                metadata_filters["is_note"] = "yes"
+                metadata_filters["is_statement"] = "no"
+                log.info("Added is_note=yes filter for note-only request")
+            # If it's a combined statement + notes request, this query stays as statement
+            # (We'll add note queries separately later)
+        
+        if not search_query:
+            # Create a fallback search query using available information
+            ticker = metadata_filters.get("ticker", "")
+            statement_type = metadata_filters.get("statement_type", "").replace("_", " ")
+            
+            if ticker or statement_type:
+                fallback_query = f"{ticker} {statement_type} {user_query}".strip()
+                query_spec["search_query"] = fallback_query
+                log.info(f"Generated fallback search query: '{fallback_query}'")
+            else:
+                # If we can't create a meaningful query, use the original user query
+                query_spec["search_query"] = user_query
+                log.info(f"Using original query as fallback: '{user_query}'")
+        
+        # CRITICAL VALIDATION: Ensure mutual exclusivity between is_statement and is_note
+        if metadata_filters.get("is_statement") == "yes" and metadata_filters.get("is_note") == "yes":
+            log.error(f"❌ MUTUAL EXCLUSIVITY VIOLATION: Both is_statement and is_note are 'yes' - fixing...")
+            
+            # Determine which one should be kept based on query content
+            if "note" in user_query.lower() and not any(keyword in user_query.lower() for keyword in ["balance sheet", "profit and loss", "cash flow", "income statement", "p&l", "p & l"]):
+                # Pure note request
+                metadata_filters["is_statement"] = "no"
+                metadata_filters["is_note"] = "yes"
+                log.info("Fixed to note-only query: is_statement=no, is_note=yes")
+            else:
+                # Statement request (possibly with notes to be handled separately)
+                metadata_filters["is_statement"] = "yes"
+                metadata_filters["is_note"] = "no"
+                log.info("Fixed to statement query: is_statement=yes, is_note=no")
+        
+        # CRITICAL VALIDATION: Ensure note_link is only present when is_note="yes" 
+        if metadata_filters.get("is_statement") == "yes" and "note_link" in metadata_filters:
+            log.warning(f"⚠️ Removing note_link from statement query - note_link should only exist for notes")
+            del metadata_filters["note_link"]
+        
+        # Update the query spec with validated metadata filters
+        query_spec["metadata_filters"] = metadata_filters
+        valid_queries.append(query_spec)
+    
+    # Update the query plan with validated queries
+    query_plan.queries = valid_queries
+    
+    # Handle combined statement + notes requests
+    # If user asked for notes AND we have statement queries, add corresponding note queries
+    user_query_lower = user_query.lower()
+    if "note" in user_query_lower and any("is_statement" in q.get("metadata_filters", {}) and 
+                                         q["metadata_filters"]["is_statement"] == "yes" 
+                                         for q in valid_queries):
+        
+        log.info("🗒️ Combined statement + notes request detected - adding note queries")
+        statement_keywords = ["balance sheet", "profit and loss", "cash flow", "income statement", "p&l", "p & l"]
+        
+        # Find statement queries and create corresponding note queries
+        additional_note_queries = []
+        for query_spec in valid_queries:
+            metadata_filters = query_spec.get("metadata_filters", {})
+            if metadata_filters.get("is_statement") == "yes":
+                # Create corresponding note query
+                note_query = {
+                    "search_query": query_spec["search_query"].replace("account", "notes").replace("statement", "notes"),
+                    "metadata_filters": {
+                        **{k: v for k, v in metadata_filters.items() 
+                           if k not in ["is_statement", "is_note", "statement_type"]},
+                        "is_statement": "no",
+                        "is_note": "yes"
+                    }
+                }
+                
+                # Set note_link based on statement_type
+                if "statement_type" in metadata_filters:
+                    note_query["metadata_filters"]["note_link"] = metadata_filters["statement_type"]
+                else:
+                    # Try to infer from search query
+                    search_lower = query_spec["search_query"].lower()
+                    if any(kw in search_lower for kw in ["profit and loss", "p&l", "p & l"]):
+                        note_query["metadata_filters"]["note_link"] = "profit_and_loss"
+                    elif "balance sheet" in search_lower:
+                        note_query["metadata_filters"]["note_link"] = "balance_sheet"
+                    elif "cash flow" in search_lower:
+                        note_query["metadata_filters"]["note_link"] = "cash_flow"
+                
+                additional_note_queries.append(note_query)
+                log.info(f"📝 Added note query for {metadata_filters.get('ticker', 'company')}: note_link={note_query['metadata_filters'].get('note_link')}")
+        
+        # Add note queries to the plan
+        query_plan.queries.extend(additional_note_queries)
+        log.info(f"🎯 Enhanced plan: {len(query_plan.queries)} total queries ({len(valid_queries)} statements + {len(additional_note_queries)} notes)")
+    
+    if PLAN_OPTIMIZER:
+        query_plan.queries = optimize_query_plan(query_plan.queries)
+    return query_plan
+
 async def parse_query_with_claude(user_query: str, conversation_context: Optional[ConversationContext] = None) -> QueryPlan:
     """Use Claude 4 Sonnet to parse user query into structured query plan with conversation context"""
     log.info(f"Parsing query with Claude: {user_query[:100]}...")
@@ -326,173 +568,7 @@ async def parse_query_with_claude(user_query: str, conversation_context: Optiona
             parsed_data = response.content[0].input
             query_plan = QueryPlan.model_validate(parsed_data)
             
-            # Enhanced quarterly processing: automatically add annual queries for Q4 calculation
-            if is_quarterly_request:
-                log.info("🔢 Quarterly request detected - adding annual queries for Q4 calculation")
-                
-                # Extract unique companies and statement types from quarterly queries
-                companies_for_annual = set()
-                statement_types_for_annual = set()
-                
-                for query_spec in query_plan.queries:
-                    filters = query_spec.get("metadata_filters", {})
-                    if "ticker" in filters:
-                        companies_for_annual.add(filters["ticker"])
-                    if "statement_type" in filters:
-                        statement_types_for_annual.add(filters["statement_type"])
-                
-                # Add annual queries for Q4 calculation - keep search flexible for year matching
-                annual_queries = []
-                for company in companies_for_annual:
-                    for stmt_type in statement_types_for_annual:
-                        annual_query = {
-                            "search_query": f"{company} {stmt_type.replace('_', ' ')} annual",
-                            "metadata_filters": {
-                                "ticker": company,
-                                "statement_type": stmt_type,
-                                "is_statement": "yes",
-                                "filing_type": "annual"
-                            }
-                        }
-                        annual_queries.append(annual_query)
-                
-                # Add annual queries to the plan
-                query_plan.queries.extend(annual_queries)
-                log.info(f"🎯 Enhanced quarterly plan: {len(query_plan.queries)} total queries (including annual for Q4)")
-            
-            # Validate and fix empty search queries - keep metadata filters minimal 
-            valid_queries = []
-            for query_spec in query_plan.queries:
-                search_query = query_spec.get("search_query", "").strip()
-                metadata_filters = query_spec.get("metadata_filters", {})
-                
-                # Ensure quarterly requests have proper filing_type
-                if is_quarterly_request and "filing_type" not in metadata_filters:
-                    # Check if this is a quarterly-specific query (not annual)
-                    if "annual" not in search_query.lower():
-                        metadata_filters["filing_type"] = "quarterly"
-                        log.info("🔧 Added filing_type=quarterly for quarterly request")
-                
-                # Validate and correct ticker symbols using tickers.json
-                if "ticker" in metadata_filters:
-                    original_ticker = metadata_filters["ticker"]
-                    
-                    # Find best match from actual tickers.json data
-                    corrected_ticker = find_best_ticker_match(original_ticker)
-                    if corrected_ticker != original_ticker:
-                        metadata_filters["ticker"] = corrected_ticker
-                        log.info(f"Corrected ticker using tickers.json: {original_ticker} → {corrected_ticker}")
-                
-                # Ensure critical metadata filters are present based on intent
-                if query_plan.intent == "statement" or "statement" in user_query.lower():
-                    metadata_filters["is_statement"] = "yes"
-                    # Don't set is_note for statement requests
-                    log.info("Added is_statement=yes for statement request")
-                
-                # Enhanced statement detection for common phrases
-                statement_keywords = ["balance sheet", "profit and loss", "cash flow", "income statement", "p&l", "p & l"]
-                if any(keyword in user_query.lower() for keyword in statement_keywords):
-                    metadata_filters["is_statement"] = "yes"
-                    # Don't set is_note for statement keywords
-                    log.info(f"Added is_statement=yes filter for statement keywords in query")
-                
-                # Handle explicit note requests - but don't override statement requests
-                if "note" in user_query.lower():
-                    # If this is ONLY a note request (no statement keywords), make it a note query
-                    if not any(keyword in user_query.lower() for keyword in statement_keywords):
-                        metadata_filters["is_note"] = "yes"
-                        metadata_filters["is_statement"] = "no"
-                        log.info("Added is_note=yes filter for note-only request")
-                    # If it's a combined statement + notes request, this query stays as statement
-                    # (We'll add note queries separately later)
-                
-                if not search_query:
-                    # Create a fallback search query using available information
-                    ticker = metadata_filters.get("ticker", "")
-                    statement_type = metadata_filters.get("statement_type", "").replace("_", " ")
-                    
-                    if ticker or statement_type:
-                        fallback_query = f"{ticker} {statement_type} {user_query}".strip()
-                        query_spec["search_query"] = fallback_query
-                        log.info(f"Generated fallback search query: '{fallback_query}'")
-                    else:
-                        # If we can't create a meaningful query, use the original user query
-                        query_spec["search_query"] = user_query
-                        log.info(f"Using original query as fallback: '{user_query}'")
-                
-                # CRITICAL VALIDATION: Ensure mutual exclusivity between is_statement and is_note
-                if metadata_filters.get("is_statement") == "yes" and metadata_filters.get("is_note") == "yes":
-                    log.error(f"❌ MUTUAL EXCLUSIVITY VIOLATION: Both is_statement and is_note are 'yes' - fixing...")
-                    
-                    # Determine which one should be kept based on query content
-                    if "note" in user_query.lower() and not any(keyword in user_query.lower() for keyword in ["balance sheet", "profit and loss", "cash flow", "income statement", "p&l", "p & l"]):
-                        # Pure note request
-                        metadata_filters["is_statement"] = "no"
-                        metadata_filters["is_note"] = "yes"
-                        log.info("Fixed to note-only query: is_statement=no, is_note=yes")
-                    else:
-                        # Statement request (possibly with notes to be handled separately)
-                        metadata_filters["is_statement"] = "yes"
-                        metadata_filters["is_note"] = "no"
-                        log.info("Fixed to statement query: is_statement=yes, is_note=no")
-                
-                # CRITICAL VALIDATION: Ensure note_link is only present when is_note="yes" 
-                if metadata_filters.get("is_statement") == "yes" and "note_link" in metadata_filters:
-                    log.warning(f"⚠️ Removing note_link from statement query - note_link should only exist for notes")
-                    del metadata_filters["note_link"]
-                
-                # Update the query spec with validated metadata filters
-                query_spec["metadata_filters"] = metadata_filters
-                valid_queries.append(query_spec)
-            
-            # Update the query plan with validated queries
-            query_plan.queries = valid_queries
-            
-            # Handle combined statement + notes requests
-            # If user asked for notes AND we have statement queries, add corresponding note queries
-            user_query_lower = user_query.lower()
-            if "note" in user_query_lower and any("is_statement" in q.get("metadata_filters", {}) and 
-                                                 q["metadata_filters"]["is_statement"] == "yes" 
-                                                 for q in valid_queries):
-                
-                log.info("🗒️ Combined statement + notes request detected - adding note queries")
-                statement_keywords = ["balance sheet", "profit and loss", "cash flow", "income statement", "p&l", "p & l"]
-                
-                # Find statement queries and create corresponding note queries
-                additional_note_queries = []
-                for query_spec in valid_queries:
-                    metadata_filters = query_spec.get("metadata_filters", {})
-                    if metadata_filters.get("is_statement") == "yes":
-                        # Create corresponding note query
-                        note_query = {
-                            "search_query": query_spec["search_query"].replace("account", "notes").replace("statement", "notes"),
-                            "metadata_filters": {
-                                **{k: v for k, v in metadata_filters.items() 
-                                   if k not in ["is_statement", "is_note", "statement_type"]},
-                                "is_statement": "no",
-                                "is_note": "yes"
-                            }
-                        }
-                        
-                        # Set note_link based on statement_type
-                        if "statement_type" in metadata_filters:
-                            note_query["metadata_filters"]["note_link"] = metadata_filters["statement_type"]
-                        else:
-                            # Try to infer from search query
-                            search_lower = query_spec["search_query"].lower()
-                            if any(kw in search_lower for kw in ["profit and loss", "p&l", "p & l"]):
-                                note_query["metadata_filters"]["note_link"] = "profit_and_loss"
-                            elif "balance sheet" in search_lower:
-                                note_query["metadata_filters"]["note_link"] = "balance_sheet"
-                            elif "cash flow" in search_lower:
-                                note_query["metadata_filters"]["note_link"] = "cash_flow"
-                        
-                        additional_note_queries.append(note_query)
-                        log.info(f"📝 Added note query for {metadata_filters.get('ticker', 'company')}: note_link={note_query['metadata_filters'].get('note_link')}")
-                
-                # Add note queries to the plan
-                query_plan.queries.extend(additional_note_queries)
-                log.info(f"🎯 Enhanced plan: {len(query_plan.queries)} total queries ({len(valid_queries)} statements + {len(additional_note_queries)} notes)")
+            query_plan = finalize_query_plan(query_plan, user_query)
             
             log.info(f"Claude parsing successful - Companies: {query_plan.companies}, Intent: {query_plan.intent}, Confidence: {query_plan.confidence}, Queries: {len(query_plan.queries)}")
             return query_plan
@@ -511,8 +587,84 @@ async def parse_query_with_claude(user_query: str, conversation_context: Optiona
             clarification=f"I couldn't understand your query. Please specify the company name, time period, and statement type. Example: 'HBL 2024 annual balance sheet'"
         )
 
-async def call_mcp_server(tool: str, args: Dict[str, Any]) -> Dict[str, Any]:
-    """Enhanced MCP server communication with improved error handling and async cleanup"""
+async def parse_query(user_query: str, conversation_context: Optional[ConversationContext] = None) -> QueryPlan:
+    """Plan a query with the rule-based parser when it is confident enough, otherwise with Claude"""
+    if FAST_PARSER_ENABLED:
+        bank_tickers = [t for t in TICKERS if "bank" in t["Company Name"].lower()]
+        parsed = parse_query_rules(user_query, bank_tickers)
+        reasons = parsed.pop("reasons")
+        if parsed["queries"] and parsed["confidence"] >= FAST_PARSER_MIN_CONFIDENCE:
+            query_plan = finalize_query_plan(QueryPlan.model_validate(parsed), user_query)
+            log.info(f"⚡ Rule-based parsing successful - Companies: {query_plan.companies}, Intent: {query_plan.intent}, Confidence: {query_plan.confidence}, Queries: {len(query_plan.queries)}")
+            return query_plan
+        log.info(f"Rule-based parser declined (confidence {parsed['confidence']:.2f}: {'; '.join(reasons) or 'below threshold'}) - using Claude")
+    return await parse_query_with_claude(user_query, conversation_context)
+
+def filing_periods(metadata_filters: Dict[str, Any]) -> List[str]:
+    period = metadata_filters.get("filing_period")
+    return [str(p) for p in (period if isinstance(period, list) else [period]) if p]
+
+def remove_periods(search_query: str, periods: List[str]) -> str:
+    """search_query without the given period tokens ("2024", "Q1-2024"), whitespace collapsed"""
+    for period in sorted(periods, key=len, reverse=True):
+        search_query = re.sub(rf"(?<![\w-]){re.escape(period)}(?![\w-])", " ", search_query, flags=re.IGNORECASE)
+    return " ".join(search_query.split())
+
+def optimize_query_plan(queries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop duplicate specs and merge specs that differ only by filing_period.
+
+    Specs with the same filters apart from filing_period, and the same search query
+    once their periods are taken out, become one spec whose filing_period is the
+    list of all their periods (OR-ed by the server) and whose top_k is the sum of
+    theirs, capped at PLAN_MERGED_TOP_K_MAX. Plan order is kept.
+    """
+    # Exact duplicates: same filters, top_k and query up to case and whitespace
+    unique_specs, seen = [], set()
+    for query_spec in queries:
+        key = json.dumps([" ".join(query_spec.get("search_query", "").lower().split()),
+                          query_spec.get("metadata_filters", {}), query_spec.get("top_k", 10)],
+                         sort_keys=True, default=str)
+        if key not in seen:
+            seen.add(key)
+            unique_specs.append(query_spec)
+    
+    # Group period-filtered specs by everything except their periods, keeping first-seen order
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for position, query_spec in enumerate(unique_specs):
+        metadata_filters = query_spec.get("metadata_filters", {})
+        periods = filing_periods(metadata_filters)
+        key = json.dumps([{k: v for k, v in metadata_filters.items() if k != "filing_period"},
+                          remove_periods(query_spec.get("search_query", ""), periods).lower()],
+                         sort_keys=True, default=str) if periods else str(position)
+        groups.setdefault(key, []).append(query_spec)
+    
+    optimized = []
+    for members in groups.values():
+        if len(members) == 1:
+            optimized.append(members[0])
+            continue
+        first = members[0]
+        periods = list(dict.fromkeys(p for member in members for p in filing_periods(member["metadata_filters"])))
+        base_query = remove_periods(first.get("search_query", ""), filing_periods(first["metadata_filters"]))
+        optimized.append({
+            **first,
+            "search_query": f"{base_query} {' '.join(periods)}".strip(),
+            "metadata_filters": {**first["metadata_filters"], "filing_period": periods},
+            "top_k": min(sum(member.get("top_k", 10) for member in members), PLAN_MERGED_TOP_K_MAX)
+        })
+    
+    if len(optimized) < len(queries):
+        log.info(f"🧩 Plan optimized: {len(queries)} → {len(optimized)} queries "
+                 f"({len(queries) - len(unique_specs)} duplicates removed, "
+                 f"{len(unique_specs) - len(optimized)} merged by filing period)")
+    return optimized
+
+async def call_mcp_server(tool: str, args: Dict[str, Any], startup_retries: int = SERVER_STARTING_RETRIES) -> Dict[str, Any]:
+    """Enhanced MCP server communication with improved error handling and async cleanup.
+
+    Calls rejected with the retryable ``server_starting`` error are retried after the
+    server's ``retry_after_seconds``, up to ``startup_retries`` times.
+    """
     mcp_session = cl.user_session.get("mcp_client")
     if not mcp_session:
         log.error("❌ MCP client session not found")
@@ -580,6 +732,11 @@ async def call_mcp_server(tool: str, args: Dict[str, Any]) -> Dict[str, Any]:
                 if "error" in parsed_response:
                     error_msg = parsed_response.get("error", "Unknown error")
                     error_type = parsed_response.get("error_type", "server_error")
+                    if error_type == "server_starting" and startup_retries > 0:
+                        delay = float(parsed_response.get("retry_after_seconds", 5))
+                        log.info(f"⏳ Server still {parsed_response.get('readiness', 'starting')} - retrying {tool} in {delay:.0f}s")
+                        await asyncio.sleep(delay)
+                        return await call_mcp_server(tool, args, startup_retries - 1)
                     log.warning(f"⚠️ Server returned {error_type}: {error_msg}")
                     return parsed_response
                 else:
@@ -610,6 +767,343 @@ async def call_mcp_server(tool: str, args: Dict[str, Any]) -> Dict[str, Any]:
             "error_type": "connection_error"
         }
 
+def batch_query_specs(queries: List[Dict[str, Any]], original_query: str) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """Non-empty query specs in batch-tool form, with their indices in the plan"""
+    batch_specs = []
+    batch_indices = []
+    for i, query_spec in enumerate(queries):
+        search_query = query_spec.get("search_query", "").strip()
+        metadata_filters = query_spec.get("metadata_filters", {})
+        if not search_query and not metadata_filters:
+            continue
+        batch_specs.append({
+            "search_query": search_query or original_query,
+            "metadata_filters": metadata_filters,
+            "top_k": query_spec.get("top_k", 10)
+        })
+        batch_indices.append(i)
+    return batch_specs, batch_indices
+
+async def prefetch_first_attempts(queries: List[Dict[str, Any]], original_query: str) -> Dict[int, Dict[str, Any]]:
+    """Run the first attempt of every query spec through psx_batch_search in one call.
+
+    Returns results keyed by query index. Single-query plans, empty specs and
+    batch failures (e.g. an older server without the tool) return no entry, so
+    the caller falls back to psx_search_financial_data for those.
+    """
+    if len(queries) <= 1:
+        return {}
+
+    batch_specs, batch_indices = batch_query_specs(queries, original_query)
+    if len(batch_specs) <= 1:
+        return {}
+
+    try:
+        batch_result = await call_mcp_server("psx_batch_search", {"queries": batch_specs, **SEARCH_RESPONSE_MODE})
+    except Exception as e:
+        if isinstance(e, asyncio.CancelledError):
+            raise
+        log.warning(f"⚠️ Batch search unavailable, falling back to per-query calls: {e}")
+        return {}
+
+    results = batch_result.get("results", []) if isinstance(batch_result, dict) else []
+    if batch_result.get("error_type") in FAST_FAIL_ERROR_TYPES:
+        # Per-query retries would only add load - every spec records the fast failure instead
+        log.warning(f"🚫 Batch search failed fast ({batch_result['error_type']}) - not retrying per query")
+        return {i: batch_result for i in batch_indices}
+    if "error" in batch_result or len(results) != len(batch_specs):
+        log.warning(f"⚠️ Batch search failed ({batch_result.get('error_type', 'unknown')}), falling back to per-query calls")
+        return {}
+
+    log.info(f"📦 Batch search returned {len(results)} results in one round trip")
+    return dict(zip(batch_indices, results))
+
+def refinement_ladder(query_spec: Dict[str, Any], original_query: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """(search_query, metadata_filters) for each refinement attempt; empty for an empty spec.
+
+    Attempt 2 narrows the query to "TICKER statement type"; attempt 3 broadens it to
+    "TICKER financial statement" without the statement_type filter. Steps that don't
+    apply repeat the spec as given.
+    """
+    search_query = query_spec.get("search_query", "").strip()
+    metadata_filters = query_spec.get("metadata_filters", {})
+    if not search_query and not metadata_filters:
+        return []
+    
+    company_ticker = metadata_filters.get("ticker", "")
+    statement_type = metadata_filters.get("statement_type", "")
+    ladder = []
+    for attempt in range(1, MAX_REFINEMENT_ATTEMPTS + 1):
+        current_search_query, filters = search_query, metadata_filters
+        if attempt == 2 and isinstance(company_ticker, str) and company_ticker and isinstance(statement_type, str) and statement_type:
+            # Attempt 2: Simplify search query, focus on company and statement type
+            current_search_query = f"{company_ticker} {statement_type.replace('_', ' ')}"
+        elif attempt == 3 and isinstance(company_ticker, str) and company_ticker:
+            # Attempt 3: Use broader search terms and drop the statement type filter
+            current_search_query = f"{company_ticker} financial statement"
+            filters = {k: v for k, v in metadata_filters.items() if k != "statement_type"}
+        # If search_query is empty but we have metadata filters, use original query as fallback
+        ladder.append((current_search_query or original_query, filters))
+    return ladder
+
+def judge_attempt(i: int, attempt: int, search_query: str, filters: Dict[str, Any],
+                  result: Dict[str, Any], final: bool) -> Dict[str, Any]:
+    """Attempt log entry; "success" needs a node scoring above the relevance bar (any nodes on the final attempt)"""
+    entry = {"query_index": i+1, "attempt": attempt, "search_query": search_query, "filters": filters}
+    if isinstance(result, dict) and "error" in result:
+        return {**entry, "result": "error", "error": result.get("error", "Unknown error"),
+                "error_type": result.get("error_type", "unknown")}
+    
+    nodes = result.get("nodes", [])
+    if not nodes:
+        return {**entry, "result": "no_results"}
+    # Keyword-only (BM25) hits carry no similarity score and never count as relevant; exact
+    # matches carry none either but are the complete chunk set the filters pinned
+    relevant_nodes = [n for n in nodes if n.get("exact_match") or (n.get("score") or 0) > RELEVANCE_SCORE_THRESHOLD]
+    return {
+        **entry,
+        "result": "success" if relevant_nodes or final else "low_relevance",
+        "nodes_count": len(nodes),
+        "relevant_nodes": len(relevant_nodes)
+    }
+
+async def search_attempt(search_query: str, metadata_filters: Dict[str, Any], top_k: int,
+                         semaphore: Optional[asyncio.Semaphore] = None, delay: float = 0.0) -> Dict[str, Any]:
+    """One psx_search_financial_data call, optionally started after a hedge delay"""
+    if delay > 0:
+        await asyncio.sleep(delay)
+    async with semaphore or contextlib.nullcontext():
+        return await call_mcp_server("psx_search_financial_data", {
+            "search_query": search_query,
+            "metadata_filters": metadata_filters,
+            "top_k": top_k,
+            **SEARCH_RESPONSE_MODE
+        })
+
+async def run_query_spec(i: int, query_spec: Dict[str, Any], original_query: str,
+                         prefetched_result: Optional[Dict[str, Any]] = None,
+                         semaphore: Optional[asyncio.Semaphore] = None) -> Dict[str, Any]:
+    """Run one query spec through the refinement ladder (up to 3 attempts).
+
+    Attempts are judged in ladder order. Normally each attempt makes its own call
+    once the previous one failed; with HEDGED_REFINEMENT the later attempts start
+    HEDGE_DELAY_SECONDS apart while earlier ones are still in flight, the first
+    passing attempt wins and the rest are cancelled (logged as "superseded" or
+    "cancelled"). Returns the accepted nodes, whether the spec succeeded and the
+    attempt log for ``query_stats``. ``semaphore`` bounds the number of in-flight MCP calls.
+    """
+    nodes_found = []
+    query_attempts = []
+    query_successful = False
+    
+    ladder = refinement_ladder(query_spec, original_query)
+    if not ladder:
+        log.warning(f"⚠️ Skipping empty query {i+1}")
+        return {"nodes": nodes_found, "successful": query_successful, "query_attempts": query_attempts}
+    
+    top_k = query_spec.get("top_k", 10)
+    variant_keys = [json.dumps([query, filters], sort_keys=True, default=str) for query, filters in ladder]
+    calls: Dict[int, asyncio.Future] = {}
+    if prefetched_result is not None:
+        calls[1] = asyncio.get_running_loop().create_future()
+        calls[1].set_result(prefetched_result)
+    
+    def failed(call: asyncio.Future) -> bool:
+        return call.done() and (call.cancelled() or call.exception() is not None or "error" in call.result())
+    
+    def launch(attempt: int, delay: float = 0.0) -> asyncio.Future:
+        """The attempt's call. Hedged, identical variants (e.g. attempt 2 when there is no
+        statement type) share one call - unless it failed, which gets a fresh call as a retry."""
+        call = calls.get(attempt)
+        if call is not None and not (failed(call) and any(calls.get(a) is call for a in range(1, attempt))):
+            return call
+        shared = [c for a, c in calls.items() if a < attempt and variant_keys[a - 1] == variant_keys[attempt - 1]]
+        if HEDGED_REFINEMENT and call is None and shared and not failed(shared[-1]):
+            calls[attempt] = shared[-1]
+        else:
+            search_query, filters = ladder[attempt - 1]
+            calls[attempt] = asyncio.ensure_future(search_attempt(search_query, filters, top_k, semaphore, delay))
+        return calls[attempt]
+    
+    try:
+        for attempt, (search_query, filters) in enumerate(ladder, start=1):
+            call = launch(attempt)
+            if HEDGED_REFINEMENT and not call.done():
+                # Hedge: later attempts start while this one is still in flight
+                for later in range(attempt + 1, len(ladder) + 1):
+                    launch(later, HEDGE_DELAY_SECONDS * (later - attempt))
+            
+            try:
+                result = await call
+                entry = judge_attempt(i, attempt, search_query, filters, result, attempt == len(ladder))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"❌ Query {i+1} attempt {attempt} failed: {e}")
+                entry = {"query_index": i+1, "attempt": attempt, "search_query": search_query,
+                         "filters": filters, "result": "exception", "error": str(e)}
+            query_attempts.append(entry)
+            
+            if entry["result"] == "success":
+                nodes_found.extend(result.get("nodes", []))
+                query_successful = True
+                break
+            if entry.get("error_type") in FAST_FAIL_ERROR_TYPES:
+                # The model is throttled or its circuit is open - refined queries would fail the same way
+                log.warning(f"🚫 Query {i+1} failed fast ({entry['error_type']}) - skipping remaining attempts")
+                break
+    finally:
+        # Hedged attempts that lost: record those that made their own call, then cancel any still running
+        for attempt in range(len(query_attempts) + 1, len(ladder) + 1):
+            call = calls.get(attempt)
+            if not HEDGED_REFINEMENT or call is None or any(calls.get(a) is call for a in range(1, attempt)):
+                continue
+            search_query, filters = ladder[attempt - 1]
+            superseded = call.done() and not call.cancelled() and call.exception() is None
+            query_attempts.append({
+                "query_index": i+1,
+                "attempt": attempt,
+                "search_query": search_query,
+                "filters": filters,
+                "result": "superseded" if superseded else "cancelled",
+                **({"nodes_count": len(call.result().get("nodes", []))} if superseded else {})
+            })
+        for call in calls.values():
+            if not call.done():
+                call.cancel()
+    
+    return {
+        "nodes": nodes_found,
+        "successful": query_successful,
+        "query_attempts": query_attempts
+    }
+
+def server_fallback_result(i: int, query_spec: Dict[str, Any], original_query: str,
+                           result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Convert a psx_search_with_fallback result to run_query_spec's shape.
+
+    None when the server couldn't run the ladder (e.g. an older server without
+    the tool) so the caller runs it locally.
+    """
+    search_query = query_spec.get("search_query", "").strip()
+    metadata_filters = query_spec.get("metadata_filters", {})
+    attempts = result.get("query_attempts")
+    fast_failed = result.get("error_type") in FAST_FAIL_ERROR_TYPES
+    if attempts is None or (not attempts and not fast_failed):
+        log.warning(f"⚠️ Server-side fallback unavailable for query {i+1} ({result.get('error_type', 'unknown')}) - "
+                    f"running the ladder locally")
+        return None
+    if not attempts:
+        attempts = [{"attempt": 1, "search_query": search_query or original_query, "filters": metadata_filters,
+                     "result": "error", "error": result.get("error"), "error_type": result["error_type"]}]
+    
+    successful = bool(result.get("successful"))
+    return {
+        "nodes": result.get("nodes", []) if successful else [],
+        "successful": successful,
+        "query_attempts": [{"query_index": i+1, **attempt} for attempt in attempts]
+    }
+
+async def run_query_spec_on_server(i: int, query_spec: Dict[str, Any], original_query: str,
+                                   semaphore: Optional[asyncio.Semaphore] = None) -> Optional[Dict[str, Any]]:
+    """Run one query spec's refinement ladder server-side with psx_search_with_fallback.
+
+    Returns the same shape as run_query_spec, or None when the server couldn't run
+    the ladder so the caller runs it locally.
+    """
+    search_query = query_spec.get("search_query", "").strip()
+    metadata_filters = query_spec.get("metadata_filters", {})
+    if not search_query and not metadata_filters:
+        log.warning(f"⚠️ Skipping empty query {i+1}")
+        return {"nodes": [], "successful": False, "query_attempts": []}
+    
+    async with semaphore or contextlib.nullcontext():
+        result = await call_mcp_server("psx_search_with_fallback", {
+            "search_query": search_query or original_query,
+            "metadata_filters": metadata_filters,
+            "top_k": query_spec.get("top_k", 10),
+            **SEARCH_RESPONSE_MODE
+        })
+    
+    return server_fallback_result(i, query_spec, original_query, result)
+
+async def run_plan_on_server(queries: List[Dict[str, Any]], original_query: str) -> Dict[int, Dict[str, Any]]:
+    """Run the refinement ladder of every query spec in one psx_batch_search_with_fallback call.
+
+    Returns run_query_spec-shaped results keyed by query index. Single-query plans,
+    empty specs and batch failures (e.g. an older server without the tool) return
+    no entry, so the caller runs those through run_query_spec_on_server.
+    """
+    if len(queries) <= 1:
+        return {}
+
+    batch_specs, batch_indices = batch_query_specs(queries, original_query)
+    if len(batch_specs) <= 1:
+        return {}
+
+    try:
+        batch_result = await call_mcp_server("psx_batch_search_with_fallback",
+                                             {"queries": batch_specs, **SEARCH_RESPONSE_MODE})
+    except Exception as e:
+        if isinstance(e, asyncio.CancelledError):
+            raise
+        log.warning(f"⚠️ Batch fallback search unavailable, falling back to per-query calls: {e}")
+        return {}
+
+    results = batch_result.get("results", []) if isinstance(batch_result, dict) else []
+    if batch_result.get("error_type") in FAST_FAIL_ERROR_TYPES:
+        # Per-query calls would only add load - every spec records the fast failure instead
+        log.warning(f"🚫 Batch fallback search failed fast ({batch_result['error_type']}) - not retrying per query")
+        results = [batch_result] * len(batch_specs)
+    elif "error" in batch_result or len(results) != len(batch_specs):
+        log.warning(f"⚠️ Batch fallback search failed ({batch_result.get('error_type', 'unknown')}), "
+                    f"falling back to per-query calls")
+        return {}
+
+    spec_results = {}
+    for i, result in zip(batch_indices, results):
+        spec_result = server_fallback_result(i, queries[i], original_query, result)
+        if spec_result is not None:
+            spec_results[i] = spec_result
+    log.info(f"📦 Batch fallback search ran {len(spec_results)} ladders in one round trip")
+    return spec_results
+
+async def hydrate_nodes(nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fill in text and full metadata for lean search nodes, fetching each distinct chunk once.
+
+    Nodes whose chunk can't be fetched are dropped - without text they are no use to the LLM.
+    """
+    pending_ids = list(dict.fromkeys(n["node_id"] for n in nodes if "text" not in n and n.get("node_id")))
+    if not pending_ids:
+        return nodes
+    
+    result = await call_mcp_server("psx_get_chunks", {"node_ids": pending_ids})
+    if "error" in result:
+        log.error(f"❌ Chunk fetch failed ({result.get('error_type', 'unknown')}): {result.get('error')}")
+        return [n for n in nodes if "text" in n]
+    
+    chunks = {chunk["node_id"]: chunk for chunk in result.get("chunks", [])}
+    hydrated = []
+    for node in nodes:
+        if "text" in node:
+            hydrated.append(node)
+        elif node.get("node_id") in chunks:
+            chunk = chunks[node["node_id"]]
+            hydrated.append({**node, "text": chunk["text"], "metadata": chunk["metadata"]})
+    
+    log.info(f"📄 Fetched {len(chunks)} distinct chunks for {len(nodes)} nodes"
+             + (f" ({len(result.get('missing', []))} missing)" if result.get("missing") else ""))
+    return hydrated
+
+def get_query_semaphore() -> asyncio.Semaphore:
+    """Get or create the per-session semaphore bounding concurrent search calls"""
+    semaphore = cl.user_session.get("query_semaphore")
+    if semaphore is None:
+        max_inflight = cl.user_session.get("max_concurrent_queries") or MAX_CONCURRENT_QUERIES
+        semaphore = asyncio.Semaphore(max(1, int(max_inflight)))
+        cl.user_session.set("query_semaphore", semaphore)
+    return semaphore
+
 async def execute_financial_query(query_plan: QueryPlan, original_query: str) -> Dict[str, Any]:
     """Enhanced query execution with query refinement and improved error handling"""
     log.info(f"🎯 Executing {len(query_plan.queries)} queries for {query_plan.companies}")
@@ -618,133 +1112,52 @@ async def execute_financial_query(query_plan: QueryPlan, original_query: str) ->
     successful_queries = 0
     failed_queries = 0
     query_attempts = []
+
+    # Multi-query plans: run every ladder server-side in one batched round trip, or
+    # every first attempt in one batched round trip when the ladder runs locally
+    server_results, prefetched_results = {}, {}
+    if SERVER_SIDE_FALLBACK:
+        server_results = await run_plan_on_server(query_plan.queries, original_query)
+    else:
+        prefetched_results = await prefetch_first_attempts(query_plan.queries, original_query)
+
+    # Fan out all specs concurrently; the session semaphore bounds in-flight calls
+    semaphore = get_query_semaphore()
+
+    async def run_spec(i: int, query_spec: Dict[str, Any]) -> Dict[str, Any]:
+        if i in server_results:
+            return server_results[i]
+        if SERVER_SIDE_FALLBACK:
+            spec_result = await run_query_spec_on_server(i, query_spec, original_query, semaphore)
+            if spec_result is not None:
+                return spec_result
+        return await run_query_spec(i, query_spec, original_query, prefetched_results.get(i), semaphore)
+
+    spec_results = await asyncio.gather(*(
+        run_spec(i, query_spec) for i, query_spec in enumerate(query_plan.queries)
+    ))
     
-    # Execute all queries in the plan with refinement logic
-    for i, query_spec in enumerate(query_plan.queries):
-        query_successful = False
-        attempt_count = 0
-        max_attempts = 3
-        
-        # Try multiple search strategies for each query
-        while not query_successful and attempt_count < max_attempts:
-            try:
-                attempt_count += 1
-                current_search_query = query_spec.get("search_query", "").strip()
-                metadata_filters = query_spec.get("metadata_filters", {})
-                
-                # Skip empty queries
-                if not current_search_query and not metadata_filters:
-                    log.warning(f"⚠️ Skipping empty query {i+1}")
-                    failed_queries += 1
-                    break
-                
-                # Query refinement strategies for subsequent attempts
-                if attempt_count > 1:
-                    company_ticker = metadata_filters.get("ticker", "")
-                    statement_type = metadata_filters.get("statement_type", "")
-                    
-                    if attempt_count == 2:
-                        # Attempt 2: Simplify search query, focus on company and statement type
-                        if company_ticker and statement_type:
-                            current_search_query = f"{company_ticker} {statement_type.replace('_', ' ')}"
-                    elif attempt_count == 3:
-                        # Attempt 3: Use broader search terms
-                        if company_ticker:
-                            current_search_query = f"{company_ticker} financial statement"
-                            # Remove specific statement type filter to broaden search
-                            if "statement_type" in metadata_filters:
-                                metadata_filters = {k: v for k, v in metadata_filters.items() if k != "statement_type"}
-                
-                # If search_query is empty but we have metadata filters, use original query as fallback
-                if not current_search_query and metadata_filters:
-                    current_search_query = original_query
-                
-                result = await call_mcp_server("psx_search_financial_data", {
-                    "search_query": current_search_query,
-                    "metadata_filters": metadata_filters,
-                    "top_k": query_spec.get("top_k", 10)
-                })
-                
-                # Error handling for server responses
-                if isinstance(result, dict) and "error" in result:
-                    error_msg = result.get("error", "Unknown error")
-                    error_type = result.get("error_type", "unknown")
-                    
-                    # Record the attempt
-                    query_attempts.append({
-                        "query_index": i+1,
-                        "attempt": attempt_count,
-                        "search_query": current_search_query,
-                        "filters": metadata_filters,
-                        "result": "error",
-                        "error": error_msg
-                    })
-                    continue
-                
-                nodes = result.get("nodes", [])
-                
-                # Check if we got meaningful results
-                if nodes:
-                    # Check relevance scores - if all scores are very low, consider it a failed attempt
-                    relevant_nodes = [n for n in nodes if n.get("score", 0) > 0.5]
-                    if relevant_nodes or attempt_count == max_attempts:  # Accept any results on final attempt
-                        all_nodes.extend(nodes)
-                        successful_queries += 1
-                        query_successful = True
-                        
-                        # Record successful attempt
-                        query_attempts.append({
-                            "query_index": i+1,
-                            "attempt": attempt_count,
-                            "search_query": current_search_query,
-                            "filters": metadata_filters,
-                            "result": "success",
-                            "nodes_count": len(nodes),
-                            "relevant_nodes": len(relevant_nodes)
-                        })
-                    else:
-                        query_attempts.append({
-                            "query_index": i+1,
-                            "attempt": attempt_count,
-                            "search_query": current_search_query,
-                            "filters": metadata_filters,
-                            "result": "low_relevance",
-                            "nodes_count": len(nodes),
-                            "relevant_nodes": len(relevant_nodes)
-                        })
-                        continue
-                else:
-                    query_attempts.append({
-                        "query_index": i+1,
-                        "attempt": attempt_count,
-                        "search_query": current_search_query,
-                        "filters": metadata_filters,
-                        "result": "no_results"
-                    })
-                    continue
-                
-            except Exception as e:
-                log.error(f"❌ Query {i+1} attempt {attempt_count} failed: {e}")
-                query_attempts.append({
-                    "query_index": i+1,
-                    "attempt": attempt_count,
-                    "search_query": current_search_query if 'current_search_query' in locals() else "unknown",
-                    "filters": metadata_filters if 'metadata_filters' in locals() else {},
-                    "result": "exception",
-                    "error": str(e)
-                })
-                continue
-        
-        if not query_successful:
+    # Merge in plan order so nodes and attempt logs match sequential execution
+    for spec_result in spec_results:
+        all_nodes.extend(spec_result["nodes"])
+        query_attempts.extend(spec_result["query_attempts"])
+        if spec_result["successful"]:
+            successful_queries += 1
+        else:
             failed_queries += 1
     
+    # Lean results carry ids only: fetch every distinct chunk in one call
+    all_nodes = await hydrate_nodes(all_nodes)
+    
     # Result summary
     total_queries = len(query_plan.queries)
     log.info(f"📊 Query execution: {successful_queries}/{total_queries} successful")
     
     if not all_nodes:
         error_msg = "No financial data found for your query"
-        if failed_queries == total_queries:
+        if any(a.get("error_type") in FAST_FAIL_ERROR_TYPES for a in query_attempts):
+            error_msg += " - the search service is rate limited right now, please try again shortly"
+        elif failed_queries == total_queries:
             error_msg += f" - all {total_queries} queries failed after multiple attempts"
         elif failed_queries > 0:
             error_msg += f" - {failed_queries}/{total_queries} queries failed"
@@ -843,17 +1256,37 @@ async def stream_formatted_response(query: str, nodes: List[Dict], intent: str,
     
     # Stream response using LLM directly
     try:
+        await streaming_llm_guard.acquire()
         stream = await streaming_llm.astream_complete(full_prompt)
         
         async for chunk in stream:
             if chunk.delta:
                 yield chunk.delta
+        streaming_llm_guard.record_success()
         
+    except ModelUnavailableError as e:
+        log.warning(f"🚫 Analysis model unavailable ({e.error_type}): {streaming_llm_guard.stats()}")
+        yield (f"\n\n⚠️ The analysis model is currently {'rate limited' if e.error_type == 'rate_limited' else 'unavailable'}. "
+               f"Please try again in about {max(1, round(e.retry_after_seconds))} seconds.")
     except Exception as e:
         log.error(f"Streaming error: {e}")
+        streaming_llm_guard.record_failure(e)
+        if is_overload_error(e):
+            # A non-streaming retry against a throttled model only deepens the throttling
+            yield "\n\n⚠️ The analysis model is overloaded right now. Please try again shortly."
+            return
         # Fallback to regular completion
-        response = await streaming_llm.acomplete(full_prompt)
+        try:
+            response = await streaming_llm_guard.call(lambda: streaming_llm.acomplete(full_prompt))
+        except ModelUnavailableError as unavailable:
+            yield (f"\n\n⚠️ The analysis model is currently unavailable. "
+                   f"Please try again in about {max(1, round(unavailable.retry_after_seconds))} seconds.")
+            return
         yield str(response)
+    except BaseException:
+        # Cancelled or closed mid-stream: no verdict, but give back a half-open trial slot
+        streaming_llm_guard.release_trial()
+        raise
 
 # ─────────────────────────── Chainlit UI ────────────────────────────────
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME")
@@ -890,11 +1323,11 @@ async def on_message(message: cl.Message):
         # Load conversation context
         conversation_context = get_conversation_context()
         
-        # Step 1: Parse query with Claude
+        # Step 1: Parse query (rule-based fast path, Claude otherwise)
         step1 = cl.Message(content="🧠 **Step 1:** Analyzing your query...")
         await step1.send()
         
-        query_plan = await parse_query_with_claude(message.content, conversation_context)
+        query_plan = await parse_query(message.content, conversation_context)
         
         # Handle clarification needs
         if query_plan.needs_clarification:
@@ -0,0 +1,257 @@
+"""
+PSX Financial Server - Retrieval Microbenchmarks
+Synthetic benchmarks for the vector scoring engine in vector_store.py.
+
+Usage:
+    python benchmark_retrieval.py scoring [--sizes 10000 100000 1000000] [--dim 768]
+    python benchmark_retrieval.py ann [--size 200000] [--nprobe 4 8 16 32] [--store-dir gemini_index_metadata/mmap_store]
+    python benchmark_retrieval.py quantization [--size 200000] [--index-dir gemini_index_metadata]
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from vector_store import IVFIndex, MmapVectorStore, convert_index, normalize_vector, score_top_k, write_store
+
+
+def make_corpus(count: int, dim: int, seed: int = 7) -> np.ndarray:
+    """Random unit-normalized float32 embeddings, generated block by block"""
+    rng = np.random.default_rng(seed)
+    corpus = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 100_000):
+        block = rng.standard_normal((min(100_000, count - start), dim), dtype=np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        corpus[start:start + len(block)] = block
+    return corpus
+
+
+def make_clustered_corpus(count: int, dim: int, n_clusters: int = 500, spread: float = 0.35, seed: int = 7) -> np.ndarray:
+    """Unit-normalized embeddings drawn around random topic centers (closer to real text embeddings)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim), dtype=np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    corpus = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 100_000):
+        size = min(100_000, count - start)
+        block = centers[rng.integers(0, n_clusters, size)]
+        block += spread * rng.standard_normal((size, dim), dtype=np.float32) / np.sqrt(dim)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        corpus[start:start + size] = block
+    return corpus
+
+
+def time_queries(fn: Callable[[np.ndarray], object], queries: np.ndarray) -> Dict[str, float]:
+    """Per-query latency (ms) of fn over all queries, after one warm-up call"""
+    fn(queries[0])
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+    }
+
+
+def benchmark_scoring(sizes: List[int], dim: int, top_k: int, num_queries: int, baseline_max: int):
+    """Compare the numpy engine against llama-index's SimpleVectorStore scoring loop"""
+    try:
+        from llama_index.core.indices.query.embedding_utils import get_top_k_embeddings
+    except ImportError:
+        get_top_k_embeddings = None
+        print("llama-index not installed - skipping the baseline column")
+
+    rng = np.random.default_rng(11)
+    queries = np.stack([normalize_vector(q) for q in rng.standard_normal((num_queries, dim))])
+
+    print(f"\nScoring benchmark: dim={dim}, top_k={top_k}, {num_queries} queries per size")
+    print(f"{'chunks':>10} | {'engine p50':>11} | {'engine p95':>11} | {'baseline p50':>13} | {'speedup':>8}")
+    print("-" * 66)
+
+    for size in sizes:
+        corpus = make_corpus(size, dim)
+        engine = time_queries(lambda q: score_top_k(corpus, q, top_k), queries)
+
+        baseline_cell, speedup_cell = "skipped", "-"
+        if get_top_k_embeddings and size <= baseline_max:
+            # SimpleVectorStore keeps embeddings as Python float lists and rebuilds
+            # an ndarray on every query before scoring node by node
+            corpus_lists = corpus.tolist()
+            node_ids = list(range(size))
+            baseline = time_queries(
+                lambda q: get_top_k_embeddings(q.tolist(), corpus_lists, similarity_top_k=top_k, embedding_ids=node_ids),
+                queries[: max(3, num_queries // 10)]
+            )
+            baseline_cell = f"{baseline['p50_ms']:>10.2f} ms"
+            speedup_cell = f"{baseline['p50_ms'] / engine['p50_ms']:>7.0f}x"
+            del corpus_lists
+
+        print(f"{size:>10} | {engine['p50_ms']:>8.2f} ms | {engine['p95_ms']:>8.2f} ms | {baseline_cell:>13} | {speedup_cell:>8}")
+        del corpus
+
+
+def recall_at_k(approximate_rows: np.ndarray, exact_rows: np.ndarray) -> float:
+    if len(exact_rows) == 0:
+        return 1.0
+    return len(np.intersect1d(approximate_rows, exact_rows)) / len(exact_rows)
+
+
+def benchmark_ann(size: int, dim: int, top_k: int, num_queries: int, nprobes: List[int],
+                  n_lists: Optional[int], filter_fraction: float, store_dir: Optional[str]):
+    """Recall@k and latency of the IVF engine against exact search on the same corpus"""
+    rng = np.random.default_rng(3)
+    if store_dir:
+        store = MmapVectorStore.load(Path(store_dir))
+        corpus = store.embeddings
+        print(f"\nANN benchmark on {store_dir}: {store.count} chunks, dim={store.dim}, dtype={store.dtype}")
+    else:
+        corpus = make_clustered_corpus(size, dim)
+        print(f"\nANN benchmark on synthetic clustered corpus: {size} chunks, dim={dim}")
+
+    # Queries are perturbed corpus rows, like paraphrases of indexed text
+    seeds = np.asarray(corpus[rng.choice(len(corpus), size=num_queries, replace=False)], dtype=np.float32)
+    queries = np.stack([normalize_vector(q) for q in seeds + 0.3 * rng.standard_normal(seeds.shape) / np.sqrt(seeds.shape[1])])
+
+    started = time.perf_counter()
+    ivf = IVFIndex.build(corpus, n_lists=n_lists, exact_threshold=0)
+    print(f"IVF build: {ivf.n_lists} lists in {time.perf_counter() - started:.1f}s")
+
+    scenarios = [("unfiltered", None)]
+    if filter_fraction > 0:
+        candidates = np.sort(rng.choice(len(corpus), size=int(len(corpus) * filter_fraction), replace=False))
+        scenarios.append((f"filtered {filter_fraction:.0%}", candidates))
+
+    print(f"\n{'scenario':>14} | {'engine':>12} | {'recall@' + str(top_k):>9} | {'p50':>9} | {'p95':>9}")
+    print("-" * 66)
+    for label, candidates in scenarios:
+        exact_results = [score_top_k(corpus, q, top_k, candidates)[0] for q in queries]
+        exact = time_queries(lambda q: score_top_k(corpus, q, top_k, candidates), queries)
+        print(f"{label:>14} | {'exact':>12} | {1.0:>9.3f} | {exact['p50_ms']:>6.2f} ms | {exact['p95_ms']:>6.2f} ms")
+
+        for nprobe in nprobes:
+            recalls = [
+                recall_at_k(ivf.search(corpus, q, top_k, candidates, nprobe=nprobe)[0], exact_rows)
+                for q, exact_rows in zip(queries, exact_results)
+            ]
+            timing = time_queries(lambda q: ivf.search(corpus, q, top_k, candidates, nprobe=nprobe), queries)
+            print(f"{label:>14} | {'ivf np=' + str(nprobe):>12} | {statistics.mean(recalls):>9.3f} | "
+                  f"{timing['p50_ms']:>6.2f} ms | {timing['p95_ms']:>6.2f} ms")
+
+
+QUANTIZATION_MODES = [
+    ("float32", False),
+    ("float16", False),
+    ("float16", True),
+    ("int8", False),
+    ("int8", True),
+]
+
+
+def benchmark_quantization(size: int, dim: int, top_k: int, num_queries: int, filter_fraction: float,
+                           oversample: int, index_dir: Optional[str]):
+    """Memory, latency and recall@k of float16/int8 stores (with and without rescoring) versus float32"""
+    rng = np.random.default_rng(5)
+    with tempfile.TemporaryDirectory() as work_dir:
+        work_dir = Path(work_dir)
+
+        def build(dtype: str, rescore: bool) -> MmapVectorStore:
+            store_dir = work_dir / f"{dtype}{'_rescore' if rescore else ''}"
+            if index_dir:
+                convert_index(Path(index_dir), store_dir, dtype=dtype, rescore=rescore)
+            else:
+                rows = ((vector, "", {}) for vector in corpus)
+                write_store(store_dir, [str(i) for i in range(len(corpus))], rows, corpus.shape[1],
+                            dtype=dtype, rescore=rescore)
+            return MmapVectorStore.load(store_dir, rescore_oversample=oversample)
+
+        if index_dir:
+            reference = build("float32", False)
+            corpus = np.asarray(reference.embeddings, dtype=np.float32)
+            print(f"\nQuantization benchmark on {index_dir}: {len(corpus)} chunks, dim={corpus.shape[1]}")
+        else:
+            corpus = make_clustered_corpus(size, dim)
+            print(f"\nQuantization benchmark on synthetic clustered corpus: {size} chunks, dim={dim}")
+
+        seeds = corpus[rng.choice(len(corpus), size=min(num_queries, len(corpus)), replace=False)]
+        queries = np.stack([normalize_vector(q) for q in seeds + 0.3 * rng.standard_normal(seeds.shape) / np.sqrt(seeds.shape[1])])
+
+        scenarios = [("unfiltered", None)]
+        if filter_fraction > 0:
+            candidates = np.sort(rng.choice(len(corpus), size=max(top_k, int(len(corpus) * filter_fraction)), replace=False))
+            scenarios.append((f"filtered {filter_fraction:.0%}", candidates))
+
+        print(f"\n{'mode':>16} | {'scenario':>14} | {'matrix MB':>9} | {'recall@' + str(top_k):>9} | {'p50':>9} | {'p95':>9}")
+        print("-" * 82)
+        baseline_bytes = None
+        for dtype, rescore in QUANTIZATION_MODES:
+            store = build(dtype, rescore)
+            memory = store.memory_stats()
+            baseline_bytes = baseline_bytes or memory["embedding_bytes"]
+            label = f"{dtype}{' + rescore' if rescore else ''}"
+            for scenario, candidates in scenarios:
+                recalls = []
+                for query in queries:
+                    exact_rows = score_top_k(corpus, query, top_k, candidates)[0]
+                    rows = np.array([row for row, _ in store.search(query, top_k, candidates)])
+                    recalls.append(recall_at_k(rows, exact_rows))
+                timing = time_queries(lambda q: store.search(q, top_k, candidates), queries)
+                print(f"{label:>16} | {scenario:>14} | {memory['embedding_bytes'] / 2**20:>9.1f} | "
+                      f"{statistics.mean(recalls):>9.3f} | {timing['p50_ms']:>6.2f} ms | {timing['p95_ms']:>6.2f} ms")
+            print(f"{'':>16}   memory vs float32: {memory['embedding_bytes'] / baseline_bytes:.0%}"
+                  f"{' (rescore copy stays on disk)' if rescore else ''}")
+            store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PSX retrieval benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scoring_parser = subparsers.add_parser("scoring", help="Per-query vector scoring latency")
+    scoring_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    scoring_parser.add_argument("--dim", type=int, default=768, help="text-embedding-004 produces 768-dim vectors")
+    scoring_parser.add_argument("--top-k", type=int, default=10)
+    scoring_parser.add_argument("--queries", type=int, default=50)
+    scoring_parser.add_argument("--baseline-max", type=int, default=100_000,
+                                help="Skip the (slow, memory-hungry) baseline above this corpus size")
+
+    ann_parser = subparsers.add_parser("ann", help="IVF recall@k and latency versus exact search")
+    ann_parser.add_argument("--size", type=int, default=200_000)
+    ann_parser.add_argument("--dim", type=int, default=768)
+    ann_parser.add_argument("--top-k", type=int, default=10)
+    ann_parser.add_argument("--queries", type=int, default=100)
+    ann_parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    ann_parser.add_argument("--n-lists", type=int, default=None)
+    ann_parser.add_argument("--filter-fraction", type=float, default=0.3,
+                            help="Also measure with a random metadata candidate set of this size")
+    ann_parser.add_argument("--store-dir", default=None, help="Benchmark a converted mmap store instead of synthetic data")
+
+    quant_parser = subparsers.add_parser("quantization", help="float16/int8 storage: memory, latency and recall versus float32")
+    quant_parser.add_argument("--size", type=int, default=200_000)
+    quant_parser.add_argument("--dim", type=int, default=768)
+    quant_parser.add_argument("--top-k", type=int, default=10)
+    quant_parser.add_argument("--queries", type=int, default=100)
+    quant_parser.add_argument("--filter-fraction", type=float, default=0.1)
+    quant_parser.add_argument("--oversample", type=int, default=4, help="Rescore oversample factor (x top_k)")
+    quant_parser.add_argument("--index-dir", default=None, help="Benchmark our JSON index instead of synthetic data")
+
+    args = parser.parse_args()
+    if args.command == "scoring":
+        benchmark_scoring(args.sizes, args.dim, args.top_k, args.queries, args.baseline_max)
+    elif args.command == "ann":
+        benchmark_ann(args.size, args.dim, args.top_k, args.queries, args.nprobe,
+                      args.n_lists, args.filter_fraction, args.store_dir)
+    elif args.command == "quantization":
+        benchmark_quantization(args.size, args.dim, args.top_k, args.queries, args.filter_fraction,
+                               args.oversample, args.index_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+PSX Financial Server - Caching Layer
+Caches that sit in front of the embedding model and the vector index.
+"""
+
+import asyncio
+import fnmatch
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger("psx-server-enhanced")
+
+
+def normalize_query_text(text: str) -> str:
+    """Normalize query text for cache keys (case and whitespace insensitive)"""
+    return " ".join(str(text).split()).casefold()
+
+
+# ─────────────────────────── Query Embedding Cache ──────────────────────
+class EmbeddingCache:
+    """In-memory LRU of query embeddings backed by a SQLite file that survives restarts.
+
+    Keys are (model name, normalized query text); vectors are stored as float32
+    blobs. Memory lookups are synchronous; SQLite access is thread-safe so it can
+    be pushed to a worker thread with ``asyncio.to_thread``.
+    """
+
+    def __init__(self, db_path: Path, model_name: str, max_memory_entries: int = 10000):
+        self.db_path = Path(db_path)
+        self.model_name = model_name
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            " model TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text))"
+        )
+        self._conn.commit()
+
+    def get_from_memory(self, text: str) -> Optional[List[float]]:
+        """Return a cached embedding from the in-memory LRU, or None"""
+        key = normalize_query_text(text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+            return vector
+
+    def get_from_disk(self, text: str) -> Optional[List[float]]:
+        """Return a cached embedding from SQLite (promoting it to memory), or None"""
+        key = normalize_query_text(text)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM query_embeddings WHERE model = ? AND text = ?",
+                (self.model_name, key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            vector = array("f", row[0]).tolist()
+            self._remember(key, vector)
+            self.hits += 1
+            self.disk_hits += 1
+            return vector
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """Store several embeddings in memory and on disk"""
+        rows = []
+        with self._lock:
+            for text, vector in items.items():
+                key = normalize_query_text(text)
+                vector = list(vector)
+                self._remember(key, vector)
+                rows.append((self.model_name, key, len(vector), array("f", vector).tobytes()))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO query_embeddings (model, text, dim, vector) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for health reporting"""
+        with self._lock:
+            disk_entries = self._conn.execute(
+                "SELECT COUNT(*) FROM query_embeddings WHERE model = ?", (self.model_name,)
+            ).fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ─────────────────────────── Search Result Cache ────────────────────────
+def canonicalize_filters(metadata_filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Canonical form of search filters: None dropped, values stringified, filing_period lists sorted"""
+    canonical: Dict[str, Any] = {}
+    for key, value in (metadata_filters or {}).items():
+        if value is None:
+            continue
+        if key == "filing_period" and isinstance(value, list):
+            canonical[key] = sorted({str(p).strip() for p in value if p and str(p).strip()})
+        else:
+            canonical[key] = str(value)
+    return canonical
+
+
+# Search artifacts the server derives from the index (and may write after fingerprinting it)
+DERIVED_INDEX_ARTIFACTS = ("bm25_*", "ivf_*")
+
+
+def compute_index_version(index_dir: Path) -> str:
+    """Fingerprint of an index directory (file names, sizes and mtimes), ignoring derived artifacts"""
+    digest = hashlib.sha1()
+    index_dir = Path(index_dir)
+    if index_dir.exists():
+        for path in sorted(p for p in index_dir.rglob("*") if p.is_file()):
+            if any(fnmatch.fnmatch(path.name, pattern) for pattern in DERIVED_INDEX_ARTIFACTS):
+                continue
+            stat = path.stat()
+            digest.update(f"{path.relative_to(index_dir)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    """TTL + LRU cache of search results, scoped to the index version they came from.
+
+    Entries from an older index version are treated as misses and the whole cache
+    is dropped the first time a new version is seen.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 900.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._index_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(search_query: str, metadata_filters: Optional[Dict[str, Any]], top_k: int, **options: Any) -> str:
+        """Cache key from normalized query text, canonical filters, top_k and any extra search options"""
+        return json.dumps(
+            [normalize_query_text(search_query), canonicalize_filters(metadata_filters), int(top_k), options],
+            sort_keys=True,
+            default=str
+        )
+
+    def _check_version(self, index_version: str):
+        if self._index_version != index_version:
+            if self._entries:
+                log.info(f"🔄 Index version changed ({self._index_version} → {index_version}), clearing result cache")
+                self.invalidations += 1
+            self._entries.clear()
+            self._index_version = index_version
+
+    def _lookup(self, key: str, index_version: str) -> Optional[Dict[str, Any]]:
+        self._check_version(index_version)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def peek(self, key: str, index_version: str) -> bool:
+        """Whether a fresh entry exists, without touching the hit/miss counters"""
+        with self._lock:
+            return self._lookup(key, index_version) is not None
+
+    def get(self, key: str, index_version: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._lookup(key, index_version)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key: str, index_version: str, value: Dict[str, Any]):
+        with self._lock:
+            self._check_version(index_version)
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "index_version": self._index_version,
+            }
+
+
+# ─────────────────────────── Request Coalescing ─────────────────────────
+class SingleFlight:
+    """Coalesces concurrent calls with the same key onto one in-flight computation.
+
+    The first caller starts the computation as its own task; callers arriving
+    while it runs await the same task instead of repeating the work. The task is
+    shielded, so a caller that gives up (e.g. a dropped client) doesn't cancel it
+    for the others. Finished results aren't kept here - that is the result cache's job.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, "asyncio.Task"] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Result of compute() for key, and whether this call joined one already running"""
+        task = self._in_flight.get(key)
+        joined = task is not None
+        if joined:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), joined
+
+    def _finish(self, key: str, task: "asyncio.Task"):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark failures retrieved even when every caller has already gone
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._in_flight),
+            "computations": self.leaders,
+            "coalesced_calls": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+        }
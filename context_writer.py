@@ -0,0 +1,132 @@
+"""
+PSX Financial - Background Debug Context Writer
+Shared by the MCP server and the Chainlit client to persist debug contexts
+without doing disk I/O on the request path.
+
+Records are queued in memory and appended by a background task to
+size-rotated, gzip-compressed JSONL segments:
+
+    <directory>/<prefix>_<YYYYmmdd_HHMMSS>.jsonl.gz
+
+Segments roll over at ``segment_max_bytes`` and the oldest are deleted once the
+directory exceeds ``max_total_bytes``. Find a record with
+``zgrep <record_id> <directory>/*.jsonl.gz``.
+"""
+
+import asyncio
+import datetime
+import gzip
+import itertools
+import json
+import logging
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+
+class ContextWriter:
+    """Queue + worker task that appends sampled context records to rotated JSONL.gz segments"""
+
+    def __init__(self, directory: Path, prefix: str, sample_rate: float = 1.0,
+                 segment_max_bytes: int = 8 * 1024 * 1024, max_total_bytes: int = 256 * 1024 * 1024,
+                 queue_size: int = 1000, batch_size: int = 100):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.sample_rate = sample_rate
+        self.segment_max_bytes = segment_max_bytes
+        self.max_total_bytes = max_total_bytes
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._segment: Optional[Path] = None
+        self._counter = itertools.count(1)
+
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.write_errors = 0
+
+    def submit(self, record: Dict[str, Any]) -> str:
+        """Queue a record without blocking; returns its record id ("" if sampled out or dropped)"""
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            self.sampled_out += 1
+            return ""
+
+        try:
+            self._ensure_worker()
+        except RuntimeError:
+            # No running event loop (e.g. called from a plain thread) - nothing to write with
+            self.dropped += 1
+            return ""
+
+        now = datetime.datetime.now()
+        record_id = f"{self.prefix}_{now:%Y%m%d_%H%M%S}_{now.microsecond // 1000:03d}_{next(self._counter)}"
+        try:
+            self._queue.put_nowait({"record_id": record_id, **record})
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return ""
+        return record_id
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._worker = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+                self.written += len(batch)
+            except Exception as e:
+                self.write_errors += 1
+                log.warning(f"⚠️ Failed to write {len(batch)} context records: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self._segment is None or not self._segment.exists() or self._segment.stat().st_size >= self.segment_max_bytes:
+            self._segment = self.directory / f"{self.prefix}_{datetime.datetime.now():%Y%m%d_%H%M%S_%f}.jsonl.gz"
+
+        payload = "".join(json.dumps(record, separators=(",", ":"), default=str) + "\n" for record in batch)
+        # Each append adds a gzip member; concatenated members are still one valid gzip file
+        with gzip.open(self._segment, "at", encoding="utf-8") as segment:
+            segment.write(payload)
+
+        self._enforce_budget()
+
+    def _enforce_budget(self):
+        segments = sorted(self.directory.glob(f"{self.prefix}_*.jsonl.gz"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in segments)
+        while segments and total > self.max_total_bytes:
+            oldest = segments.pop(0)
+            if oldest == self._segment:
+                break
+            total -= oldest.stat().st_size
+            oldest.unlink(missing_ok=True)
+
+    async def flush(self, timeout: float = 5.0):
+        """Wait until queued records are on disk"""
+        if self._queue is not None and self._worker is not None and not self._worker.done():
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "written": self.written,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "write_errors": self.write_errors,
+            "sample_rate": self.sample_rate,
+            "current_segment": self._segment.name if self._segment else None,
+        }
@@ -0,0 +1,121 @@
+"""
+PSX Financial Server - Embedding Micro-Batcher
+Collects query strings from concurrent searches for a short window and sends
+them to the embedding model as one batched request, instead of one request per
+search each paying the full API round trip.
+
+    search A ──┐
+    search B ──┼─▶ window (EMBED_BATCH_WINDOW_MS) or size cap ──▶ one embed call ──▶ vectors fanned back out
+    search C ──┘
+
+The embed function is injected (an async ``List[str] -> List[vector]``), so the
+batcher works the same against the Gemini model or a local fake embedder.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger("psx-server-enhanced")
+
+EmbedFunction = Callable[[List[str]], Awaitable[List[Any]]]
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent embed() calls into batched embed_fn requests.
+
+    The first text queued opens a window of ``window_seconds``; the batch is
+    flushed when the window closes or ``max_batch_size`` distinct texts are
+    waiting, whichever comes first. A failed batch fails every caller in it.
+    """
+
+    def __init__(self, embed_fn: EmbedFunction, window_seconds: float = 0.005, max_batch_size: int = 100,
+                 on_batch: Optional[Callable[[int, int], None]] = None):
+        self.embed_fn = embed_fn
+        self.window_seconds = window_seconds
+        self.max_batch_size = max(1, max_batch_size)
+        # Called with (distinct texts, callers served) for every flushed batch
+        self.on_batch = on_batch
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.batched_texts = 0
+        self.requests = 0
+        self.largest_batch = 0
+
+    async def embed(self, texts: List[str]) -> List[Any]:
+        """Vectors for texts, in order; texts already waiting in the window share one slot"""
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self._pending.setdefault(text, []).append(future)
+            futures.append(future)
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            texts = list(self._pending)[:self.max_batch_size]
+            batch = [(text, self._pending.pop(text)) for text in texts]
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[Tuple[str, List[asyncio.Future]]]):
+        texts = [text for text, _ in batch]
+        callers = sum(len(futures) for _, futures in batch)
+        with self._lock:
+            self.batches += 1
+            self.batched_texts += len(texts)
+            self.largest_batch = max(self.largest_batch, len(texts))
+        if self.on_batch:
+            self.on_batch(len(texts), callers)
+
+        try:
+            vectors = await self.embed_fn(texts)
+            if len(vectors) != len(texts):
+                raise RuntimeError(f"Embedding batch returned {len(vectors)} vectors for {len(texts)} texts")
+        except BaseException as e:
+            # Cancellation too: every caller waiting on this batch must be released
+            cancelled = isinstance(e, asyncio.CancelledError)
+            if not cancelled:
+                log.warning(f"⚠️ Embedding batch of {len(texts)} texts failed: {e}")
+            for _, futures in batch:
+                for future in futures:
+                    if not future.done():
+                        if cancelled:
+                            future.cancel()
+                        else:
+                            future.set_exception(e)
+            if isinstance(e, Exception):
+                return
+            raise
+
+        for (_, futures), vector in zip(batch, vectors):
+            for future in futures:
+                if not future.done():
+                    future.set_result(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "window_ms": round(self.window_seconds * 1000, 3),
+                "max_batch_size": self.max_batch_size,
+                "waiting_texts": len(self._pending),
+                "batches": self.batches,
+                "requests": self.requests,
+                "batched_texts": self.batched_texts,
+                "mean_batch_size": round(self.batched_texts / self.batches, 2) if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+            }
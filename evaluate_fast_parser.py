@@ -0,0 +1,196 @@
+"""
+PSX Financial Client - Rule-Based Parser Evaluation
+Runs fast_parser.py over the labelled queries in fast_parser_queries.json and
+reports how many it plans itself, whether those plans match the labels (plans
+Claude is prompted to produce; null = should be left to Claude) and what the
+rules cost in latency. With --claude it also parses every query with Claude
+(needs ANTHROPIC_API_KEY and the client's other settings) and compares the
+finalized plans and the latency saved - run it before turning on the client's
+FAST_PARSER_ENABLED (off by default).
+
+It first checks the period sets in prompts.py against the filing_period values
+in the index metadata (--index-dir) and exits non-zero when the index holds
+filings newer than the latest period the parsers know about.
+
+Usage:
+    python evaluate_fast_parser.py [--data fast_parser_queries.json] [--min-confidence 0.85] [--verbose]
+    python evaluate_fast_parser.py --index-dir gemini_index_metadata
+    python evaluate_fast_parser.py --claude
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fast_parser import parse_query_rules
+from prompts import ANNUAL_PERIOD_SETS, LATEST_ANNUAL_YEAR, LATEST_QUARTER, QUARTERLY_PERIOD_SETS, parse_quarter
+
+BASE_DIR = Path(__file__).parent.resolve()
+# Filters that decide which chunks a query spec retrieves; search_query wording is not compared
+SIGNATURE_FIELDS = ("ticker", "statement_type", "filing_type", "financial_statement_scope", "is_note", "note_link")
+
+
+def plan_signature(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Companies, intent and the periods requested per filter combination, ignoring spec order and merging"""
+    periods: Dict[str, set] = {}
+    for query_spec in plan["queries"]:
+        filters = query_spec.get("metadata_filters", query_spec)
+        key = {field: filters.get(field) for field in SIGNATURE_FIELDS}
+        key["is_note"] = key["is_note"] or "no"
+        period = filters.get("filing_period")
+        periods.setdefault(json.dumps(key, sort_keys=True), set()).update(
+            period if isinstance(period, list) else [period] if period else []
+        )
+    return {
+        "companies": sorted(plan["companies"]),
+        "intent": plan["intent"],
+        "queries": {key: sorted(values) for key, values in sorted(periods.items())},
+    }
+
+
+def index_filing_periods(index_dir: Path) -> Optional[set]:
+    """Distinct filing_period values in the index metadata (the server's mmap store, else the docstore)"""
+    store_metadata = index_dir / "mmap_store" / "metadata.json"
+    if store_metadata.exists():
+        rows = json.loads(store_metadata.read_text())
+    elif (index_dir / "docstore.json").exists():
+        docstore = json.loads((index_dir / "docstore.json").read_text())
+        rows = [entry.get("__data__", {}).get("metadata", {}) for entry in docstore.get("docstore/data", {}).values()]
+    else:
+        return None
+    return {str(row["filing_period"]).strip() for row in rows if row.get("filing_period")}
+
+
+def check_period_sets(index_dir: Path) -> bool:
+    """Compare prompts.py's period sets with the index; False when the index has newer filings"""
+    periods = index_filing_periods(index_dir)
+    if periods is None:
+        print(f"\nPeriod check skipped: no index metadata in {index_dir}")
+        return True
+
+    years = [int(p) for p in periods if re.fullmatch(r"\d{4}", p)]
+    quarters = [parse_quarter(p) for p in periods if re.fullmatch(r"Q[1-4]-\d{4}", p, re.IGNORECASE)]
+    latest_quarter = max(quarters, key=lambda quarter_year: (quarter_year[1], quarter_year[0]), default=None)
+    listed = {period for period_set in ANNUAL_PERIOD_SETS + QUARTERLY_PERIOD_SETS for period in period_set}
+
+    print(f"\nPeriod sets vs index ({len(periods)} distinct filing periods in {index_dir})")
+    print(f"latest annual:  parsers {LATEST_ANNUAL_YEAR} | index {max(years, default='-')}")
+    print(f"latest quarter: parsers Q{LATEST_QUARTER[0]}-{LATEST_QUARTER[1]} | index "
+          f"{f'Q{latest_quarter[0]}-{latest_quarter[1]}' if latest_quarter else '-'}")
+    unlisted = sorted(periods - listed)
+    if unlisted:
+        print(f"not in any period set: {', '.join(unlisted)}")
+
+    stale = (years and max(years) > LATEST_ANNUAL_YEAR) or \
+        (latest_quarter and (latest_quarter[1], latest_quarter[0]) > (LATEST_QUARTER[1], LATEST_QUARTER[0]))
+    if stale:
+        print("STALE: the index has newer filings - add their period sets to prompts.py")
+    return not stale
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def time_rules(query: str, tickers: List[Dict[str, str]], repeats: int) -> float:
+    """Median ms of one rule-based parse"""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        parse_query_rules(query, tickers)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def evaluate(data_path: Path, min_confidence: float, repeats: int, verbose: bool) -> List[Dict[str, Any]]:
+    labelled = json.loads(data_path.read_text())
+    tickers = [t for t in json.loads((BASE_DIR / "tickers.json").read_text()) if "bank" in t["Company Name"].lower()]
+
+    rows = []
+    print(f"\nRule-based parser on {len(labelled)} labelled queries (min confidence {min_confidence})")
+    print(f"{'query':<60} | {'label':>6} | {'fast path':>9} | {'agrees':>6} | {'ms':>6}")
+    for item in labelled:
+        parsed = parse_query_rules(item["query"], tickers)
+        accepted = bool(parsed["queries"]) and parsed["confidence"] >= min_confidence
+        expected = item["expected"]
+        agrees = accepted and expected is not None and plan_signature(parsed) == plan_signature(expected)
+        row = {"query": item["query"], "parsed": parsed, "accepted": accepted, "expected": expected,
+               "agrees": agrees, "rules_ms": time_rules(item["query"], tickers, repeats)}
+        rows.append(row)
+        agrees_cell = "-" if not accepted or expected is None else "yes" if agrees else "NO"
+        print(f"{item['query'][:60]:<60} | {'plan' if expected else 'claude':>6} | "
+              f"{'yes' if accepted else 'no':>9} | {agrees_cell:>6} | {row['rules_ms']:>6.3f}")
+        if verbose and (accepted or expected) and not agrees:
+            print(f"    expected: {json.dumps(plan_signature(expected)) if expected else 'Claude'}")
+            print(f"    parsed:   {json.dumps(plan_signature(parsed))} (confidence {parsed['confidence']}, {parsed['reasons']})")
+
+    plannable = [row for row in rows if row["expected"] is not None]
+    claude_only = [row for row in rows if row["expected"] is None]
+    accepted = [row for row in rows if row["accepted"]]
+    rules_ms = [row["rules_ms"] for row in rows]
+    print(f"\ncoverage:      {sum(r['accepted'] for r in plannable)}/{len(plannable)} plannable queries taken by the fast path")
+    print(f"agreement:     {sum(r['agrees'] for r in accepted)}/{len(accepted)} fast-path plans match their labels")
+    print(f"false accepts: {sum(r['accepted'] for r in claude_only)}/{len(claude_only)} Claude-only queries taken by the fast path")
+    print(f"rule parse:    p50 {percentile(rules_ms, 0.5):.3f} ms | p95 {percentile(rules_ms, 0.95):.3f} ms")
+    return rows
+
+
+async def compare_with_claude(rows: List[Dict[str, Any]]):
+    """Parse every query with Claude and compare finalized plans for the queries the fast path takes"""
+    import Step8MCPClientPsxGPT as client
+
+    print(f"\nClaude comparison ({len(rows)} queries, parsed one at a time)")
+    print(f"{'query':<60} | {'fast path':>9} | {'agrees':>6} | {'claude ms':>9}")
+    claude_ms, agreements = [], []
+    for row in rows:
+        started = time.perf_counter()
+        claude_plan = await client.parse_query_with_claude(row["query"])
+        row["claude_ms"] = (time.perf_counter() - started) * 1000
+        claude_ms.append(row["claude_ms"])
+        agrees: Optional[bool] = None
+        if row["accepted"]:
+            parsed = {k: v for k, v in row["parsed"].items() if k != "reasons"}
+            fast_plan = client.finalize_query_plan(client.QueryPlan.model_validate(json.loads(json.dumps(parsed))), row["query"])
+            agrees = plan_signature(fast_plan.model_dump()) == plan_signature(claude_plan.model_dump())
+            agreements.append(agrees)
+        print(f"{row['query'][:60]:<60} | {'yes' if row['accepted'] else 'no':>9} | "
+              f"{'-' if agrees is None else 'yes' if agrees else 'NO':>6} | {row['claude_ms']:>9.0f}")
+
+    accepted = [row for row in rows if row["accepted"]]
+    saved = sum(row["claude_ms"] - row["rules_ms"] for row in accepted)
+    print(f"\nClaude parse:  p50 {percentile(claude_ms, 0.5):.0f} ms | p95 {percentile(claude_ms, 0.95):.0f} ms")
+    print(f"agreement:     {sum(agreements)}/{len(agreements)} fast-path plans match Claude's after finalizing")
+    if accepted:
+        print(f"latency saved: {saved / len(accepted):.0f} ms per fast-path query, "
+              f"{saved / len(rows):.0f} ms per query across the set ({len(accepted)}/{len(rows)} skip Claude)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the rule-based query parser")
+    parser.add_argument("--data", default=str(BASE_DIR / "fast_parser_queries.json"))
+    parser.add_argument("--index-dir", default=str(BASE_DIR / "gemini_index_metadata"),
+                        help="Index whose filing periods the period sets are checked against")
+    parser.add_argument("--min-confidence", type=float, default=0.85,
+                        help="Should match the client's FAST_PARSER_MIN_CONFIDENCE")
+    parser.add_argument("--repeats", type=int, default=50, help="Rule-based parses timed per query")
+    parser.add_argument("--claude", action="store_true", help="Also parse every query with Claude (live API calls)")
+    parser.add_argument("--verbose", action="store_true", help="Show signatures for disagreements")
+
+    args = parser.parse_args()
+    periods_current = check_period_sets(Path(args.index_dir))
+    rows = evaluate(Path(args.data), args.min_confidence, args.repeats, args.verbose)
+    if args.claude:
+        asyncio.run(compare_with_claude(rows))
+    if not periods_current:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+PSX Financial Client - Rule-Based Query Parser
+Deterministic fast path for simple requests such as "HBL 2024 annual balance
+sheet": recognizes tickers, periods (2024, Q1-2024, last N quarters/years),
+statement types, consolidation scope and notes keywords, and emits the same
+plan Claude's create_query_plan tool returns (before the client's validation
+and augmentation, which both parsers share).
+
+Every word the rules can't account for lowers the confidence, and anything
+outside their reach (analysis keywords, follow-up pronouns, metric queries
+without a statement type, unsupported periods) drops it to zero, so those
+queries still go to Claude.
+
+Period sets and the latest filings come from prompts.py, which also lists them
+for Claude in PARSING_SYSTEM_PROMPT.
+"""
+
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from prompts import ANNUAL_PERIOD_SETS, LATEST_ANNUAL_YEAR, LATEST_QUARTER, QUARTERLY_PERIOD_SETS
+
+log = logging.getLogger("psx-client-enhanced")
+
+# Longest phrases first so "statement of comprehensive income" isn't read as an income statement
+STATEMENT_PHRASES = [
+    ("statement of changes in equity", "changes_in_equity"),
+    ("statement of comprehensive income", "comprehensive_income"),
+    ("statement of financial position", "balance_sheet"),
+    ("changes in equity", "changes_in_equity"),
+    ("comprehensive income", "comprehensive_income"),
+    ("financial position", "balance_sheet"),
+    ("profit and loss", "profit_and_loss"),
+    ("profit & loss", "profit_and_loss"),
+    ("income statement", "profit_and_loss"),
+    ("balance sheet", "balance_sheet"),
+    ("cash flows", "cash_flow"),
+    ("cash flow", "cash_flow"),
+    ("cashflow", "cash_flow"),
+    ("p & l", "profit_and_loss"),
+    ("p&l", "profit_and_loss"),
+    ("pnl", "profit_and_loss"),
+]
+SCOPE_WORDS = [
+    ("unconsolidated", "unconsolidated"), ("standalone", "unconsolidated"), ("stand-alone", "unconsolidated"),
+    ("consolidated", "consolidated"),
+]
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+ORDINAL_QUARTERS = {"first": 1, "second": 2, "third": 3, "fourth": 4, "1st": 1, "2nd": 2, "3rd": 3, "4th": 4}
+
+# Words that change what the user wants beyond a plain statement lookup
+ANALYSIS_WORDS = {
+    "ratio", "ratios", "performance", "health", "kpi", "kpis", "metric", "metrics", "analysis", "analyze",
+    "analyse", "compare", "comparison", "versus", "vs", "research", "comprehensive", "trend", "trends",
+    "growth", "why", "how", "explain", "summary", "summarize", "summarise",
+}
+FOLLOW_UP_WORDS = {"their", "them", "they", "it", "same", "also", "those", "these", "that", "this", "previous"}
+FILLER_WORDS = {
+    "show", "me", "give", "get", "display", "fetch", "pull", "provide", "see", "want", "need", "i", "please",
+    "the", "a", "an", "of", "for", "and", "with", "in", "to", "from", "on", "all", "its", "what", "is", "was",
+    "annual", "yearly", "year", "years", "quarterly", "quarter", "quarters", "statement", "statements",
+    "financial", "financials", "report", "reports", "bank", "limited", "ltd", "data", "fy", "period",
+    "note", "notes", "breakdown", "along", "including", "include",
+}
+UNKNOWN_WORD_PENALTY = 0.1
+
+QUARTER_PATTERN = re.compile(r"(?<![\w-])(?:q([1-4])|([1-4])q)[\s\-/']*(?:fy)?(20\d{2})(?![\w-])")
+ORDINAL_QUARTER_PATTERN = re.compile(r"\b(first|second|third|fourth|1st|2nd|3rd|4th) quarter (?:of )?(20\d{2})\b")
+RELATIVE_PATTERN = re.compile(r"\b(?:last|past|previous|recent|latest) (\d+|" + "|".join(NUMBER_WORDS) + r") (quarters|years)\b")
+YEAR_RANGE_PATTERN = re.compile(r"(?<![\w-])(20\d{2})\s*(?:-|–|to|through|till|until)\s*(20\d{2})(?![\w-])")
+YEAR_PATTERN = re.compile(r"(?<![\w-])(?:fy)?(20\d{2})(?![\w-])")
+NOTES_PATTERN = re.compile(r"\bnotes?\b")
+WORD_PATTERN = re.compile(r"[a-z0-9&][a-z0-9&'\-]*")
+
+
+def period_set_for(label: str, period_sets: List[List[str]]) -> Optional[List[str]]:
+    """The period set reporting a period, preferring the one where it is the current period"""
+    containing = [period_set for period_set in period_sets if label in period_set]
+    primary = [period_set for period_set in containing if period_set[0] == label]
+    return (primary or containing or [None])[0]
+
+
+def annual_period_set(year: int) -> Optional[List[str]]:
+    """The set covering a year ("2023" is the comparative in ["2024", "2023"])"""
+    return period_set_for(str(year), ANNUAL_PERIOD_SETS)
+
+
+def quarterly_period_set(quarter: int, year: int) -> Optional[List[str]]:
+    return period_set_for(f"Q{quarter}-{year}", QUARTERLY_PERIOD_SETS)
+
+
+def last_quarters(count: int) -> List[Tuple[int, int]]:
+    """The most recent count Q1-Q3 quarters, newest first"""
+    quarter, year = LATEST_QUARTER
+    quarters = []
+    while len(quarters) < count:
+        if quarter != 4:
+            quarters.append((quarter, year))
+        quarter, year = (quarter - 1, year) if quarter > 1 else (4, year - 1)
+    return quarters
+
+
+def parse_count(token: str) -> int:
+    return int(token) if token.isdigit() else NUMBER_WORDS[token]
+
+
+def parse_query_rules(user_query: str, tickers: List[Dict[str, str]]) -> Dict[str, Any]:
+    """A create_query_plan-shaped plan dict with a confidence, plus "reasons" for any deductions.
+
+    ``tickers`` are tickers.json entries ({"Symbol", "Company Name"}) the query may name.
+    A confidence of 0.0 (with no queries) means the rules can't handle the query.
+    """
+    text = " ".join(user_query.lower().split())
+    reasons: List[str] = []
+
+    def declined(reason: str) -> Dict[str, Any]:
+        return {"companies": [], "intent": "analysis", "queries": [], "confidence": 0.0,
+                "needs_clarification": False, "reasons": reasons + [reason]}
+
+    def consume(pattern: str) -> None:
+        nonlocal text
+        text = re.sub(pattern, " ", text)
+
+    # Companies, by full name (without "Limited") first, then by symbol
+    found: List[Tuple[int, str]] = []
+    names = sorted(
+        ((re.sub(r"^the\s+|\s+(limited|ltd)\.?$", "", t["Company Name"].lower()).strip(), t["Symbol"]) for t in tickers),
+        key=lambda pair: len(pair[0]), reverse=True
+    )
+    for name, symbol in names:
+        for match in re.finditer(rf"(?<![\w-]){re.escape(name)}(?![\w-])", text):
+            found.append((match.start(), symbol))
+        consume(rf"(?<![\w-]){re.escape(name)}(?![\w-])")
+    for ticker in tickers:
+        pattern = rf"(?<![\w-]){re.escape(ticker['Symbol'].lower())}(?:'s)?(?![\w-])"
+        for match in re.finditer(pattern, text):
+            found.append((match.start(), ticker["Symbol"]))
+        consume(pattern)
+    companies = list(dict.fromkeys(symbol for _, symbol in sorted(found)))
+    if not companies:
+        return declined("no ticker recognized")
+
+    # Periods: quarters, relative ranges, year ranges, then single years, each as
+    # (filing_type, period set, period the user asked for)
+    period_sets: List[Tuple[str, Optional[List[str]], str]] = []
+    relative = False
+    for match in QUARTER_PATTERN.finditer(text):
+        quarter, year = int(match.group(1) or match.group(2)), int(match.group(3))
+        period_sets.append(("quarterly", quarterly_period_set(quarter, year), f"Q{quarter}-{year}"))
+    for match in ORDINAL_QUARTER_PATTERN.finditer(text):
+        quarter, year = ORDINAL_QUARTERS[match.group(1)], int(match.group(2))
+        period_sets.append(("quarterly", quarterly_period_set(quarter, year), f"Q{quarter}-{year}"))
+    consume(QUARTER_PATTERN.pattern)
+    consume(ORDINAL_QUARTER_PATTERN.pattern)
+    for match in RELATIVE_PATTERN.finditer(text):
+        relative = True
+        count = parse_count(match.group(1))
+        if match.group(2) == "quarters":
+            # As in the prompt's examples: the N latest Q1-Q3 quarters, one period set each
+            # (Q4 comes from the annual filings the client adds to every quarterly plan)
+            for quarter, year in last_quarters(count):
+                period_set = quarterly_period_set(quarter, year)
+                period_sets.append(("quarterly", period_set if period_set and period_set[0] == f"Q{quarter}-{year}"
+                                    else None, f"Q{quarter}-{year}"))
+        else:
+            for year in range(LATEST_ANNUAL_YEAR, LATEST_ANNUAL_YEAR - count, -1):
+                period_sets.append(("annual", annual_period_set(year), str(year)))
+    consume(RELATIVE_PATTERN.pattern)
+    for match in YEAR_RANGE_PATTERN.finditer(text):
+        first, last = sorted((int(match.group(1)), int(match.group(2))))
+        relative = True
+        for year in range(last, first - 1, -1):
+            period_sets.append(("annual", annual_period_set(year), str(year)))
+    consume(YEAR_RANGE_PATTERN.pattern)
+    for match in YEAR_PATTERN.finditer(text):
+        period_sets.append(("annual", annual_period_set(int(match.group(1))), match.group(1)))
+    consume(YEAR_PATTERN.pattern)
+
+    if not period_sets:
+        return declined("no period recognized")
+    if any(period_set is None for _, period_set, _ in period_sets):
+        return declined("period outside the available period sets")
+    # "2024" and "2023" share a period set; the first period named labels it
+    unique_sets: Dict[Tuple[str, ...], Tuple[str, List[str], str]] = {}
+    for kind, period_set, label in period_sets:
+        unique_sets.setdefault(tuple(period_set), (kind, period_set, label))
+    period_sets = list(unique_sets.values())
+    kinds = {kind for kind, _, _ in period_sets}
+    if kinds == {"quarterly"} and re.search(r"\b(annual|yearly)\b", text):
+        return declined("annual filing asked for with only quarterly periods")
+    if kinds == {"annual"} and re.search(r"\bquarter(ly|s)?\b", text) and not relative:
+        return declined("quarterly filing asked for with only annual periods")
+
+    # Statement types, in the order they are mentioned
+    statements: List[Tuple[int, str]] = []
+    for phrase, statement_type in STATEMENT_PHRASES:
+        pattern = rf"(?<![\w-]){re.escape(phrase)}(?![\w-])"
+        statements.extend((match.start(), statement_type) for match in re.finditer(pattern, text))
+        consume(pattern)
+    statement_types = list(dict.fromkeys(statement_type for _, statement_type in sorted(statements)))
+    if not statement_types:
+        return declined("no statement type (metric or analysis query)")
+
+    scopes = []
+    for word, scope in SCOPE_WORDS:
+        if re.search(rf"(?<![\w-]){re.escape(word)}(?![\w-])", text):
+            scopes.append(scope)
+            consume(rf"(?<![\w-]){re.escape(word)}(?![\w-])")
+    scopes = list(dict.fromkeys(scopes))
+    if len(scopes) > 1:
+        return declined("both consolidated and unconsolidated asked for")
+
+    if NOTES_PATTERN.search(text) and any(t in ("changes_in_equity", "comprehensive_income") for t in statement_types):
+        return declined("notes for a statement type the notes expansion doesn't cover")
+
+    words = WORD_PATTERN.findall(text)
+    if ANALYSIS_WORDS.intersection(words):
+        return declined(f"analysis request ({', '.join(sorted(ANALYSIS_WORDS.intersection(words)))})")
+    if FOLLOW_UP_WORDS.intersection(words):
+        return declined("follow-up reference needing conversation context")
+
+    confidence = 1.0
+    unknown = [word for word in words if word not in FILLER_WORDS and not word.isdigit()]
+    if unknown:
+        confidence -= UNKNOWN_WORD_PENALTY * len(unknown)
+        reasons.append(f"unrecognized words: {', '.join(unknown)}")
+
+    queries = []
+    for company in companies:
+        for statement_type in statement_types:
+            for filing_type, period_set, label in period_sets:
+                metadata_filters = {
+                    "ticker": company,
+                    "statement_type": statement_type,
+                    "is_statement": "yes",
+                    "is_note": "no",
+                    "filing_type": filing_type,
+                    "filing_period": list(period_set),
+                }
+                if scopes:
+                    metadata_filters["financial_statement_scope"] = scopes[0]
+                queries.append({
+                    "search_query": f"{company} {statement_type.replace('_', ' ')} {label.replace('-', ' ')}",
+                    "metadata_filters": metadata_filters,
+                })
+
+    # One company and one statement is a statement request, unless several explicit periods were named
+    single = len(companies) == 1 and len(statement_types) == 1 and (relative or len(period_sets) == 1)
+    return {
+        "companies": companies,
+        "intent": "statement" if single else "analysis",
+        "queries": queries,
+        "confidence": round(max(confidence, 0.0), 2),
+        "needs_clarification": False,
+        "reasons": reasons,
+    }
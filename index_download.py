@@ -0,0 +1,247 @@
+"""
+PSX Financial Server - Index Download Pipeline
+Fetches the index release tarball without blocking the event loop:
+
+    1. stream to ``<work_dir>/index.tar.gz.part``, resuming with an HTTP Range request
+       when a previous attempt left a partial file for the same URL
+    2. verify the SHA-256 against the expected checksum (if one is configured)
+    3. extract in a worker thread into a staging directory and check the result
+       looks like an index
+    4. swap the staged directory into place, so a failed run never leaves a
+       half-extracted index behind
+
+All blocking work runs in ``asyncio.to_thread``; progress is published on a
+``DownloadProgress`` object for the health tool.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+import shutil
+import tarfile
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import requests
+
+log = logging.getLogger("psx-server-enhanced")
+
+INDEX_MARKER_FILES = ("default__vector_store.json", "mmap_store/manifest.json")
+
+
+class DownloadProgress:
+    """Mutable download status shared with the health check"""
+
+    def __init__(self):
+        self.phase = "idle"
+        self.bytes_downloaded = 0
+        self.total_bytes: Optional[int] = None
+        self.resumed_from = 0
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.error: Optional[str] = None
+
+    def set_phase(self, phase: str):
+        self.phase = phase
+        log.info(f"📥 Index download: {phase}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        percent = None
+        if self.total_bytes:
+            percent = round(100 * self.bytes_downloaded / self.total_bytes, 1)
+        return {
+            "phase": self.phase,
+            "bytes_downloaded": self.bytes_downloaded,
+            "total_bytes": self.total_bytes,
+            "percent": percent,
+            "resumed_from": self.resumed_from,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+# ─────────────────────────── Pipeline Steps ─────────────────────────────
+def fetch_expected_checksum(checksum_url: str, timeout: float = 30.0) -> str:
+    """Read a sha256sum-style checksum file ("<hex>  <filename>")"""
+    response = requests.get(checksum_url, timeout=timeout)
+    response.raise_for_status()
+    return response.text.split()[0].strip().lower()
+
+
+def state_path_for(part_path: Path) -> Path:
+    return part_path.with_name(part_path.name + ".json")
+
+
+def discard_partial(part_path: Path):
+    """Remove a partial download and its resume state so the next run starts from zero"""
+    part_path.unlink(missing_ok=True)
+    state_path_for(part_path).unlink(missing_ok=True)
+
+
+def mark_complete(part_path: Path, progress: DownloadProgress, size: int) -> Path:
+    log.info(f"✅ Index download already complete ({size} bytes) - skipping to verification")
+    progress.total_bytes = progress.bytes_downloaded = progress.resumed_from = size
+    return part_path
+
+
+def download_with_resume(url: str, part_path: Path, progress: DownloadProgress,
+                         chunk_size: int = 256 * 1024, timeout: float = 60.0) -> Path:
+    """Stream url to part_path, resuming a partial download of the same URL.
+
+    A partial file that is already complete (the process stopped before extraction)
+    is returned as is, whether the saved size says so or the server answers 416.
+    """
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    state_path = state_path_for(part_path)
+    state = json.loads(state_path.read_text()) if state_path.exists() else {}
+
+    # Only resume a partial file that came from the same URL
+    offset = part_path.stat().st_size if part_path.exists() and state.get("url") == url else 0
+    if offset and state.get("total_bytes") and offset >= state["total_bytes"]:
+        return mark_complete(part_path, progress, offset)
+    headers = {}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        if state.get("etag"):
+            headers["If-Range"] = state["etag"]
+
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if offset and response.status_code == 416:
+            # Range starts at or past the end: complete, unless the server's size disagrees
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if not total.isdigit() or int(total) == offset:
+                return mark_complete(part_path, progress, offset)
+            log.warning(f"⚠️ Partial index download ({offset} bytes) is larger than the release ({total}) - restarting")
+            discard_partial(part_path)
+            return download_with_resume(url, part_path, progress, chunk_size, timeout)
+        response.raise_for_status()
+        if offset and response.status_code == 206:
+            mode = "ab"
+            log.info(f"↪️ Resuming index download at {offset} bytes")
+        else:
+            # Server ignored the range (or the file changed) - start over
+            mode, offset = "wb", 0
+
+        content_length = response.headers.get("Content-Length")
+        progress.total_bytes = offset + int(content_length) if content_length else None
+        progress.resumed_from = offset
+        progress.bytes_downloaded = offset
+        state_path.write_text(json.dumps({
+            "url": url, "etag": response.headers.get("ETag"), "total_bytes": progress.total_bytes
+        }))
+
+        with open(part_path, mode) as part_file:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    part_file.write(chunk)
+                    progress.bytes_downloaded += len(chunk)
+
+    if progress.total_bytes is not None and progress.bytes_downloaded != progress.total_bytes:
+        raise IOError(f"Incomplete download: {progress.bytes_downloaded}/{progress.total_bytes} bytes")
+    return part_path
+
+
+def sha256_file(path: Path, chunk_size: int = 4 * 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_index_root(directory: Path, index_name: str) -> Path:
+    """Locate the extracted index inside a staging directory (top level or one directory down)"""
+    subdirs = sorted(p for p in directory.iterdir() if p.is_dir()) if directory.exists() else []
+    for candidate in [directory / index_name, directory, *subdirs]:
+        if any((candidate / marker).exists() for marker in INDEX_MARKER_FILES):
+            return candidate
+    raise FileNotFoundError(f"Archive does not contain an index ({' or '.join(INDEX_MARKER_FILES)} missing)")
+
+
+def extract_archive(archive_path: Path, staging_dir: Path):
+    """Extract the tarball into a fresh staging directory, refusing unsafe member paths"""
+    if staging_dir.exists():
+        shutil.rmtree(staging_dir)
+    staging_dir.mkdir(parents=True)
+    with tarfile.open(archive_path, mode="r:*") as tar:
+        if hasattr(tarfile, "data_filter"):
+            tar.extractall(staging_dir, filter="data")
+        else:
+            for member in tar.getmembers():
+                member_path = (staging_dir / member.name).resolve()
+                if not str(member_path).startswith(str(staging_dir.resolve())):
+                    raise ValueError(f"Unsafe path in archive: {member.name}")
+            tar.extractall(staging_dir)
+
+
+def swap_into_place(new_dir: Path, target_dir: Path):
+    """Replace target_dir with new_dir via renames (the old copy is removed afterwards)"""
+    backup_dir = target_dir.with_name(target_dir.name + ".old")
+    if backup_dir.exists():
+        shutil.rmtree(backup_dir)
+    if target_dir.exists():
+        target_dir.rename(backup_dir)
+    try:
+        new_dir.rename(target_dir)
+    except Exception:
+        if backup_dir.exists() and not target_dir.exists():
+            backup_dir.rename(target_dir)
+        raise
+    shutil.rmtree(backup_dir, ignore_errors=True)
+
+
+# ─────────────────────────── Orchestration ──────────────────────────────
+async def download_index(url: str, target_dir: Path, work_dir: Path,
+                         expected_sha256: Optional[str] = None,
+                         checksum_url: Optional[str] = None,
+                         progress: Optional[DownloadProgress] = None) -> Path:
+    """Download, verify, extract and atomically install an index release"""
+    progress = progress or DownloadProgress()
+    target_dir, work_dir = Path(target_dir), Path(work_dir)
+    part_path = work_dir / "index.tar.gz.part"
+    staging_dir = work_dir / "staging"
+
+    progress.started_at = datetime.datetime.now().isoformat()
+    progress.finished_at = None
+    progress.error = None
+    try:
+        progress.set_phase("downloading")
+        await asyncio.to_thread(download_with_resume, url, part_path, progress)
+
+        if not expected_sha256 and checksum_url:
+            expected_sha256 = await asyncio.to_thread(fetch_expected_checksum, checksum_url)
+        if expected_sha256:
+            progress.set_phase("verifying")
+            actual_sha256 = await asyncio.to_thread(sha256_file, part_path)
+            if actual_sha256 != expected_sha256.lower():
+                # A corrupt file must not be resumed from next time
+                discard_partial(part_path)
+                raise ValueError(f"Checksum mismatch: expected {expected_sha256}, got {actual_sha256}")
+        else:
+            log.warning("⚠️ No index checksum configured - skipping verification")
+
+        progress.set_phase("extracting")
+        try:
+            await asyncio.to_thread(extract_archive, part_path, staging_dir)
+            index_root = find_index_root(staging_dir, target_dir.name)
+        except Exception:
+            # Without a checksum this is the only check; don't keep re-extracting a bad archive
+            discard_partial(part_path)
+            raise
+
+        progress.set_phase("installing")
+        await asyncio.to_thread(swap_into_place, index_root, target_dir)
+
+        await asyncio.to_thread(shutil.rmtree, work_dir, True)
+        progress.finished_at = datetime.datetime.now().isoformat()
+        progress.set_phase("complete")
+        return target_dir
+
+    except Exception as e:
+        progress.error = str(e)
+        progress.finished_at = datetime.datetime.now().isoformat()
+        progress.set_phase("failed")
+        raise
@@ -0,0 +1,180 @@
+"""
+PSX Financial Server - Lexical (BM25) Index
+Sparse retrieval over the same nodes as the vector store, for the exact tokens
+dense embeddings handle poorly: line-item names ("advances - net of provision"),
+note numbers, tickers and periods like "Q1-2024".
+
+Postings are kept as CSR arrays, one slice per term:
+
+    bm25_vocab.json      sorted terms (term i owns postings offsets[i]:offsets[i + 1])
+    bm25_offsets.npy     (terms + 1) int64 offsets into the posting arrays
+    bm25_rows.npy        int32 row ids, sorted within each term
+    bm25_weights.npy     float32 precomputed BM25 term weights (idf * saturated tf)
+    bm25_manifest.json   k1, b and the store it was built for
+
+For mmap stores the arrays are saved next to the store and memory-mapped, so
+worker processes share them through the page cache like the embeddings.
+"""
+
+import json
+import logging
+import math
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from vector_store import top_k_indices
+
+log = logging.getLogger("psx-server-enhanced")
+
+# Keep hyphen/slash/dot compounds ("q1-2024", "net-of", "12.5") as one token, plus their parts
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-/.][a-z0-9]+)*")
+COMPOUND_SEPARATORS = re.compile(r"[-/.]")
+THOUSANDS_SEPARATOR = re.compile(r"(?<=\d),(?=\d{3}\b)")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were with".split()
+)
+
+RRF_K = 60
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms; compounds are emitted whole and split so "Q1 2024" still matches "Q1-2024" """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(THOUSANDS_SEPARATOR.sub("", (text or "").lower())):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = COMPOUND_SEPARATORS.split(token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part and part not in STOPWORDS)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = RRF_K) -> List[Tuple[Hashable, float]]:
+    """Fuse ranked lists: each item scores sum(1 / (k + rank)) over the lists it appears in"""
+    fused: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda pair: pair[1], reverse=True)
+
+
+class BM25Index:
+    """Okapi BM25 over row-aligned texts, restricted to metadata candidate rows at query time"""
+
+    FILES = ("bm25_vocab.json", "bm25_offsets.npy", "bm25_rows.npy", "bm25_weights.npy", "bm25_manifest.json")
+
+    def __init__(self, vocab: List[str], offsets: np.ndarray, rows: np.ndarray, weights: np.ndarray,
+                 count: int, k1: float = 1.2, b: float = 0.75):
+        self.vocab = vocab
+        self.term_ids = {term: i for i, term in enumerate(vocab)}
+        self.offsets = offsets
+        self.rows = rows
+        self.weights = weights
+        self.count = count
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, texts: Iterable[str], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        started = time.perf_counter()
+        term_rows: Dict[str, List[int]] = {}
+        term_freqs: Dict[str, List[int]] = {}
+        lengths: List[int] = []
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_rows.setdefault(term, []).append(row)
+                term_freqs.setdefault(term, []).append(tf)
+
+        count = len(lengths)
+        doc_lengths = np.asarray(lengths, dtype=np.float32)
+        length_norm = k1 * (1 - b + b * doc_lengths / max(float(doc_lengths.mean()) if count else 1.0, 1.0))
+
+        vocab = sorted(term_rows)
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum([len(term_rows[term]) for term in vocab], out=offsets[1:])
+        rows = np.empty(int(offsets[-1]), dtype=np.int32)
+        weights = np.empty(int(offsets[-1]), dtype=np.float32)
+        for i, term in enumerate(vocab):
+            term_row_ids = np.asarray(term_rows[term], dtype=np.int32)
+            tf = np.asarray(term_freqs[term], dtype=np.float32)
+            df = len(term_row_ids)
+            idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+            rows[offsets[i]:offsets[i + 1]] = term_row_ids
+            weights[offsets[i]:offsets[i + 1]] = idf * tf * (k1 + 1) / (tf + length_norm[term_row_ids])
+
+        log.info(f"✅ BM25 index built: {len(vocab)} terms, {len(rows)} postings over {count} rows "
+                 f"in {time.perf_counter() - started:.1f}s")
+        return cls(vocab, offsets, rows, weights, count, k1=k1, b=b)
+
+    def save(self, store_dir: Path, store_created_at: str):
+        store_dir = Path(store_dir)
+        (store_dir / "bm25_vocab.json").write_text(json.dumps(self.vocab))
+        np.save(store_dir / "bm25_offsets.npy", self.offsets)
+        np.save(store_dir / "bm25_rows.npy", self.rows)
+        np.save(store_dir / "bm25_weights.npy", self.weights)
+        (store_dir / "bm25_manifest.json").write_text(json.dumps({
+            "count": self.count,
+            "k1": self.k1,
+            "b": self.b,
+            "store_created_at": store_created_at,
+        }, indent=2))
+
+    @classmethod
+    def load(cls, store_dir: Path, store_created_at: str) -> Optional["BM25Index"]:
+        """Load a saved index, or None if missing or built for a different store"""
+        store_dir = Path(store_dir)
+        if not all((store_dir / name).exists() for name in cls.FILES):
+            return None
+        manifest = json.loads((store_dir / "bm25_manifest.json").read_text())
+        if manifest.get("store_created_at") != store_created_at:
+            return None
+        return cls(
+            json.loads((store_dir / "bm25_vocab.json").read_text()),
+            np.load(store_dir / "bm25_offsets.npy"),
+            np.load(store_dir / "bm25_rows.npy", mmap_mode="r"),
+            np.load(store_dir / "bm25_weights.npy", mmap_mode="r"),
+            manifest["count"], k1=manifest["k1"], b=manifest["b"]
+        )
+
+    def search(self, query: str, top_k: int, candidate_rows: Optional[np.ndarray] = None,
+               min_relative_score: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k rows by BM25 score (rows matching no query term are never returned).
+
+        ``min_relative_score`` drops rows scoring below that fraction of the best row -
+        rows that only match terms present in nearly every chunk, whose ranks are noise.
+        """
+        term_ids = [self.term_ids[term] for term in dict.fromkeys(tokenize(query)) if term in self.term_ids]
+        if not term_ids or top_k <= 0 or (candidate_rows is not None and len(candidate_rows) == 0):
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        # Rows are unique within a term's postings, so fancy-index accumulation is safe
+        scores = np.zeros(self.count, dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            scores[self.rows[start:end]] += self.weights[start:end]
+
+        rows = np.flatnonzero(scores) if candidate_rows is None else candidate_rows[scores[candidate_rows] > 0]
+        if len(rows) == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        row_scores = scores[rows]
+        if min_relative_score > 0:
+            keep = row_scores >= min_relative_score * row_scores.max()
+            rows, row_scores = rows[keep], row_scores[keep]
+        winners = top_k_indices(row_scores, top_k)
+        return rows[winners], row_scores[winners]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "terms": len(self.vocab),
+            "postings": int(len(self.rows)),
+            "rows": self.count,
+            "posting_bytes": int(self.rows.nbytes + self.weights.nbytes),
+        }
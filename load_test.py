@@ -0,0 +1,177 @@
+"""
+PSX Financial Server - SSE Load Test
+Measures psx_search_financial_data throughput through the SSE transport at
+several worker counts (MCP_WORKERS), each client holding its own MCP session.
+
+The result cache is disabled in the servers it starts so every call embeds
+(served from the shared query-embedding cache after warm-up), filters, scores and
+serializes.
+
+Usage:
+    python load_test.py [--workers 1 2 4] [--clients 16] [--requests 400]
+    python load_test.py --url http://localhost:8000/sse     # an already running server
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastmcp import Client
+
+SERVER_SCRIPT = Path(__file__).parent.resolve() / "Step7MCPServerPsxGPT.py"
+
+QUERIES = [
+    "balance sheet total assets",
+    "profit and loss net interest income",
+    "cash flow from operating activities",
+    "advances net of provisions",
+    "deposits and other accounts",
+    "earnings per share",
+    "capital adequacy ratio",
+    "non-performing loans",
+]
+TICKERS = ["HBL", "MCB", "UBL", "MEBL", "ABL", "BAFL", "NBP", "BAHL"]
+
+
+def make_requests(count: int, seed: int = 1) -> List[Dict[str, Any]]:
+    """Search specs that vary top_k and ticker so no two consecutive calls look alike"""
+    rng = random.Random(seed)
+    specs = []
+    for _ in range(count):
+        ticker = rng.choice(TICKERS)
+        specs.append({
+            "search_query": f"{ticker} {rng.choice(QUERIES)}",
+            "metadata_filters": {"ticker": ticker},
+            "top_k": rng.randint(10, 30),
+        })
+    return specs
+
+
+def start_server(workers: int, port: int, result_cache: bool, log_file=None) -> subprocess.Popen:
+    env = {**os.environ, "MCP_WORKERS": str(workers), "PORT": str(port), "HOST": "127.0.0.1"}
+    if not result_cache:
+        env["RESULT_CACHE_MAX_ENTRIES"] = "0"
+    output = log_file or subprocess.DEVNULL
+    return subprocess.Popen([sys.executable, str(SERVER_SCRIPT)], env=env, stdout=output, stderr=output)
+
+
+async def wait_until_ready(base_url: str, timeout: float = 600.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.monotonic() < deadline:
+            try:
+                health = (await http.get(f"{base_url}/health", timeout=5.0)).json()
+                if health.get("readiness") == "ready":
+                    return
+                if health.get("readiness") == "degraded":
+                    raise RuntimeError(f"Server degraded: {health}")
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(1.0)
+    raise TimeoutError(f"Server at {base_url} not ready after {timeout:.0f}s")
+
+
+async def run_client(sse_url: str, queue: "asyncio.Queue[Dict[str, Any]]", latencies: List[float], errors: List[str]):
+    async with Client(sse_url, timeout=120) as client:
+        while True:
+            try:
+                spec = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                result = (await client.call_tool("psx_search_financial_data", spec)).data
+                if isinstance(result, dict) and result.get("error_type"):
+                    errors.append(result["error_type"])
+                else:
+                    latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors.append(type(e).__name__)
+
+
+async def measure(sse_url: str, clients: int, requests: int) -> Dict[str, Any]:
+    # Warm-up: embed every distinct query once so the timed run measures serving, not Gemini
+    warmup = {spec["search_query"]: spec for spec in make_requests(requests)}
+    async with Client(sse_url, timeout=120) as client:
+        for spec in warmup.values():
+            await client.call_tool("psx_search_financial_data", spec)
+
+    queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+    for spec in make_requests(requests, seed=2):
+        queue.put_nowait(spec)
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(sse_url, queue, latencies, errors) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": 1000 * statistics.median(latencies) if latencies else None,
+        "p95_ms": 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+        "errors": len(errors),
+        "error_types": sorted(set(errors)),
+    }
+
+
+def print_row(label: str, stats: Dict[str, Any], baseline: Optional[float]):
+    speedup = f"{stats['throughput'] / baseline:>6.2f}x" if baseline else f"{'-':>7}"
+    p50 = f"{stats['p50_ms']:>7.1f} ms" if stats["p50_ms"] is not None else f"{'-':>10}"
+    p95 = f"{stats['p95_ms']:>7.1f} ms" if stats["p95_ms"] is not None else f"{'-':>10}"
+    errors = f"{stats['errors']} {','.join(stats['error_types'])}".strip()
+    print(f"{label:>8} | {stats['throughput']:>8.1f} | {speedup} | {p50} | {p95} | {errors}")
+
+
+async def main_async(args):
+    print(f"\nSSE load test: {args.clients} concurrent sessions, {args.requests} searches per run "
+          f"({os.cpu_count()} CPUs available)")
+    print(f"{'workers':>8} | {'req/s':>8} | {'speedup':>7} | {'p50':>10} | {'p95':>10} | errors")
+    print("-" * 70)
+
+    if args.url:
+        print_row("remote", await measure(args.url, args.clients, args.requests), None)
+        return
+
+    log_file = open(args.server_log, "a") if args.server_log else None
+    baseline = None
+    for workers, port in zip(args.workers, itertools.count(args.port, 100)):
+        process = start_server(workers, port, args.result_cache, log_file)
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            await wait_until_ready(base_url)
+            stats = await measure(f"{base_url}/sse", args.clients, args.requests)
+            baseline = baseline or stats["throughput"]
+            print_row(str(workers), stats, baseline)
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PSX SSE server load test")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--port", type=int, default=8100, help="First port used for the servers under test")
+    parser.add_argument("--result-cache", action="store_true", help="Keep the result cache enabled")
+    parser.add_argument("--server-log", default=None, help="Append server output to this file (discarded by default)")
+    parser.add_argument("--url", default=None, help="Load-test an already running server's /sse URL instead")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
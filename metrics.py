@@ -0,0 +1,223 @@
+"""
+PSX Financial Server - Metrics
+Minimal in-process counters, gauges and histograms rendered in the Prometheus
+text exposition format (no prometheus_client dependency) or as a JSON snapshot
+for the psx_metrics tool.
+"""
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Seconds; covers cache hits (sub-ms) through slow embedding calls and batch searches
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = list(key) + sorted((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Exposition-format number at full precision (integral values without a decimal point)"""
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {_format_labels(key) or "total": value for key, value in self._values.items()}
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels: Any):
+        self.inc(-amount, **labels)
+
+
+class CallbackGauge:
+    """Gauge whose values are read from a callback at scrape time ({labels dict: value} or a number)"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, callback: Callable[[], Any]):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+
+    def _read(self) -> Dict[LabelKey, float]:
+        try:
+            values = self.callback()
+        except Exception:
+            return {}
+        if values is None:
+            return {}
+        if isinstance(values, (int, float)):
+            return {(): float(values)}
+        return {_label_key(labels): float(value) for labels, value in values}
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        return [(self.name, key, value) for key, value in self._read().items()]
+
+    def snapshot(self) -> Dict[str, float]:
+        return {_format_labels(key) or "value": value for key, value in self._read().items()}
+
+
+class CallbackCounter(CallbackGauge):
+    """Counter whose cumulative values are kept elsewhere (e.g. a ModelGuard) and read at scrape time"""
+    kind = "counter"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelKey, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _quantile(self, bucket_counts: List[int], count: int, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (Prometheus-style estimate)"""
+        if not count:
+            return None
+        rank, cumulative = q * count, 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        samples = []
+        with self._lock:
+            for key, (bucket_counts, total, count) in self._series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    samples.append((f"{self.name}_bucket", key + (("le", le),), cumulative))
+                samples.append((f"{self.name}_sum", key, total))
+                samples.append((f"{self.name}_count", key, count))
+        return samples
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                _format_labels(key) or "all": {
+                    "count": count,
+                    "mean_ms": round(1000 * total / count, 3) if count else None,
+                    "p50_ms_le": self._ms(self._quantile(bucket_counts, count, 0.5)),
+                    "p95_ms_le": self._ms(self._quantile(bucket_counts, count, 0.95)),
+                    "p99_ms_le": self._ms(self._quantile(bucket_counts, count, 0.99)),
+                }
+                for key, (bucket_counts, total, count) in self._series.items()
+            }
+
+    @staticmethod
+    def _ms(seconds: Optional[float]) -> Optional[float]:
+        if seconds is None or seconds == float("inf"):
+            return seconds
+        return round(seconds * 1000, 3)
+
+
+class MetricsRegistry:
+    """Named metrics, rendered together for the /metrics route and the psx_metrics tool"""
+
+    def __init__(self, namespace: str = "psx"):
+        self.namespace = namespace
+        self._metrics: Dict[str, Any] = {}
+        self.started_at = time.time()
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(f"{self.namespace}_{name}", help_text))
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._register(Gauge(f"{self.namespace}_{name}", help_text))
+
+    def callback_gauge(self, name: str, help_text: str, callback: Callable[[], Any]) -> CallbackGauge:
+        return self._register(CallbackGauge(f"{self.namespace}_{name}", help_text, callback))
+
+    def callback_counter(self, name: str, help_text: str, callback: Callable[[], Any]) -> CallbackCounter:
+        return self._register(CallbackCounter(f"{self.namespace}_{name}", help_text, callback))
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.namespace}_{name}", help_text, buckets))
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, key, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            **{name[len(self.namespace) + 1:]: metric.snapshot() for name, metric in self._metrics.items()},
+        }
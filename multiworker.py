@@ -0,0 +1,275 @@
+"""
+PSX Financial Server - Multi-Process Serving
+Runs several Step7 worker processes behind one front proxy so JSON
+serialization and scoring can use more than one core.
+
+    clients ──SSE──▶ front proxy (:PORT) ──▶ worker 0 (127.0.0.1:PORT+1)
+                                          ├─▶ worker 1 (127.0.0.1:PORT+2)
+                                          └─▶ ...
+
+Workers share the read-only mmap store (embeddings.npy, texts.bin), so the
+embedding matrix and text blob live once in the OS page cache no matter how many
+workers map them. The index is downloaded/converted once by the supervisor
+before workers start.
+
+MCP's SSE transport is two requests: ``GET /sse`` opens the stream and announces
+``/messages/?session_id=...``, and every message is a separate ``POST`` that must
+reach the process owning that session. Plain SO_REUSEPORT balancing can't
+guarantee that, so the proxy assigns each new stream to the least-loaded worker,
+records the announced session_id, and routes POSTs by it.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import signal
+import subprocess
+import sys
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+log = logging.getLogger("psx-server-enhanced")
+
+SESSION_ID_PATTERN = re.compile(r"session_id=([0-9a-fA-F-]+)")
+SAMPLE_PATTERN = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s+(\S+)$")
+# FastMCP's SSE app serves these paths (and redirects the slash-less forms to them)
+SSE_PATH = "/sse/"
+MESSAGE_PATH = "/messages/"
+HOP_BY_HOP_HEADERS = {"host", "connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade", "content-length"}
+
+
+class Worker:
+    """One Step7 server process listening on a private port"""
+
+    def __init__(self, worker_id: int, port: int, script: Path, env: Dict[str, str]):
+        self.worker_id = worker_id
+        self.port = port
+        self.script = script
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+        self.active_sessions = 0
+        self.restarts = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        env = {**os.environ, **self.env, "PORT": str(self.port), "HOST": "127.0.0.1",
+               "MCP_WORKERS": "1", "PSX_WORKER_ID": str(self.worker_id)}
+        self.process = subprocess.Popen([sys.executable, str(self.script)], env=env)
+        log.info(f"👷 Worker {self.worker_id} started (pid {self.process.pid}, port {self.port})")
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def send_signal(self, signum: int):
+        if self.alive:
+            self.process.send_signal(signum)
+
+    def stop(self, timeout: float = 10.0):
+        if not self.alive:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class SessionRouter:
+    """Front proxy state: workers, and which worker owns each SSE session"""
+
+    def __init__(self, workers: List[Worker]):
+        self.workers = workers
+        self.sessions: Dict[str, Worker] = {}
+        self.client: Optional[httpx.AsyncClient] = None
+
+    def pick_worker(self) -> Worker:
+        live = [w for w in self.workers if w.alive] or self.workers
+        return min(live, key=lambda w: (w.active_sessions, w.worker_id))
+
+    async def open_stream(self, request: Request) -> Response:
+        """Proxy GET /sse to a worker, learning the session_id from its endpoint event"""
+        worker = self.pick_worker()
+        # Count the session before connecting so concurrent opens spread across workers
+        worker.active_sessions += 1
+        upstream_request = self.client.build_request(
+            "GET", f"{worker.url}{SSE_PATH}", params=request.query_params,
+            headers=forward_headers(request), timeout=httpx.Timeout(None, connect=10.0)
+        )
+        try:
+            upstream = await self.client.send(upstream_request, stream=True)
+        except httpx.HTTPError as e:
+            worker.active_sessions -= 1
+            log.warning(f"⚠️ Worker {worker.worker_id} unavailable for new session: {e}")
+            return JSONResponse({"error": "No worker available", "error_type": "worker_unavailable"}, status_code=503)
+
+        async def relay():
+            session_id, preamble = None, ""
+            try:
+                async for chunk in upstream.aiter_raw():
+                    if session_id is None:
+                        preamble += chunk.decode("utf-8", errors="ignore")
+                        match = SESSION_ID_PATTERN.search(preamble)
+                        if match:
+                            session_id = match.group(1)
+                            self.sessions[session_id] = worker
+                    yield chunk
+            finally:
+                worker.active_sessions -= 1
+                if session_id:
+                    self.sessions.pop(session_id, None)
+                await upstream.aclose()
+
+        return StreamingResponse(
+            relay(), status_code=upstream.status_code,
+            headers={k: v for k, v in upstream.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+        )
+
+    async def forward_message(self, request: Request) -> Response:
+        """Proxy POST /messages/?session_id=... to the worker that owns the session"""
+        worker = self.sessions.get(request.query_params.get("session_id", ""))
+        if worker is None:
+            return Response("Could not find session", status_code=404)
+        upstream = await self.client.request(
+            request.method, f"{worker.url}{MESSAGE_PATH}", params=request.query_params,
+            headers=forward_headers(request), content=await request.body()
+        )
+        return Response(
+            upstream.content, status_code=upstream.status_code,
+            headers={k: v for k, v in upstream.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+        )
+
+    async def health(self, request: Request) -> JSONResponse:
+        """Aggregate worker /health probes: 200 unless every worker is down or degraded"""
+        async def probe(worker: Worker) -> Dict[str, Any]:
+            try:
+                response = await self.client.get(f"{worker.url}/health", timeout=5.0)
+                state = response.json().get("readiness", "unknown")
+            except Exception:
+                # A live process that isn't listening yet is still importing/booting
+                state = "starting" if worker.alive else "down"
+            return {"worker": worker.worker_id, "readiness": state, "sessions": worker.active_sessions,
+                    "restarts": worker.restarts}
+
+        workers = await asyncio.gather(*(probe(w) for w in self.workers))
+        states = {w["readiness"] for w in workers}
+        if "ready" in states:
+            readiness = "ready" if states == {"ready"} else "partially_ready"
+        elif states <= {"down", "degraded"}:
+            readiness = "degraded"
+        else:
+            readiness = "starting"
+        return JSONResponse({"readiness": readiness, "workers": workers, "sessions": len(self.sessions)},
+                            status_code=503 if readiness == "degraded" else 200)
+
+    async def metrics(self, request: Request) -> PlainTextResponse:
+        """Every worker's Prometheus metrics, merged by family with a worker label"""
+        async def scrape(worker: Worker) -> str:
+            try:
+                return (await self.client.get(f"{worker.url}/metrics", timeout=5.0)).text
+            except Exception:
+                return ""
+
+        texts = await asyncio.gather(*(scrape(w) for w in self.workers))
+        return PlainTextResponse(
+            merge_prometheus({w.worker_id: text for w, text in zip(self.workers, texts)}),
+            media_type="text/plain; version=0.0.4"
+        )
+
+
+def forward_headers(request: Request) -> Dict[str, str]:
+    return {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+
+
+def merge_prometheus(texts_by_worker: Dict[int, str]) -> str:
+    """Merge exposition texts, keeping each metric family contiguous and labelling samples by worker"""
+    families: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    for worker_id, text in texts_by_worker.items():
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                kind, name = line.split(" ", 3)[1:3]
+                family = families.setdefault(name, {"HELP": None, "TYPE": None, "samples": []})
+                family[kind] = family[kind] or line
+                continue
+            match = SAMPLE_PATTERN.match(line)
+            if not match or family is None:
+                continue
+            name, labels, value = match.groups()
+            labels = labels[1:-1] if labels else ""
+            worker_label = f'worker="{worker_id}"'
+            family["samples"].append(f"{name}{{{worker_label}{',' + labels if labels else ''}}} {value}")
+
+    lines = []
+    for family in families.values():
+        lines.extend(line for line in (family["HELP"], family["TYPE"]) if line)
+        lines.extend(family["samples"])
+    return "\n".join(lines) + "\n"
+
+
+async def supervise(workers: List[Worker], interval: float = 2.0):
+    """Restart workers that exit unexpectedly"""
+    while True:
+        await asyncio.sleep(interval)
+        for worker in workers:
+            if worker.process is not None and not worker.alive:
+                log.warning(f"⚠️ Worker {worker.worker_id} exited with {worker.process.returncode} - restarting")
+                worker.restarts += 1
+                worker.start()
+
+
+def create_proxy_app(router: SessionRouter) -> Starlette:
+    @asynccontextmanager
+    async def lifespan(app):
+        router.client = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0))
+        for worker in router.workers:
+            worker.start()
+
+        loop = asyncio.get_running_loop()
+        try:
+            # Hot reloads (SIGHUP) are forwarded to every worker
+            loop.add_signal_handler(signal.SIGHUP, lambda: [w.send_signal(signal.SIGHUP) for w in router.workers])
+        except (AttributeError, NotImplementedError, RuntimeError):
+            pass
+
+        supervisor = asyncio.create_task(supervise(router.workers))
+        try:
+            yield
+        finally:
+            supervisor.cancel()
+            for worker in router.workers:
+                worker.stop()
+            await router.client.aclose()
+
+    return Starlette(
+        routes=[
+            Route(SSE_PATH, router.open_stream, methods=["GET"]),
+            Route(SSE_PATH.rstrip("/"), router.open_stream, methods=["GET"]),
+            Route(MESSAGE_PATH, router.forward_message, methods=["POST"]),
+            Route(MESSAGE_PATH.rstrip("/"), router.forward_message, methods=["POST"]),
+            Route("/health", router.health, methods=["GET"]),
+            Route("/metrics", router.metrics, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+
+
+def serve(script: Path, workers: int, host: str, port: int, env: Optional[Dict[str, str]] = None):
+    """Run the front proxy on host:port with workers on the next ports"""
+    import uvicorn
+
+    pool = [Worker(i, port + 1 + i, Path(script), env or {}) for i in range(workers)]
+    log.info(f"🚀 Multi-worker mode: {workers} workers behind {host}:{port}")
+    uvicorn.run(create_proxy_app(SessionRouter(pool)), host=host, port=port, timeout_graceful_shutdown=0)
@@ -3,7 +3,38 @@ PSX Financial Assistant - Simplified Prompts Library
 Clean prompt management focused on format requirements only
 """
 
-from typing import Dict, List, Set
+import json
+from typing import Dict, List, Set, Tuple
+
+# ═══════════════════════════════════════════════════════════════════════
+# AVAILABLE FILING PERIODS
+# ═══════════════════════════════════════════════════════════════════════
+# The period sets both query parsers pick from: PARSING_SYSTEM_PROMPT lists them
+# for Claude and fast_parser.py plans with them. Each set is [period, comparative
+# period]. Add the new set here when filings are added to the index;
+# `python evaluate_fast_parser.py --index-dir ...` checks them against the
+# filing_period values in the index metadata.
+ANNUAL_PERIOD_SETS = [["2024", "2023"], ["2022", "2021"]]
+QUARTERLY_PERIOD_SETS = [
+    ["Q1-2025", "Q1-2024"], ["Q1-2024", "Q1-2023"], ["Q2-2024", "Q2-2023"], ["Q3-2024", "Q3-2023"],
+    ["Q1-2022", "Q1-2021"], ["Q2-2022", "Q2-2021"], ["Q3-2022", "Q3-2021"],
+]
+
+
+def parse_quarter(period: str) -> Tuple[int, int]:
+    """(quarter, year) of a "Q1-2025" period"""
+    quarter, year = period.upper().lstrip("Q").split("-")
+    return int(quarter), int(year)
+
+
+# What "latest" and "last N quarters/years" mean to the parsers
+LATEST_ANNUAL_YEAR = max(int(period_set[0]) for period_set in ANNUAL_PERIOD_SETS)
+LATEST_QUARTER = max((parse_quarter(period_set[0]) for period_set in QUARTERLY_PERIOD_SETS),
+                     key=lambda quarter_year: (quarter_year[1], quarter_year[0]))
+
+
+def format_period_sets(period_sets: List[List[str]]) -> str:
+    return ", ".join(json.dumps(period_set) for period_set in period_sets)
 
 
 class SimplifiedPromptLibrary:
@@ -288,12 +319,12 @@ STANDARD EXAMPLES (intent = "analysis" unless noted)
 *PERIOD SET CONCEPT (CRITICAL):*
 - We have predefined period sets, not individual periods
 - Period sets MUST be picked from this list:
-  - Annual: ["2024", "2023"] or ["2022", "2021"]
-  - Quarterly: ["Q1-2025", "Q1-2024"], ["Q1-2024", "Q1-2023"], ["Q2-2024", "Q2-2023"], ["Q3-2024", "Q3-2023"], 
-              ["Q1-2022", "Q1-2021"], ["Q2-2022", "Q2-2021"], ["Q3-2022", "Q3-2021"]
-- For "last N quarters" → identify which period sets cover those quarters
+""" + f"""  - Annual: {format_period_sets(ANNUAL_PERIOD_SETS)}
+  - Quarterly: {format_period_sets(QUARTERLY_PERIOD_SETS)}
+- Latest filings: annual {LATEST_ANNUAL_YEAR}, quarterly Q{LATEST_QUARTER[0]}-{LATEST_QUARTER[1]} ("last N" counts back from these)
+""" + """- For "last N quarters" → identify which period sets cover those quarters
 - Q4 is derived from annual data: Q4 = Annual - Q3
-- Example: "last 6 quarters" = Q1 2025 + Q4 2024 + Q3 2024 + Q2 2024 + Q1 2024 + Q4 2023
+- Example (when Q1-2025 is the latest quarter): "last 6 quarters" = Q1 2025 + Q4 2024 + Q3 2024 + Q2 2024 + Q1 2024 + Q4 2023
 - This requires 4 period sets: ["Q1-2025", "Q1-2024"], ["Q3-2024", "Q3-2023"], ["Q2-2024", "Q2-2023"], ["2024", "2023"]
 - Note: Q1 2024 comes from ["Q1-2025", "Q1-2024"] comparative data, Q4 2023 comes from ["2024", "2023"] comparative data
 
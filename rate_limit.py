@@ -0,0 +1,225 @@
+"""
+PSX Financial Server - Model Rate Limiting and Circuit Breaking
+Guards calls to the Gemini embedding and generation APIs so throttling fails
+fast instead of turning into a retry storm.
+
+Each model gets a ModelGuard: a token bucket paces requests to the model's
+quota (waiting briefly for a token, failing with ``rate_limited`` if the wait
+would be too long), and a circuit breaker opens after consecutive overload
+errors (429 / 5xx / timeouts) so further calls fail with ``circuit_open`` until
+a trial call succeeds. Both errors carry ``retry_after_seconds``; clients treat
+FAST_FAIL_ERROR_TYPES as "stop retrying now".
+"""
+
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+log = logging.getLogger("psx-server-enhanced")
+
+# rate_limited / circuit_open are refused locally; model_overloaded is a 429/5xx from the API itself
+FAST_FAIL_ERROR_TYPES = ("rate_limited", "circuit_open", "model_overloaded")
+OVERLOAD_STATUS_CODES = (429, 500, 502, 503, 504)
+OVERLOAD_MARKERS = ("RESOURCE_EXHAUSTED", "RATE LIMIT", "QUOTA", "TOO MANY REQUESTS", "UNAVAILABLE", "OVERLOADED")
+# A status code leading the message ("429 RESOURCE_EXHAUSTED.") or after a status word
+# ("Error code: 503", "HTTP/1.1 502") - not any three digits (chunk ids, token counts)
+STATUS_CODE_PATTERN = re.compile(r"^\s*(\d{3})\b|\b(?:STATUS(?: CODE)?|CODE|HTTP(?:/\d(?:\.\d)?)?)\W{0,3}(\d{3})\b")
+
+
+class ModelUnavailableError(Exception):
+    """A model call refused locally, before reaching the API"""
+    error_type = "model_unavailable"
+
+    def __init__(self, model: str, message: str, retry_after_seconds: float):
+        super().__init__(message)
+        self.model = model
+        self.retry_after_seconds = round(max(retry_after_seconds, 0.0), 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"error": str(self), "error_type": self.error_type, "retry_after_seconds": self.retry_after_seconds}
+
+
+class RateLimitedError(ModelUnavailableError):
+    error_type = "rate_limited"
+
+
+class CircuitOpenError(ModelUnavailableError):
+    error_type = "circuit_open"
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    """True for throttling, server-side and timeout failures (not for bad requests)"""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if isinstance(code, int):
+        return code in OVERLOAD_STATUS_CODES
+    text = str(exc).upper()
+    status = STATUS_CODE_PATTERN.search(text)
+    if status and int(status.group(1) or status.group(2)) in OVERLOAD_STATUS_CODES:
+        return True
+    return any(marker in text for marker in OVERLOAD_MARKERS)
+
+
+class TokenBucket:
+    """Requests per second with bursts up to ``burst``; rate <= 0 disables limiting"""
+
+    def __init__(self, rate_per_second: float, burst: float):
+        self.rate = rate_per_second
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """Take cost tokens now (possibly going into debt); seconds until they are covered"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= cost
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, cost: float = 1.0):
+        self.tokens = min(self.capacity, self.tokens + cost)
+
+
+class CircuitBreaker:
+    """closed -> open after failure_threshold consecutive failures -> half_open (one trial) after reset_seconds"""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.open_seconds = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims the single trial slot when half open)"""
+        if self.state == "open":
+            if self.retry_after() > 0:
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+        return True
+
+    def record_success(self):
+        if self.opened_at is not None:
+            self.open_seconds += time.monotonic() - self.opened_at
+            self.opened_at = None
+            log.info("✅ Circuit closed after a successful trial call")
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.opened_at is None:
+                self.times_opened += 1
+            else:
+                self.open_seconds += time.monotonic() - self.opened_at
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """A call that ended without a verdict (cancelled) gives its trial slot back"""
+        self._trial_in_flight = False
+
+    def total_open_seconds(self) -> float:
+        return self.open_seconds + (time.monotonic() - self.opened_at if self.opened_at is not None else 0.0)
+
+
+class ModelGuard:
+    """Token bucket plus circuit breaker for one model, shared by every caller in the process"""
+
+    def __init__(self, model: str, rate_per_minute: float, burst: float = 10, max_wait_seconds: float = 2.0,
+                 failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.model = model
+        self.rate_per_minute = rate_per_minute
+        self.bucket = TokenBucket(rate_per_minute / 60.0, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.max_wait_seconds = max_wait_seconds
+        self.throttled_seconds = 0.0
+        self.rejections: Dict[str, int] = {"rate_limited": 0, "circuit_open": 0}
+        self.overload_errors = 0
+
+    async def acquire(self, cost: float = 1.0):
+        """Wait for a request slot, or raise CircuitOpenError / RateLimitedError without calling the API"""
+        if not self.breaker.allow():
+            self.rejections["circuit_open"] += 1
+            raise CircuitOpenError(
+                self.model, f"{self.model} circuit open after repeated overload errors", self.breaker.retry_after()
+            )
+        wait = self.bucket.reserve(cost)
+        if wait > self.max_wait_seconds:
+            self.bucket.refund(cost)
+            self.breaker.release_trial()
+            self.rejections["rate_limited"] += 1
+            raise RateLimitedError(self.model, f"{self.model} request rate limit reached", wait)
+        if wait > 0:
+            self.throttled_seconds += wait
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.breaker.release_trial()
+                raise
+
+    def record_success(self):
+        self.breaker.record_success()
+
+    def release_trial(self):
+        """A call that ended without a verdict (cancelled, or a stream closed early)"""
+        self.breaker.release_trial()
+
+    def record_failure(self, exc: BaseException):
+        """Overload errors count toward opening the circuit; other errors (bad request, auth,
+        a malformed response) prove nothing about recovery and only give back a trial slot"""
+        if is_overload_error(exc):
+            self.overload_errors += 1
+            self.breaker.record_failure()
+            if self.breaker.state == "open":
+                log.warning(f"🚫 {self.model} circuit open for {self.breaker.reset_seconds:.0f}s: {exc}")
+        else:
+            self.breaker.release_trial()
+
+    async def call(self, request: Callable[[], Awaitable[Any]], cost: float = 1.0) -> Any:
+        await self.acquire(cost)
+        try:
+            result = await request()
+        except asyncio.CancelledError:
+            self.breaker.release_trial()
+            raise
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "rate_per_minute": self.rate_per_minute,
+            "tokens_available": round(max(self.bucket.tokens, 0.0), 2),
+            "circuit_state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "times_opened": self.breaker.times_opened,
+            "open_seconds": round(self.breaker.total_open_seconds(), 3),
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "overload_errors": self.overload_errors,
+            "rejections": dict(self.rejections),
+        }
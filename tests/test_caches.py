@@ -0,0 +1,133 @@
+"""Request coalescing (SingleFlight) and the index-versioned result cache"""
+
+import asyncio
+
+import pytest
+
+import caches
+from caches import ResultCache, SingleFlight, compute_index_version
+
+
+class SlowComputation:
+    """Counts calls; each returns after ``delay`` seconds unless cancelled"""
+
+    def __init__(self, delay: float = 0.02, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return {"nodes": [self.calls]}
+
+
+# ─────────────────────────── SingleFlight ───────────────────────────────
+def test_concurrent_identical_keys_compute_once():
+    async def main():
+        flight, compute = SingleFlight(), SlowComputation()
+        results = await asyncio.gather(*(flight.do("key", compute) for _ in range(5)))
+        return flight, compute, results
+
+    flight, compute, results = asyncio.run(main())
+    assert compute.calls == 1
+    assert [value for value, _ in results] == [{"nodes": [1]}] * 5
+    assert [joined for _, joined in results] == [False, True, True, True, True]
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_different_keys_compute_separately():
+    async def main():
+        flight, compute = SingleFlight(), SlowComputation()
+        await asyncio.gather(flight.do("a", compute), flight.do("b", compute))
+        return compute
+
+    assert asyncio.run(main()).calls == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_task():
+    async def main():
+        flight, compute = SingleFlight(), SlowComputation(delay=0.05)
+        leader = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0.01)
+
+        leader.cancel()
+        value, joined = await follower
+        return compute, leader, value, joined
+
+    compute, leader, value, joined = asyncio.run(main())
+    assert leader.cancelled()
+    assert not compute.cancelled
+    assert compute.calls == 1
+    assert value == {"nodes": [1]} and joined
+
+
+def test_failure_reaches_every_caller_and_frees_the_key():
+    async def main():
+        flight = SingleFlight()
+        failing = SlowComputation(error=RuntimeError("search failed"))
+        results = await asyncio.gather(flight.do("key", failing), flight.do("key", failing), return_exceptions=True)
+        retry = await flight.do("key", SlowComputation())
+        return failing, results, retry
+
+    failing, results, retry = asyncio.run(main())
+    assert failing.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retry == ({"nodes": [1]}, False)
+
+
+# ─────────────────────────── ResultCache ────────────────────────────────
+def test_key_ignores_case_whitespace_and_period_order():
+    assert ResultCache.make_key("HBL  Balance sheet", {"filing_period": ["2023", "2024"], "ticker": "HBL"}, 10) == \
+        ResultCache.make_key("hbl balance sheet", {"ticker": "HBL", "filing_period": ["2024", "2023"]}, 10)
+    assert ResultCache.make_key("hbl", {}, 10, search_mode="dense") != \
+        ResultCache.make_key("hbl", {}, 10, search_mode="hybrid")
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(caches.time, "monotonic", lambda: now[0])
+    cache = ResultCache(ttl_seconds=60)
+    cache.put("key", "v1", {"nodes": []})
+
+    now[0] += 59
+    assert cache.get("key", "v1") == {"nodes": []}
+    now[0] += 2
+    assert cache.get("key", "v1") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", "v1", {"nodes": ["a"]})
+    cache.put("b", "v1", {"nodes": ["b"]})
+    cache.get("a", "v1")
+    cache.put("c", "v1", {"nodes": ["c"]})
+
+    assert cache.get("b", "v1") is None
+    assert cache.get("a", "v1") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_changed_index_version_misses(tmp_path):
+    (tmp_path / "default__vector_store.json").write_text('{"embedding_dict": {}}')
+    cache = ResultCache()
+    cache.put("key", compute_index_version(tmp_path), {"nodes": ["old"]})
+
+    # Derived search artifacts don't change the version
+    (tmp_path / "bm25_postings.npy").write_bytes(b"\0" * 16)
+    assert cache.get("key", compute_index_version(tmp_path)) == {"nodes": ["old"]}
+
+    (tmp_path / "default__vector_store.json").write_text('{"embedding_dict": {"n1": [0.1]}}')
+    assert cache.get("key", compute_index_version(tmp_path)) is None
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["entries"] == 0
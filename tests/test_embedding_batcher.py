@@ -0,0 +1,114 @@
+"""EmbeddingBatcher against a local fake embedder"""
+
+import asyncio
+
+import pytest
+
+from embedding_batcher import EmbeddingBatcher
+
+
+def vector(text):
+    return [float(len(text)), float(sum(map(ord, text)))]
+
+
+class FakeEmbedder:
+    """Async List[str] -> List[vector]; records every batch it is asked to embed"""
+
+    def __init__(self, delay: float = 0.0, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.batches = []
+        self.started = asyncio.Event()
+        self.release = None
+
+    async def __call__(self, texts):
+        self.batches.append(list(texts))
+        self.started.set()
+        if self.release is not None:
+            await self.release.wait()
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return [vector(text) for text in texts]
+
+
+def test_window_flushes_concurrent_callers_as_one_batch():
+    async def main():
+        embedder = FakeEmbedder()
+        batcher = EmbeddingBatcher(embedder, window_seconds=0.02)
+
+        async def late_caller():
+            await asyncio.sleep(0.005)
+            return await batcher.embed(["deposits"])
+
+        first, second = await asyncio.gather(batcher.embed(["advances", "equity"]), late_caller())
+        return embedder, first, second
+
+    embedder, first, second = asyncio.run(main())
+    assert embedder.batches == [["advances", "equity", "deposits"]]
+    assert first == [vector("advances"), vector("equity")]
+    assert second == [vector("deposits")]
+
+
+def test_size_cap_splits_into_several_batches():
+    async def main():
+        embedder = FakeEmbedder()
+        batcher = EmbeddingBatcher(embedder, window_seconds=10, max_batch_size=2)
+        return embedder, batcher, await batcher.embed(["a", "bb", "ccc", "dddd", "eeeee"])
+
+    embedder, batcher, vectors = asyncio.run(main())
+    assert embedder.batches == [["a", "bb"], ["ccc", "dddd"], ["eeeee"]]
+    assert batcher.stats()["batches"] == 3
+    assert batcher.stats()["largest_batch"] == 2
+    assert vectors == [vector(text) for text in ["a", "bb", "ccc", "dddd", "eeeee"]]
+
+
+def test_duplicate_texts_share_one_slot_and_keep_order():
+    async def main():
+        embedder = FakeEmbedder()
+        batcher = EmbeddingBatcher(embedder, window_seconds=0.01)
+        results = await asyncio.gather(
+            batcher.embed(["equity", "advances", "equity"]),
+            batcher.embed(["deposits", "advances"]),
+        )
+        return embedder, results
+
+    embedder, (first, second) = asyncio.run(main())
+    assert embedder.batches == [["equity", "advances", "deposits"]]
+    assert first == [vector("equity"), vector("advances"), vector("equity")]
+    assert second == [vector("deposits"), vector("advances")]
+
+
+def test_failed_batch_fails_every_caller():
+    async def main():
+        batcher = EmbeddingBatcher(FakeEmbedder(error=RuntimeError("429 RESOURCE_EXHAUSTED")), window_seconds=0.01)
+        return await asyncio.gather(batcher.embed(["equity"]), batcher.embed(["advances", "equity"]),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert len(results) == 2
+    for result in results:
+        assert isinstance(result, RuntimeError)
+        assert "RESOURCE_EXHAUSTED" in str(result)
+
+
+def test_cancelled_batch_releases_its_waiters():
+    async def main():
+        embedder = FakeEmbedder()
+        embedder.release = asyncio.Event()
+        batcher = EmbeddingBatcher(embedder, window_seconds=0.001)
+        callers = [asyncio.ensure_future(batcher.embed(["equity"])), asyncio.ensure_future(batcher.embed(["advances"]))]
+
+        await embedder.started.wait()
+        batch_tasks = [task for task in asyncio.all_tasks() if task.get_coro().__name__ == "_run_batch"]
+        assert len(batch_tasks) == 1
+        batch_tasks[0].cancel()
+
+        done, pending = await asyncio.wait(callers, timeout=1)
+        return done, pending
+
+    done, pending = asyncio.run(main())
+    assert not pending
+    for caller in done:
+        with pytest.raises(asyncio.CancelledError):
+            caller.result()
@@ -0,0 +1,141 @@
+"""index_download against a local Range-capable http.server standing in for the release host"""
+
+import asyncio
+import hashlib
+import io
+import json
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from index_download import DownloadProgress, download_index, download_with_resume
+
+
+def make_archive() -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        content = json.dumps({"embedding_dict": {}}).encode() * 2000
+        info = tarfile.TarInfo("gemini_index_metadata/default__vector_store.json")
+        info.size = len(content)
+        tar.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+class ReleaseServer:
+    """Serves one payload with ETag, Range and 416 handling; records the Range header of each request"""
+
+    def __init__(self, payload: bytes):
+        self.payload = payload
+        self.ranges = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.ranges.append(self.headers.get("Range"))
+                body, status = server.payload, 200
+                range_header = self.headers.get("Range")
+                if range_header:
+                    start = int(range_header.split("=")[1].split("-")[0])
+                    if start >= len(server.payload):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(server.payload)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    body, status = server.payload[start:], 206
+                self.send_response(status)
+                self.send_header("ETag", '"release-1"')
+                self.send_header("Content-Length", str(len(body)))
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{len(server.payload) - 1}/{len(server.payload)}")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/index.tar.gz"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    release = ReleaseServer(make_archive())
+    yield release
+    release.close()
+
+
+def leave_partial(server: ReleaseServer, part_path: Path, size: int, state: dict):
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    part_path.write_bytes(server.payload[:size])
+    part_path.with_name(part_path.name + ".json").write_text(json.dumps({"url": server.url, **state}))
+
+
+def test_resumes_partial_download(server, tmp_path):
+    part_path = tmp_path / "index.tar.gz.part"
+    leave_partial(server, part_path, 100, {"etag": '"release-1"'})
+
+    progress = DownloadProgress()
+    download_with_resume(server.url, part_path, progress)
+
+    assert part_path.read_bytes() == server.payload
+    assert server.ranges == ["bytes=100-"]
+    assert progress.resumed_from == 100
+
+
+def test_complete_partial_answered_with_416_is_installed(server, tmp_path):
+    work_dir, target_dir = tmp_path / "work", tmp_path / "gemini_index_metadata"
+    # State from before total_bytes was recorded: only the server can say the file is complete
+    leave_partial(server, work_dir / "index.tar.gz.part", len(server.payload), {"etag": '"release-1"'})
+
+    asyncio.run(download_index(server.url, target_dir, work_dir))
+
+    assert server.ranges == [f"bytes={len(server.payload)}-"]
+    assert (target_dir / "default__vector_store.json").exists()
+    assert not work_dir.exists()
+
+
+def test_complete_partial_with_recorded_size_skips_the_request(server, tmp_path):
+    work_dir, target_dir = tmp_path / "work", tmp_path / "gemini_index_metadata"
+    leave_partial(server, work_dir / "index.tar.gz.part", len(server.payload),
+                  {"etag": '"release-1"', "total_bytes": len(server.payload)})
+
+    asyncio.run(download_index(server.url, target_dir, work_dir,
+                               expected_sha256=hashlib.sha256(server.payload).hexdigest()))
+
+    assert server.ranges == []
+    assert (target_dir / "default__vector_store.json").exists()
+
+
+def test_unextractable_download_is_discarded(server, tmp_path):
+    work_dir, target_dir = tmp_path / "work", tmp_path / "gemini_index_metadata"
+    server.payload = b"not a tarball" * 100
+
+    with pytest.raises(tarfile.TarError):
+        asyncio.run(download_index(server.url, target_dir, work_dir))
+    assert not (work_dir / "index.tar.gz.part").exists()
+    assert not (work_dir / "index.tar.gz.part.json").exists()
+
+    # The next run downloads from scratch instead of asking for a range past the end
+    server.payload = make_archive()
+    asyncio.run(download_index(server.url, target_dir, work_dir))
+    assert server.ranges[-1] is None
+    assert (target_dir / "default__vector_store.json").exists()
+
+
+def test_checksum_mismatch_discards_partial_and_state(server, tmp_path):
+    work_dir, target_dir = tmp_path / "work", tmp_path / "gemini_index_metadata"
+
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        asyncio.run(download_index(server.url, target_dir, work_dir, expected_sha256="0" * 64))
+    assert not (work_dir / "index.tar.gz.part").exists()
+    assert not (work_dir / "index.tar.gz.part.json").exists()
+    assert not target_dir.exists()
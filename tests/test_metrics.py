@@ -0,0 +1,28 @@
+"""Prometheus rendering in metrics"""
+
+from metrics import MetricsRegistry
+
+
+def test_callback_counter_is_exposed_as_a_counter():
+    registry = MetricsRegistry()
+    registry.callback_counter("model_fast_failures_total", "Calls refused locally",
+                              lambda: [({"reason": "rate_limited"}, 3), ({"reason": "circuit_open"}, 0)])
+    registry.callback_gauge("queue_depth", "Records waiting", lambda: 2)
+
+    lines = registry.render_prometheus().splitlines()
+
+    assert "# TYPE psx_model_fast_failures_total counter" in lines
+    assert 'psx_model_fast_failures_total{reason="rate_limited"} 3' in lines
+    assert 'psx_model_fast_failures_total{reason="circuit_open"} 0' in lines
+    assert "# TYPE psx_queue_depth gauge" in lines
+
+
+def test_values_render_at_full_precision():
+    registry = MetricsRegistry()
+    registry.callback_counter("throttled_seconds_total", "Seconds waited", lambda: 1234567.891011)
+    registry.counter("searches_total", "Searches").inc(outcome="ok")
+
+    rendered = registry.render_prometheus()
+
+    assert "psx_throttled_seconds_total 1234567.891011" in rendered
+    assert 'psx_searches_total{outcome="ok"} 1\n' in rendered
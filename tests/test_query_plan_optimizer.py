@@ -0,0 +1,115 @@
+"""optimize_query_plan: which specs are merged by filing period and which are left alone"""
+
+import copy
+import importlib
+import sys
+
+import pytest
+
+
+class OfflineLLM:
+    """Stands in for GoogleGenAI, which the client module builds (and connects) at import"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+@pytest.fixture(scope="module")
+def client():
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("ANTHROPIC_API_KEY", "test")
+        patch.setenv("GEMINI_API_KEY", "test")
+        patch.setattr("llama_index.llms.google_genai.GoogleGenAI", OfflineLLM)
+        sys.modules.pop("Step8MCPClientPsxGPT", None)
+        yield importlib.import_module("Step8MCPClientPsxGPT")
+    sys.modules.pop("Step8MCPClientPsxGPT", None)
+
+
+def spec(query, ticker="HBL", statement="balance_sheet", period="2024", top_k=10, **filters):
+    metadata_filters = {"ticker": ticker, "statement_type": statement, "is_statement": "yes", **filters}
+    if period is not None:
+        metadata_filters["filing_period"] = period
+    return {"search_query": query, "metadata_filters": metadata_filters, "top_k": top_k}
+
+
+def periods_by_spec(queries):
+    return [(q["metadata_filters"]["ticker"], q["metadata_filters"]["statement_type"],
+             q["metadata_filters"].get("filing_type"), q["metadata_filters"].get("filing_period")) for q in queries]
+
+
+@pytest.mark.parametrize("queries, expected", [
+    pytest.param(
+        [spec("HBL balance sheet 2024", period=["2024", "2023"]),
+         spec("HBL balance sheet 2023", period=["2023", "2022"])],
+        [("HBL", "balance_sheet", None, ["2024", "2023", "2022"])],
+        id="overlapping period sets merged once each",
+    ),
+    pytest.param(
+        [spec("HBL balance sheet 2024"), spec("hbl  balance sheet 2024"), spec("HBL balance sheet 2024")],
+        [("HBL", "balance_sheet", None, "2024")],
+        id="exact duplicates dropped",
+    ),
+    pytest.param(
+        [spec("HBL balance sheet 2024"), spec("MCB balance sheet 2023", ticker="MCB", period="2023")],
+        [("HBL", "balance_sheet", None, "2024"), ("MCB", "balance_sheet", None, "2023")],
+        id="different tickers left alone",
+    ),
+    pytest.param(
+        [spec("HBL balance sheet 2024"), spec("HBL profit and loss 2023", statement="profit_and_loss", period="2023")],
+        [("HBL", "balance_sheet", None, "2024"), ("HBL", "profit_and_loss", None, "2023")],
+        id="different statements left alone",
+    ),
+    pytest.param(
+        [spec("HBL balance sheet 2024"), spec("HBL advances 2023", period="2023")],
+        [("HBL", "balance_sheet", None, "2024"), ("HBL", "balance_sheet", None, "2023")],
+        id="different search queries left alone",
+    ),
+    pytest.param(
+        [spec("HBL balance sheet", period=None), spec("HBL balance sheet", period=None, top_k=5)],
+        [("HBL", "balance_sheet", None, None), ("HBL", "balance_sheet", None, None)],
+        id="specs without periods never merged",
+    ),
+])
+def test_optimize_query_plan(client, queries, expected):
+    optimized = client.optimize_query_plan(copy.deepcopy(queries))
+    assert periods_by_spec(optimized) == expected
+
+
+def test_merged_spec_sums_top_k_up_to_the_cap(client, monkeypatch):
+    monkeypatch.setattr(client, "PLAN_MERGED_TOP_K_MAX", 25)
+    optimized = client.optimize_query_plan([
+        spec("HBL balance sheet Q1-2024", period="Q1-2024", top_k=10),
+        spec("HBL balance sheet Q2-2024", period="Q2-2024", top_k=10),
+        spec("HBL balance sheet Q3-2024", period="Q3-2024", top_k=10),
+    ])
+    assert len(optimized) == 1
+    assert optimized[0]["search_query"] == "HBL balance sheet Q1-2024 Q2-2024 Q3-2024"
+    assert optimized[0]["top_k"] == 25
+
+
+def quarterly_plan(client):
+    return client.QueryPlan(companies=["HBL"], intent="statement", confidence=0.9, queries=[
+        spec(f"HBL balance sheet {period}", period=period) for period in ("Q1-2024", "Q2-2024", "Q3-2024")
+    ])
+
+
+def test_q4_is_served_by_the_annual_set(client, monkeypatch):
+    monkeypatch.setattr(client, "PLAN_OPTIMIZER", True)
+    plan = client.finalize_query_plan(quarterly_plan(client), "HBL balance sheet for the last 4 quarters")
+
+    assert periods_by_spec(plan.queries) == [
+        ("HBL", "balance_sheet", "quarterly", ["Q1-2024", "Q2-2024", "Q3-2024"]),
+        ("HBL", "balance_sheet", "annual", None),
+    ]
+
+
+def test_disabled_optimizer_leaves_the_plan_alone(client, monkeypatch):
+    monkeypatch.setattr(client, "PLAN_OPTIMIZER", False)
+    plan = client.finalize_query_plan(quarterly_plan(client), "HBL balance sheet for the last 4 quarters")
+
+    assert periods_by_spec(plan.queries) == [
+        ("HBL", "balance_sheet", "quarterly", "Q1-2024"),
+        ("HBL", "balance_sheet", "quarterly", "Q2-2024"),
+        ("HBL", "balance_sheet", "quarterly", "Q3-2024"),
+        ("HBL", "balance_sheet", "annual", None),
+    ]
@@ -0,0 +1,59 @@
+"""Overload classification and circuit breaker verdicts in rate_limit"""
+
+import asyncio
+
+import pytest
+
+from rate_limit import ModelGuard, is_overload_error
+
+
+class APIError(Exception):
+    def __init__(self, message: str, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+@pytest.mark.parametrize("exc, overload", [
+    (APIError("quota", code=429), True),
+    (APIError("bad request", code=400), False),
+    (Exception("429 RESOURCE_EXHAUSTED. {'error': {'code': 429}}"), True),
+    (Exception("Error code: 503 - service busy"), True),
+    (Exception("HTTP/1.1 502 Bad Gateway"), True),
+    (Exception("Too Many Requests"), True),
+    (asyncio.TimeoutError(), True),
+    (Exception("invalid chunk id 84290 in request"), False),
+    (Exception("input has 1429 tokens, limit is 2048"), False),
+    (Exception("400 INVALID_ARGUMENT: read 4290 bytes"), False),
+])
+def test_is_overload_error(exc, overload):
+    assert is_overload_error(exc) is overload
+
+
+def half_open_guard() -> ModelGuard:
+    guard = ModelGuard("test-model", rate_per_minute=0, failure_threshold=1, reset_seconds=0)
+    guard.record_failure(APIError("quota", code=429))
+    assert guard.breaker.state == "open"
+    assert guard.breaker.allow()
+    assert guard.breaker.state == "half_open"
+    return guard
+
+
+def test_non_overload_error_during_trial_keeps_the_circuit_half_open():
+    guard = half_open_guard()
+    consecutive_failures = guard.breaker.consecutive_failures
+
+    guard.record_failure(APIError("bad request", code=400))
+
+    assert guard.breaker.state == "half_open"
+    assert guard.breaker.consecutive_failures == consecutive_failures
+    # The trial slot is free for the next call
+    assert guard.breaker.allow()
+
+
+def test_successful_trial_closes_the_circuit():
+    guard = half_open_guard()
+
+    guard.record_success()
+
+    assert guard.breaker.state == "closed"
+    assert guard.breaker.consecutive_failures == 0
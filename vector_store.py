@@ -0,0 +1,639 @@
+"""
+PSX Financial Server - Memory-Mapped Vector Store
+Binary replacement for the JSON SimpleVectorStore persisted by llama-index.
+
+The conversion step reads ``default__vector_store.json`` + ``docstore.json`` once
+and writes a directory of flat files that open instantly with ``mmap``:
+
+    manifest.json      count, dim, dtype and a fingerprint of the source index
+    embeddings.npy     (count, dim) float32/float16/int8 matrix of unit-normalized
+                       embeddings, one row per node (cosine == dot product)
+    embedding_scales.npy   (count,) float32 per-row scales (int8 stores only:
+                       row ≈ int8 row * scale)
+    embeddings_rescore.npy (count, dim) float32 copy used to exactly rescore the
+                       top candidates (optional, written with --rescore)
+    node_ids.json      node ids, parallel to the embedding rows
+    metadata.json      node metadata dicts, parallel to the embedding rows
+    texts.bin          UTF-8 node texts concatenated
+    text_offsets.npy   (count + 1) int64 byte offsets into texts.bin
+
+Usage:
+    python vector_store.py convert [--index-dir gemini_index_metadata] [--dtype float16|int8] [--rescore]
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import mmap
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+log = logging.getLogger("psx-server-enhanced")
+
+STORE_DIRNAME = "mmap_store"
+FORMAT_VERSION = 2
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+SOURCE_FILES = ("default__vector_store.json", "docstore.json")
+
+
+# ─────────────────────────── Conversion ─────────────────────────────────
+def source_fingerprint(index_dir: Path) -> str:
+    """Fingerprint of the llama-index JSON files a store was converted from"""
+    parts = []
+    for name in SOURCE_FILES:
+        path = Path(index_dir) / name
+        if path.exists():
+            stat = path.stat()
+            parts.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return "|".join(parts)
+
+
+def is_store_current(index_dir: Path, store_dir: Optional[Path] = None, dtype: Optional[str] = None,
+                     rescore: Optional[bool] = None) -> bool:
+    """Whether a converted store exists and matches the current JSON index (and requested layout)"""
+    store_dir = Path(store_dir or Path(index_dir) / STORE_DIRNAME)
+    manifest_path = store_dir / "manifest.json"
+    if not manifest_path.exists():
+        return False
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except Exception:
+        return False
+    if manifest.get("format_version") != FORMAT_VERSION:
+        return False
+    # Stores shipped without their JSON source (e.g. a binary-only release) are always current
+    if not (Path(index_dir) / SOURCE_FILES[0]).exists():
+        return True
+    if dtype is not None and manifest.get("dtype") != dtype:
+        return False
+    if rescore is not None and dtype not in (None, "float32") and bool(manifest.get("rescore")) != rescore:
+        return False
+    return manifest.get("source_fingerprint") == source_fingerprint(index_dir)
+
+
+def convert_index(index_dir: Path, store_dir: Optional[Path] = None, dtype: str = "float32",
+                  rescore: bool = False) -> Path:
+    """Convert a persisted llama-index SimpleVectorStore + docstore into a mmap store"""
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported dtype '{dtype}', expected one of {SUPPORTED_DTYPES}")
+
+    index_dir = Path(index_dir)
+    store_dir = Path(store_dir or index_dir / STORE_DIRNAME)
+    log.info(f"🔧 Converting vector index in {index_dir} to {dtype} mmap store...")
+
+    vector_data = json.loads((index_dir / "default__vector_store.json").read_text())
+    embedding_dict: Dict[str, List[float]] = vector_data.get("embedding_dict", {})
+    vector_metadata: Dict[str, Dict[str, Any]] = vector_data.get("metadata_dict", {}) or {}
+
+    docstore_path = index_dir / "docstore.json"
+    docstore_data: Dict[str, Any] = {}
+    if docstore_path.exists():
+        docstore_data = json.loads(docstore_path.read_text()).get("docstore/data", {})
+
+    node_ids = list(embedding_dict.keys())
+    if not node_ids:
+        raise ValueError(f"No embeddings found in {index_dir / 'default__vector_store.json'}")
+
+    def rows():
+        for node_id in node_ids:
+            node_data = docstore_data.get(node_id, {}).get("__data__", {})
+            if node_data:
+                text = node_data.get("text", "") or ""
+                metadata = node_data.get("metadata", {}) or {}
+            else:
+                # Fall back to the vector store's copy of the metadata (minus llama-index bookkeeping keys)
+                text = ""
+                metadata = {
+                    k: v for k, v in vector_metadata.get(node_id, {}).items()
+                    if not k.startswith("_") and k not in ("document_id", "doc_id", "ref_doc_id")
+                }
+            yield embedding_dict[node_id], text, metadata
+
+    return write_store(store_dir, node_ids, rows(), len(embedding_dict[node_ids[0]]), dtype=dtype,
+                       rescore=rescore, fingerprint=source_fingerprint(index_dir))
+
+
+def quantize_int8(vector: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Symmetric per-row scalar quantization: vector ≈ int8 codes * scale"""
+    peak = float(np.max(np.abs(vector))) if len(vector) else 0.0
+    if peak == 0:
+        return np.zeros(len(vector), dtype=np.int8), 0.0
+    scale = peak / 127.0
+    return np.clip(np.rint(vector / scale), -127, 127).astype(np.int8), scale
+
+
+def write_store(store_dir: Path, node_ids: List[str], rows: Any, dim: int, dtype: str = "float32",
+                rescore: bool = False, fingerprint: str = "") -> Path:
+    """Write a store from (embedding, text, metadata) rows parallel to node_ids.
+
+    Everything goes into a staging directory that is renamed into place once
+    complete. ``rescore`` keeps a float32 copy for exact rescoring of quantized
+    (float16/int8) stores.
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported dtype '{dtype}', expected one of {SUPPORTED_DTYPES}")
+    store_dir = Path(store_dir)
+    started = time.perf_counter()
+    rescore = rescore and dtype != "float32"
+
+    # Write into a staging directory and swap it in once complete
+    staging_dir = store_dir.with_name(store_dir.name + ".tmp")
+    if staging_dir.exists():
+        shutil.rmtree(staging_dir)
+    staging_dir.mkdir(parents=True)
+
+    count = len(node_ids)
+    embeddings = np.lib.format.open_memmap(
+        staging_dir / "embeddings.npy", mode="w+", dtype=np.dtype(dtype), shape=(count, dim)
+    )
+    scales = np.zeros(count, dtype=np.float32) if dtype == "int8" else None
+    rescore_embeddings = None
+    if rescore:
+        rescore_embeddings = np.lib.format.open_memmap(
+            staging_dir / "embeddings_rescore.npy", mode="w+", dtype=np.float32, shape=(count, dim)
+        )
+    metadata_list: List[Dict[str, Any]] = []
+    offsets = np.zeros(count + 1, dtype=np.int64)
+
+    with open(staging_dir / "texts.bin", "wb") as texts_file:
+        for row, (vector, text, metadata) in enumerate(rows):
+            vector = normalize_vector(vector)
+            if scales is not None:
+                embeddings[row], scales[row] = quantize_int8(vector)
+            else:
+                embeddings[row] = vector
+            if rescore_embeddings is not None:
+                rescore_embeddings[row] = vector
+            metadata_list.append(metadata)
+
+            encoded = (text or "").encode("utf-8")
+            texts_file.write(encoded)
+            offsets[row + 1] = offsets[row] + len(encoded)
+
+    embeddings.flush()
+    del embeddings
+    if rescore_embeddings is not None:
+        rescore_embeddings.flush()
+        del rescore_embeddings
+    if scales is not None:
+        np.save(staging_dir / "embedding_scales.npy", scales)
+    np.save(staging_dir / "text_offsets.npy", offsets)
+    (staging_dir / "node_ids.json").write_text(json.dumps(node_ids))
+    (staging_dir / "metadata.json").write_text(json.dumps(metadata_list))
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "count": count,
+        "dim": dim,
+        "dtype": dtype,
+        "normalized": True,
+        "rescore": rescore,
+        "source_fingerprint": fingerprint,
+        "created_at": datetime.datetime.now().isoformat(),
+    }
+    (staging_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+
+    if store_dir.exists():
+        shutil.rmtree(store_dir)
+    staging_dir.rename(store_dir)
+
+    log.info(f"✅ Converted {count} nodes ({dim}-dim {dtype}{' + float32 rescore' if rescore else ''}) "
+             f"in {time.perf_counter() - started:.1f}s → {store_dir}")
+    return store_dir
+
+
+# ─────────────────────────── Vector Scoring ─────────────────────────────
+SCORING_BLOCK_ROWS = 65536
+UPCAST_BLOCK_ROWS = 256
+
+
+def normalize_vector(vector: Any) -> np.ndarray:
+    """Unit-normalize a vector as float32 (zero vectors are returned unchanged)"""
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+
+def matvec(matrix: np.ndarray, query: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """float32 matrix-vector product; non-float32 matrices are upcast block by block.
+
+    ``scales`` (one per row) turns int8 codes back into dot products.
+    """
+    if matrix.dtype == np.float32:
+        scores = matrix @ query
+    else:
+        # Small blocks upcast into one reused buffer stay in cache (large blocks are ~3x slower)
+        scores = np.empty(len(matrix), dtype=np.float32)
+        buffer = np.empty((UPCAST_BLOCK_ROWS, matrix.shape[1]), dtype=np.float32)
+        for start in range(0, len(matrix), UPCAST_BLOCK_ROWS):
+            block = matrix[start:start + UPCAST_BLOCK_ROWS]
+            upcast = buffer[:len(block)]
+            upcast[...] = block
+            np.matmul(upcast, query, out=scores[start:start + len(block)])
+    if scales is not None:
+        scores *= scales
+    return scores
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k scores, best first (argpartition + sort of the k winners)"""
+    k = min(top_k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        winners = np.argpartition(scores, -k)[-k:]
+    else:
+        winners = np.arange(len(scores))
+    return winners[np.argsort(-scores[winners], kind="stable")]
+
+
+def score_top_k(matrix: np.ndarray, query: np.ndarray, top_k: int,
+                candidate_rows: Optional[np.ndarray] = None,
+                scales: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Dot-product top-k over a normalized embedding matrix (or a subset of its rows).
+
+    Returns (rows, scores), best first. Without candidates the whole contiguous
+    matrix is scored in one product; with candidates only those rows are gathered.
+    """
+    if candidate_rows is None:
+        scores = matvec(matrix, query, scales)
+        winners = top_k_indices(scores, top_k)
+        return winners, scores[winners]
+    if len(candidate_rows) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    scores = matvec(matrix[candidate_rows], query, scales[candidate_rows] if scales is not None else None)
+    winners = top_k_indices(scores, top_k)
+    return candidate_rows[winners], scores[winners]
+
+
+# ─────────────────────────── Metadata Filtering ─────────────────────────
+def split_metadata_filters(metadata_filters: Dict[str, Any]) -> Tuple[Dict[str, str], List[str]]:
+    """Split search filters into AND-ed equality filters and OR-ed filing periods"""
+    standard_filters: Dict[str, str] = {}
+    filing_periods: List[str] = []
+    for key, value in (metadata_filters or {}).items():
+        if value is None:
+            continue
+        if key == "filing_period" and isinstance(value, list):
+            filing_periods.extend(str(p).strip() for p in value if p and str(p).strip())
+        else:
+            standard_filters[key] = str(value)
+    return standard_filters, filing_periods
+
+
+class MetadataIndex:
+    """Inverted index from metadata (key, value) to the sorted rows carrying it.
+
+    Filters are resolved by set operations on the posting arrays (standard filters
+    intersected, filing periods unioned) so only surviving rows get scored.
+    Values are compared as strings, and list-valued metadata is indexed under
+    each of its elements.
+    """
+
+    EMPTY = np.empty(0, dtype=np.int32)
+
+    def __init__(self, metadata: List[Dict[str, Any]]):
+        started = time.perf_counter()
+        postings: Dict[str, Dict[str, List[int]]] = {}
+        for row, node_metadata in enumerate(metadata):
+            for key, value in node_metadata.items():
+                values = value if isinstance(value, list) else [value]
+                key_postings = postings.setdefault(key, {})
+                for item in values:
+                    if item is not None:
+                        key_postings.setdefault(str(item), []).append(row)
+
+        self.postings: Dict[str, Dict[str, np.ndarray]] = {
+            key: {value: np.unique(np.asarray(rows, dtype=np.int32)) for value, rows in values.items()}
+            for key, values in postings.items()
+        }
+        self.row_count = len(metadata)
+        log.info(f"🗂️ Metadata index built: {len(self.postings)} keys in {time.perf_counter() - started:.2f}s")
+
+    def rows_for(self, key: str, value: str) -> np.ndarray:
+        return self.postings.get(key, {}).get(str(value), self.EMPTY)
+
+    def resolve(self, standard_filters: Dict[str, str], filing_periods: List[str]) -> Optional[np.ndarray]:
+        """Sorted rows matching all standard filters and any filing period (None = no filtering)"""
+        if not standard_filters and not filing_periods:
+            return None
+
+        row_sets = [self.rows_for(key, value) for key, value in standard_filters.items()]
+        if filing_periods:
+            period_rows = [self.rows_for("filing_period", period) for period in filing_periods]
+            row_sets.append(np.unique(np.concatenate(period_rows)) if len(period_rows) > 1 else period_rows[0])
+
+        # Intersect smallest first so the working set shrinks as fast as possible
+        row_sets.sort(key=len)
+        result = row_sets[0]
+        for rows in row_sets[1:]:
+            if len(result) == 0:
+                break
+            result = np.intersect1d(result, rows, assume_unique=True)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self.postings),
+            "distinct_values": sum(len(values) for values in self.postings.values()),
+        }
+
+
+# ─────────────────────────── Approximate Search (IVF) ───────────────────
+IVF_MAX_TRAINING_SAMPLE = 100_000
+
+
+class IVFIndex:
+    """Inverted-file ANN index: spherical k-means lists over the normalized embeddings.
+
+    A query scores the centroids, then exactly scores only the rows in the
+    ``nprobe`` closest lists. Metadata candidates compose by intersection; small
+    candidate sets skip the ANN step and are scored exactly.
+    """
+
+    FILES = ("ivf_centroids.npy", "ivf_rows.npy", "ivf_offsets.npy", "ivf_manifest.json")
+
+    def __init__(self, centroids: np.ndarray, list_rows: np.ndarray, list_offsets: np.ndarray,
+                 nprobe: int = 8, exact_threshold: int = 20000):
+        self.centroids = centroids
+        self.list_rows = list_rows
+        self.list_offsets = list_offsets
+        self.nprobe = nprobe
+        self.exact_threshold = exact_threshold
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @staticmethod
+    def default_n_lists(count: int) -> int:
+        return int(max(1, min(65536, 4 * np.sqrt(count))))
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, n_lists: Optional[int] = None, iterations: int = 10,
+              sample_size: Optional[int] = None, seed: int = 0, **kwargs: Any) -> "IVFIndex":
+        """Train centroids on a sample with spherical k-means, then assign every row"""
+        started = time.perf_counter()
+        count = len(embeddings)
+        n_lists = min(n_lists or cls.default_n_lists(count), count)
+        rng = np.random.default_rng(seed)
+
+        # A fixed-size sample is plenty to place the centroids and bounds training memory
+        sample_size = min(count, sample_size or min(max(64 * n_lists, 10000), IVF_MAX_TRAINING_SAMPLE))
+        sample_rows = np.sort(rng.choice(count, size=sample_size, replace=False))
+        sample = np.asarray(embeddings[sample_rows], dtype=np.float32)
+        # int8 codes carry a per-row scale; renormalizing keeps every sample point equally weighted
+        sample /= np.maximum(np.linalg.norm(sample, axis=1, keepdims=True), 1e-12)
+
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = cls._assign_blocked(sample, centroids)
+            sums = np.empty_like(centroids)
+            for dim in range(sample.shape[1]):
+                sums[:, dim] = np.bincount(assignments, weights=sample[:, dim], minlength=n_lists)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # Re-seed empty lists with random sample points
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            norms[empty] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        assignments = cls._assign_blocked(embeddings, centroids)
+
+        list_rows = np.argsort(assignments, kind="stable").astype(np.int32)
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=n_lists), out=list_offsets[1:])
+
+        log.info(f"✅ IVF index built: {n_lists} lists over {count} rows in {time.perf_counter() - started:.1f}s")
+        return cls(centroids, list_rows, list_offsets, **kwargs)
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    @classmethod
+    def _assign_blocked(cls, vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Closest centroid per row, in blocks so the row x list score matrix stays bounded"""
+        block_rows = max(256, min(SCORING_BLOCK_ROWS, SCORING_BLOCK_ROWS * 256 // len(centroids)))
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), block_rows):
+            block = np.asarray(vectors[start:start + block_rows], dtype=np.float32)
+            assignments[start:start + len(block)] = cls._assign(block, centroids)
+        return assignments
+
+    def save(self, store_dir: Path, store_created_at: str):
+        store_dir = Path(store_dir)
+        np.save(store_dir / "ivf_centroids.npy", self.centroids)
+        np.save(store_dir / "ivf_rows.npy", self.list_rows)
+        np.save(store_dir / "ivf_offsets.npy", self.list_offsets)
+        (store_dir / "ivf_manifest.json").write_text(json.dumps({
+            "n_lists": self.n_lists,
+            "store_created_at": store_created_at,
+        }, indent=2))
+
+    @classmethod
+    def load(cls, store_dir: Path, store_created_at: str, **kwargs: Any) -> Optional["IVFIndex"]:
+        """Load a saved IVF index, or None if missing or built for a different store"""
+        store_dir = Path(store_dir)
+        if not all((store_dir / name).exists() for name in cls.FILES):
+            return None
+        manifest = json.loads((store_dir / "ivf_manifest.json").read_text())
+        if manifest.get("store_created_at") != store_created_at:
+            return None
+        return cls(
+            np.load(store_dir / "ivf_centroids.npy"),
+            np.load(store_dir / "ivf_rows.npy", mmap_mode="r"),
+            np.load(store_dir / "ivf_offsets.npy"),
+            **kwargs
+        )
+
+    def probe_rows(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Rows stored in the nprobe lists whose centroids are closest to the query"""
+        lists = top_k_indices(self.centroids @ query, nprobe)
+        return np.concatenate([self.list_rows[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists])
+
+    def search(self, embeddings: np.ndarray, query: np.ndarray, top_k: int,
+               candidate_rows: Optional[np.ndarray] = None,
+               nprobe: Optional[int] = None,
+               scales: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k, optionally restricted to metadata candidate rows"""
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        if candidate_rows is not None and len(candidate_rows) <= self.exact_threshold:
+            return score_top_k(embeddings, query, top_k, candidate_rows, scales)
+
+        candidate_mask = None
+        if candidate_rows is not None:
+            candidate_mask = np.zeros(len(embeddings), dtype=bool)
+            candidate_mask[candidate_rows] = True
+
+        # Widen the probe until enough filtered rows survive to fill top_k
+        while True:
+            rows = self.probe_rows(query, nprobe)
+            if candidate_mask is not None:
+                rows = rows[candidate_mask[rows]]
+            if len(rows) >= top_k or nprobe >= self.n_lists:
+                break
+            nprobe = min(self.n_lists, nprobe * 2)
+
+        rows = np.sort(rows)
+        return score_top_k(embeddings, query, top_k, rows, scales)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "engine": "ivf",
+            "n_lists": self.n_lists,
+            "nprobe": self.nprobe,
+            "exact_threshold": self.exact_threshold,
+        }
+
+
+# ─────────────────────────── Memory-Mapped Store ────────────────────────
+class MmapVectorStore:
+    """Read-only vector store over a converted mmap directory"""
+
+    def __init__(self, store_dir: Path, rescore: bool = True, rescore_oversample: int = 4):
+        self.store_dir = Path(store_dir)
+        self.manifest = json.loads((self.store_dir / "manifest.json").read_text())
+        self.embeddings = np.load(self.store_dir / "embeddings.npy", mmap_mode="r")
+        scales_path = self.store_dir / "embedding_scales.npy"
+        self.scales: Optional[np.ndarray] = np.load(scales_path) if scales_path.exists() else None
+
+        # Quantized stores can rescore oversampled candidates against the float32 copy;
+        # it stays on disk and only the candidate rows are paged in
+        rescore_path = self.store_dir / "embeddings_rescore.npy"
+        self.rescore_embeddings: Optional[np.ndarray] = None
+        if rescore and rescore_path.exists():
+            self.rescore_embeddings = np.load(rescore_path, mmap_mode="r")
+        self.rescore_oversample = max(1, rescore_oversample)
+        self.node_ids: List[str] = json.loads((self.store_dir / "node_ids.json").read_text())
+        self.metadata: List[Dict[str, Any]] = json.loads((self.store_dir / "metadata.json").read_text())
+        self.text_offsets = np.load(self.store_dir / "text_offsets.npy", mmap_mode="r")
+
+        self._texts_file = open(self.store_dir / "texts.bin", "rb")
+        if self.text_offsets[-1] > 0:
+            self._texts = mmap.mmap(self._texts_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._texts = b""
+
+        self.row_by_id = {node_id: row for row, node_id in enumerate(self.node_ids)}
+        self.metadata_index = MetadataIndex(self.metadata)
+        self.ann_index: Optional[IVFIndex] = None
+
+    @classmethod
+    def load(cls, store_dir: Path, **kwargs: Any) -> "MmapVectorStore":
+        started = time.perf_counter()
+        store = cls(store_dir, **kwargs)
+        rescore = " + float32 rescore" if store.rescore_embeddings is not None else ""
+        log.info(f"✅ Mmap vector store opened: {store.count} nodes, {store.dim}-dim {store.dtype}{rescore} "
+                 f"in {time.perf_counter() - started:.2f}s")
+        return store
+
+    @property
+    def count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def dim(self) -> int:
+        return int(self.manifest["dim"])
+
+    @property
+    def dtype(self) -> str:
+        return self.manifest["dtype"]
+
+    def get_text(self, row: int) -> str:
+        start, end = int(self.text_offsets[row]), int(self.text_offsets[row + 1])
+        return self._texts[start:end].decode("utf-8")
+
+    def get_node(self, row: int, score: Optional[float] = None) -> Dict[str, Any]:
+        """Serialize a row in the same shape as the search tool's node dicts"""
+        return {
+            "node_id": self.node_ids[row],
+            "text": self.get_text(row),
+            "metadata": self.metadata[row],
+            "score": score,
+        }
+
+    def filter_rows(self, standard_filters: Dict[str, str], filing_periods: List[str]) -> Optional[np.ndarray]:
+        """Rows matching all standard filters and any of the filing periods (None = no filtering)"""
+        return self.metadata_index.resolve(standard_filters, filing_periods)
+
+    def enable_ivf(self, n_lists: Optional[int] = None, nprobe: int = 8, exact_threshold: int = 20000):
+        """Switch to the IVF engine, loading the saved index or building (and saving) it"""
+        created_at = self.manifest.get("created_at", "")
+        options = {"nprobe": nprobe, "exact_threshold": exact_threshold}
+        ann_index = IVFIndex.load(self.store_dir, created_at, **options)
+        if ann_index is None or (n_lists and ann_index.n_lists != n_lists):
+            log.info("🔧 Building IVF index for approximate search...")
+            ann_index = IVFIndex.build(self.embeddings, n_lists=n_lists, **options)
+            try:
+                ann_index.save(self.store_dir, created_at)
+            except OSError as e:
+                log.warning(f"⚠️ Could not save IVF index (it will be rebuilt next start): {e}")
+        self.ann_index = ann_index
+
+    def search(self, query_embedding: List[float], top_k: int,
+               candidate_rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Cosine-similarity top-k over all rows or a candidate subset (exact or IVF engine)"""
+        query = normalize_vector(query_embedding)
+        first_pass_k = top_k * self.rescore_oversample if self.rescore_embeddings is not None else top_k
+        if self.ann_index is not None:
+            rows, scores = self.ann_index.search(self.embeddings, query, first_pass_k, candidate_rows, scales=self.scales)
+        else:
+            rows, scores = score_top_k(self.embeddings, query, first_pass_k, candidate_rows, self.scales)
+        if self.rescore_embeddings is not None and len(rows):
+            rows, scores = score_top_k(self.rescore_embeddings, query, top_k, np.sort(rows))
+        return [(int(row), float(score)) for row, score in zip(rows, scores)]
+
+    def score_rows(self, query_embedding: List[float], rows: List[int]) -> np.ndarray:
+        """Cosine similarity of specific rows (exact float32 when a rescore copy exists)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        query = normalize_vector(query_embedding)
+        if self.rescore_embeddings is not None:
+            return matvec(self.rescore_embeddings[rows], query)
+        return matvec(self.embeddings[rows], query, self.scales[rows] if self.scales is not None else None)
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """Bytes needed to keep the scored matrix resident (the rescore copy is read on demand)"""
+        return {
+            "dtype": self.dtype,
+            "embedding_bytes": int(self.embeddings.nbytes + (self.scales.nbytes if self.scales is not None else 0)),
+            "rescore": self.rescore_embeddings is not None,
+            "rescore_oversample": self.rescore_oversample if self.rescore_embeddings is not None else None,
+        }
+
+    def engine_stats(self) -> Dict[str, Any]:
+        return self.ann_index.stats() if self.ann_index else {"engine": "exact"}
+
+    def close(self):
+        if isinstance(self._texts, mmap.mmap):
+            self._texts.close()
+        self._texts_file.close()
+
+
+# ─────────────────────────── CLI ────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="PSX vector index tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="Convert the JSON vector index to a mmap store")
+    convert_parser.add_argument("--index-dir", default=str(Path(__file__).parent.resolve() / "gemini_index_metadata"))
+    convert_parser.add_argument("--store-dir", default=None)
+    convert_parser.add_argument("--dtype", choices=SUPPORTED_DTYPES, default="float32")
+    convert_parser.add_argument("--rescore", action="store_true",
+                                help="Keep a float32 copy to exactly rescore top candidates of a float16/int8 store")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.command == "convert":
+        convert_index(Path(args.index_dir), Path(args.store_dir) if args.store_dir else None,
+                      dtype=args.dtype, rescore=args.rescore)
+
+
+if __name__ == "__main__":
+    main()